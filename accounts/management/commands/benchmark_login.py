@@ -0,0 +1,63 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+User = get_user_model()
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Measure login throughput and queries per login against throwaway users'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--logins',
+            type=int,
+            default=200,
+            help='Number of logins to perform.',
+        )
+        parser.add_argument(
+            '--real-hasher',
+            action='store_true',
+            help='Keep the configured password hasher instead of a fast one, to include hashing cost.',
+        )
+
+    def handle(self, **options):
+        hashers = None if options['real_hasher'] else ['django.contrib.auth.hashers.MD5PasswordHasher']
+        with override_settings(**({'PASSWORD_HASHERS': hashers} if hashers else {})):
+            try:
+                with transaction.atomic():
+                    self.run(options['logins'])
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def run(self, logins):
+        users = [
+            User(username=f'bench_login_{i}', user_type='tourist')
+            for i in range(logins)
+        ]
+        for user in users:
+            user.set_password('bench-password')
+        User.objects.bulk_create_with_profiles(users)
+
+        client = Client(HTTP_HOST='localhost')
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for user in users:
+                client.post('/accounts/login/', {'username': user.username, 'password': 'bench-password'})
+                client.logout()
+            elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f'{logins} logins in {elapsed:.2f}s '
+            f'({logins / elapsed:.0f}/s, {elapsed / logins * 1000:.1f} ms each), '
+            f'{len(queries) / logins:.1f} queries per login'
+        )
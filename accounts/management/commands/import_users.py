@@ -0,0 +1,173 @@
+import contextlib
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import validate_email
+from django.db import IntegrityError
+
+User = get_user_model()
+
+PROFILE_COLUMNS = ('student_id', 'department', 'semester')
+
+
+def _init_worker():
+    # Needed when the pool spawns fresh interpreters instead of forking
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = 'Import tourist accounts from a CSV of students in batches, hashing passwords in parallel'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'csv_file',
+            help='CSV with username, email, phone, student_id, department, semester and optional password columns.',
+        )
+        parser.add_argument(
+            '--default-password',
+            help='Initial password for rows without one. Without it such accounts get an unusable password.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Rows inserted per transaction.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Processes used for password hashing.',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='File recording how many rows are done, so a rerun resumes (default: <csv_file>.checkpoint).',
+        )
+        parser.add_argument(
+            '--errors',
+            default='import_users_errors.csv',
+            help='Where to write rows that could not be imported.',
+        )
+
+    def handle(self, **options):
+        checkpoint_path = options['checkpoint'] or f'{options["csv_file"]}.checkpoint'
+        done = self.read_checkpoint(checkpoint_path)
+        if done:
+            self.stdout.write(f'Resuming after row {done}.')
+
+        try:
+            csv_file = open(options['csv_file'], newline='', encoding='utf-8-sig')
+        except OSError as e:
+            raise CommandError(f'Cannot open CSV file: {e}')
+
+        imported = failed = 0
+        with csv_file, \
+                open(options['errors'], 'a' if done else 'w', newline='', encoding='utf-8') as errors_file, \
+                ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as pool:
+            reader = csv.DictReader(csv_file)
+            if 'username' not in (reader.fieldnames or []):
+                raise CommandError('CSV file must have a username column.')
+
+            errors = csv.writer(errors_file)
+            if not done:
+                errors.writerow(['line', 'username', 'error'])
+
+            rows = enumerate(reader, start=2)
+            for _ in islice(rows, done):
+                pass
+
+            while True:
+                batch = list(islice(rows, options['batch_size']))
+                if not batch:
+                    break
+
+                valid, batch_errors = self.validate(batch)
+                passwords = [row.get('password') or options['default_password'] for _, row in valid]
+                hashes = list(pool.map(make_password, passwords, chunksize=max(1, len(passwords) // options['workers'])))
+                batch_errors += self.insert(valid, hashes)
+
+                for line, username, error in batch_errors:
+                    errors.writerow([line, username, error])
+                imported += len(batch) - len(batch_errors)
+                failed += len(batch_errors)
+
+                done += len(batch)
+                self.write_checkpoint(checkpoint_path, done)
+                self.stdout.write(f'{done} rows processed ({imported} imported, {failed} failed)...')
+
+        # No checkpoint is written when the CSV has no data rows
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(checkpoint_path)
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported} users, {failed} rows failed (see {options["errors"]}).'
+        ))
+
+    def validate(self, batch):
+        usernames = [(row.get('username') or '').strip() for _, row in batch]
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+
+        valid, errors, seen = [], [], set()
+        for (line, row), username in zip(batch, usernames):
+            email = (row.get('email') or '').strip()
+            if not username:
+                errors.append((line, username, 'missing username'))
+                continue
+            if username in existing or username in seen:
+                errors.append((line, username, 'username already exists'))
+                continue
+            if email:
+                try:
+                    validate_email(email)
+                except ValidationError:
+                    errors.append((line, username, 'invalid email'))
+                    continue
+            seen.add(username)
+            row['username'], row['email'] = username, email
+            valid.append((line, row))
+        return valid, errors
+
+    def insert(self, valid, hashes):
+        users, profile_fields = [], []
+        for (_, row), password in zip(valid, hashes):
+            users.append(User(
+                username=row['username'],
+                email=row['email'],
+                phone=(row.get('phone') or '').strip(),
+                user_type='tourist',
+                password=password,
+            ))
+            profile_fields.append({column: (row.get(column) or '').strip() for column in PROFILE_COLUMNS})
+
+        try:
+            User.objects.bulk_create_with_profiles(users, profile_fields)
+            return []
+        except IntegrityError:
+            pass
+
+        # Something in the batch raced with another writer; fall back to row by row
+        errors = []
+        for (line, row), user, fields in zip(valid, users, profile_fields):
+            user.pk = None
+            try:
+                User.objects.bulk_create_with_profiles([user], [fields])
+            except IntegrityError as e:
+                errors.append((line, row['username'], str(e)))
+        return errors
+
+    def read_checkpoint(self, path):
+        try:
+            with open(path) as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def write_checkpoint(self, path, done):
+        with open(path, 'w') as f:
+            f.write(str(done))
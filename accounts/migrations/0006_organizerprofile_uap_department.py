@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:46
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Frozen copy of tours.models.department_key; migrations must not import live code
+DEPARTMENT_NOISE_WORDS = {'department', 'dept', 'of', 'the', 'and'}
+
+
+def department_key(text):
+    words = re.findall(r'[a-z0-9]+', (text or '').lower())
+    return ''.join(word for word in words if word not in DEPARTMENT_NOISE_WORDS)
+
+
+def resolve_departments(apps, schema_editor):
+    UAPDepartment = apps.get_model('tours', 'UAPDepartment')
+    OrganizerProfile = apps.get_model('accounts', 'OrganizerProfile')
+
+    by_key, by_code = {}, {}
+    for department in UAPDepartment.objects.order_by('-id'):
+        by_key[department.key] = department.id
+        by_code[department.code.lower()] = department.id
+
+    resolved = {}
+    for text in OrganizerProfile.objects.values_list('department', flat=True).distinct():
+        key = department_key(text)
+        department_id = by_key.get(key) or by_code.get(key)
+        if department_id is None and text:
+            # Fall back to the substring match create_tour used to run
+            department_id = (
+                UAPDepartment.objects.filter(name__icontains=text).order_by('id').values_list('id', flat=True).first()
+            )
+        if department_id:
+            resolved[text] = department_id
+
+    for text, department_id in resolved.items():
+        OrganizerProfile.objects.filter(department=text).update(uap_department_id=department_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_customuser_manager'),
+        ('tours', '0015_department_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='organizerprofile',
+            name='uap_department',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='tours.uapdepartment'),
+        ),
+        migrations.RunPython(resolve_departments, migrations.RunPython.noop),
+    ]
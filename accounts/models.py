@@ -1,11 +1,39 @@
 # accounts/models.py
 
-from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.contrib.auth.models import AbstractUser, UserManager
+from django.db import models, transaction
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
 
+class CustomUserManager(UserManager):
+    def bulk_create_with_profiles(self, users, profile_fields=None, batch_size=500):
+        """Insert users and their profiles with bulk statements, skipping the per-row signals.
+
+        ``profile_fields`` is an optional list, parallel to ``users``, of dicts
+        with extra field values for each user's profile.
+        """
+        from tours.models import UAPDepartment
+
+        profile_fields = profile_fields or [{}] * len(users)
+        departments = {}
+        with transaction.atomic(using=self.db):
+            created = self.bulk_create(users, batch_size=batch_size)
+            tourist_profiles, organizer_profiles = [], []
+            for user, fields in zip(created, profile_fields):
+                if user.user_type == 'tourist':
+                    tourist_profiles.append(TouristProfile(user=user, **fields))
+                elif user.user_type == 'organizer':
+                    profile = OrganizerProfile(user=user, **fields)
+                    if profile.department not in departments:
+                        departments[profile.department] = UAPDepartment.resolve(profile.department)
+                    profile.uap_department = departments[profile.department]
+                    organizer_profiles.append(profile)
+            TouristProfile.objects.bulk_create(tourist_profiles, batch_size=batch_size)
+            OrganizerProfile.objects.bulk_create(organizer_profiles, batch_size=batch_size)
+        return created
+
+
 class CustomUser(AbstractUser):
     USER_TYPE_CHOICES = (
         ('tourist', 'Tourist'),
@@ -15,12 +43,27 @@ class CustomUser(AbstractUser):
     user_type = models.CharField(max_length=20, choices=USER_TYPE_CHOICES, default='tourist')
     phone = models.CharField(max_length=20, blank=True)
     address = models.TextField(blank=True)
-    profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
+    profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = CustomUserManager()
+
     def __str__(self):
         return f"{self.username} ({self.user_type})"
 
+    def get_profile(self):
+        """Return the user's profile, creating it on first access if it's missing.
+
+        Developers have no profile, so this returns None for them.
+        """
+        if self.user_type == 'tourist':
+            profile, _ = TouristProfile.objects.get_or_create(user=self)
+        elif self.user_type == 'organizer':
+            profile, _ = OrganizerProfile.objects.get_or_create(user=self)
+        else:
+            profile = None
+        return profile
+
     def save(self, *args, **kwargs):
         if self.is_superuser and self.user_type != 'developer':
             self.user_type = 'developer'
@@ -41,6 +84,9 @@ class TouristProfile(models.Model):
 class OrganizerProfile(models.Model):
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE)
     department = models.CharField(max_length=200, default="CSE Department")
+    uap_department = models.ForeignKey(
+        'tours.UAPDepartment', on_delete=models.SET_NULL, null=True, blank=True, editable=False
+    )
     organizer_id = models.CharField(max_length=100, blank=True)
     bio = models.TextField(blank=True)
     is_verified = models.BooleanField(default=False)
@@ -48,6 +94,12 @@ class OrganizerProfile(models.Model):
     def __str__(self):
         return f"Organizer: {self.department}"
 
+    def save(self, *args, **kwargs):
+        # Resolve the free-text department once here instead of on every tour creation
+        from tours.models import UAPDepartment
+        self.uap_department = UAPDepartment.resolve(self.department)
+        super().save(*args, **kwargs)
+
 
 class EmergencyContact(models.Model):
     RELATIONSHIP_CHOICES = (
@@ -83,20 +135,11 @@ class EmergencyContact(models.Model):
 
 
 @receiver(post_save, sender=CustomUser)
-def create_user_profile(sender, instance, created, **kwargs):
-    if created:
+def create_user_profile(sender, instance, created, raw=False, **kwargs):
+    # Profiles are only touched on creation; later saves such as the
+    # last_login update on every login don't need to write them again
+    if created and not raw:
         if instance.user_type == 'tourist':
             TouristProfile.objects.create(user=instance)
         elif instance.user_type == 'organizer':
             OrganizerProfile.objects.create(user=instance)
-
-
-@receiver(post_save, sender=CustomUser)
-def save_user_profile(sender, instance, **kwargs):
-    try:
-        if instance.user_type == 'tourist' and hasattr(instance, 'touristprofile'):
-            instance.touristprofile.save()
-        elif instance.user_type == 'organizer' and hasattr(instance, 'organizerprofile'):
-            instance.organizerprofile.save()
-    except Exception:
-        pass
\ No newline at end of file
@@ -1,3 +1,116 @@
+import csv
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 
-# Create your tests here.
+from tours.models import UAPDepartment
+
+from .models import CustomUser, OrganizerProfile, TouristProfile
+
+
+class ImportUsersTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.csv_path = os.path.join(self.directory.name, 'students.csv')
+        self.errors_path = os.path.join(self.directory.name, 'errors.csv')
+
+    def write_csv(self, rows):
+        with open(self.csv_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['username', 'email', 'phone', 'student_id', 'department', 'semester'])
+            writer.writerows(rows)
+
+    def run_import(self, *args):
+        call_command(
+            'import_users', self.csv_path, '--workers', '1', '--errors', self.errors_path, *args,
+            stdout=StringIO(),
+        )
+
+    def error_rows(self):
+        with open(self.errors_path, newline='') as f:
+            return list(csv.reader(f))[1:]
+
+    def test_header_only_csv(self):
+        self.write_csv([])
+        self.run_import()
+        self.assertFalse(CustomUser.objects.exists())
+        self.assertFalse(os.path.exists(f'{self.csv_path}.checkpoint'))
+
+    def test_imports_valid_rows_and_reports_the_rest(self):
+        CustomUser.objects.create_user('taken')
+        self.write_csv([
+            ['alice', 'alice@example.com', '017', 'S1', 'CSE', '3'],
+            ['bob', 'not-an-email', '', '', '', ''],
+            ['taken', '', '', '', '', ''],
+            ['alice', '', '', '', '', ''],
+        ])
+        self.run_import('--default-password', 'secret-pass')
+
+        alice = CustomUser.objects.get(username='alice')
+        self.assertEqual(alice.user_type, 'tourist')
+        self.assertTrue(alice.check_password('secret-pass'))
+        self.assertEqual(TouristProfile.objects.get(user=alice).student_id, 'S1')
+        self.assertEqual(
+            [(line, error) for line, _, error in self.error_rows()],
+            [('3', 'invalid email'), ('4', 'username already exists'), ('5', 'username already exists')],
+        )
+        self.assertFalse(os.path.exists(f'{self.csv_path}.checkpoint'))
+
+    def test_resumes_after_checkpoint(self):
+        self.write_csv([['first', '', '', '', '', ''], ['second', '', '', '', '', '']])
+        with open(f'{self.csv_path}.checkpoint', 'w') as f:
+            f.write('1')
+        self.run_import()
+
+        self.assertEqual(list(CustomUser.objects.values_list('username', flat=True)), ['second'])
+        self.assertFalse(CustomUser.objects.get().has_usable_password())
+
+
+class ProfileTests(TestCase):
+    def test_get_profile_creates_missing_profiles_once(self):
+        tourist = CustomUser.objects.create_user('tourist', user_type='tourist')
+        organizer = CustomUser.objects.create_user('org', user_type='organizer')
+        TouristProfile.objects.filter(user=tourist).delete()
+        OrganizerProfile.objects.filter(user=organizer).delete()
+
+        profile = tourist.get_profile()
+        self.assertIsInstance(profile, TouristProfile)
+        self.assertEqual(tourist.get_profile(), profile)
+        self.assertIsInstance(organizer.get_profile(), OrganizerProfile)
+        self.assertEqual(TouristProfile.objects.count(), 1)
+        self.assertEqual(OrganizerProfile.objects.count(), 1)
+
+    def test_developers_have_no_profile(self):
+        developer = CustomUser.objects.create_superuser('dev', password='secret-pass')
+        self.assertEqual(developer.user_type, 'developer')
+        self.assertIsNone(developer.get_profile())
+        self.assertFalse(OrganizerProfile.objects.exists())
+
+        self.client.force_login(developer)
+        response = self.client.get('/accounts/profile/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['form'])
+        self.assertFalse(OrganizerProfile.objects.exists())
+
+    def test_bulk_create_with_profiles(self):
+        department = UAPDepartment.objects.create(name='Pharmacy', code='PHR')
+        users = CustomUser.objects.bulk_create_with_profiles(
+            [
+                CustomUser(username='alice', user_type='tourist'),
+                CustomUser(username='org1', user_type='organizer'),
+                CustomUser(username='org2', user_type='organizer'),
+                CustomUser(username='dev', user_type='developer'),
+            ],
+            [{'student_id': 'S1'}, {'department': 'Pharmacy'}, {'department': 'Pharmacy'}, {}],
+        )
+
+        self.assertEqual([user.username for user in users], ['alice', 'org1', 'org2', 'dev'])
+        self.assertEqual(TouristProfile.objects.get().student_id, 'S1')
+        organizer_profiles = OrganizerProfile.objects.order_by('user__username')
+        self.assertEqual([profile.user.username for profile in organizer_profiles], ['org1', 'org2'])
+        self.assertEqual({profile.uap_department for profile in organizer_profiles}, {department})
+        self.assertIsNone(users[3].get_profile())
@@ -60,21 +60,11 @@ def user_logout(request):
 def profile(request):
     user = request.user
 
-    try:
-        if user.user_type == 'tourist':
-            profile_obj = TouristProfile.objects.get(user=user)
-            ProfileForm = TouristProfileForm
-        else:
-            profile_obj = OrganizerProfile.objects.get(user=user)
-            ProfileForm = OrganizerProfileForm
-    except:
-        # Create profile if it doesn't exist
-        if user.user_type == 'tourist':
-            profile_obj = TouristProfile.objects.create(user=user)
-            ProfileForm = TouristProfileForm
-        else:
-            profile_obj = OrganizerProfile.objects.create(user=user, department='CSE Department')
-            ProfileForm = OrganizerProfileForm
+    profile_obj = user.get_profile()
+    if profile_obj is None:
+        # Developers only have the account details, there is no profile to edit
+        return render(request, 'accounts/profile.html', {'form': None, 'user': user})
+    ProfileForm = TouristProfileForm if user.user_type == 'tourist' else OrganizerProfileForm
 
     if request.method == 'POST':
         form = ProfileForm(request.POST, instance=profile_obj)
@@ -0,0 +1,125 @@
+import random
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from dashboard.analytics import (
+    BUCKETS, aggregate, analytics_cache_key, booking_columns, category_capacity, np, organizer_analytics,
+)
+from tours.models import Booking, Tour
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Seed bookings into a throwaway database and time the analytics endpoint path end to end'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=1_000_000,
+            help='Number of bookings to seed.',
+        )
+        parser.add_argument(
+            '--tours',
+            type=int,
+            default=500,
+            help='Tours the bookings are spread over.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Bookings inserted per statement while seeding.',
+        )
+
+    def handle(self, **options):
+        if np is None:
+            raise CommandError('benchmark_analytics needs numpy installed.')
+
+        # Never touch the real database: seed a fresh test database, on disk
+        # for SQLite since a million rows don't belong in memory
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        with tempfile.TemporaryDirectory() as directory:
+            if connection.vendor == 'sqlite':
+                test_settings['NAME'] = str(Path(directory) / 'benchmark.sqlite3')
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+            try:
+                self.benchmark(options['rows'], options['tours'], options['batch_size'])
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def benchmark(self, rows, tour_count, batch_size):
+        organizer = User.objects.create_user('bench_analytics_organizer', user_type='organizer')
+        tourist = User.objects.create_user('bench_analytics_tourist', user_type='tourist')
+        self.seed(organizer, tourist, rows, tour_count, batch_size)
+
+        for bucket in BUCKETS:
+            # Cold: what the first request after a booking change pays
+            cache.delete(analytics_cache_key(organizer.pk, bucket))
+            timings = {}
+            started = time.perf_counter()
+            columns = booking_columns(organizer)
+            timings['fetch'] = time.perf_counter() - started
+            capacity_categories, capacity = category_capacity(organizer)
+            started = time.perf_counter()
+            result = aggregate(columns, capacity_categories, capacity, bucket)
+            timings['aggregate'] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            organizer_analytics(organizer, bucket)
+            timings['endpoint cold'] = time.perf_counter() - started
+            started = time.perf_counter()
+            organizer_analytics(organizer, bucket)
+            timings['endpoint cached'] = time.perf_counter() - started
+            cache.delete(analytics_cache_key(organizer.pk, bucket))
+
+            self.stdout.write(
+                f'{len(columns["status"])} bookings by {bucket} ({len(result["series"]["periods"])} periods): '
+                + ', '.join(f'{label} {seconds * 1000:.0f} ms' for label, seconds in timings.items())
+            )
+
+    def seed(self, organizer, tourist, rows, tour_count, batch_size):
+        rng = random.Random(0)
+        categories = [value for value, _ in Tour.CATEGORY_CHOICES]
+        statuses = [value for value, _ in Booking.STATUS_CHOICES]
+        methods = [value for value, _ in Booking.PAYMENT_METHOD_CHOICES]
+        now = timezone.now()
+
+        # bulk_create skips the calendar, stats and trending signals, which
+        # would otherwise dominate seeding time
+        tours = Tour.objects.bulk_create([
+            Tour(
+                title=f'Benchmark tour {i}', description='-', organizer=organizer, category=rng.choice(categories),
+                duration_hours=1, max_participants=rng.randint(20, 200), meeting_point='-',
+                tour_date=now + timedelta(days=rng.randint(1, 365)), status='published', price=rng.randint(0, 20) * 100,
+            )
+            for i in range(tour_count)
+        ])
+
+        started = time.perf_counter()
+        for start in range(0, rows, batch_size):
+            bookings = []
+            for _ in range(min(batch_size, rows - start)):
+                tour = rng.choice(tours)
+                participants = rng.randint(1, 5)
+                bookings.append(Booking(
+                    tourist=tourist, tour=tour, participants=participants, total_price=tour.price * participants,
+                    payment_method=rng.choice(methods), status=rng.choice(statuses),
+                ))
+            with transaction.atomic():
+                Booking.objects.bulk_create(bookings)
+                # booking_date is auto_now_add, so spread the bookings over the
+                # past year like real history with a second, bulk UPDATE
+                for booking in bookings:
+                    booking.booking_date = now - timedelta(seconds=rng.randrange(365 * 86400))
+                Booking.objects.bulk_update(bookings, ['booking_date'], batch_size=batch_size)
+        self.stdout.write(f'Seeded {rows} bookings over {tour_count} tours in {time.perf_counter() - started:.1f} s')
@@ -1,3 +1,35 @@
-from django.db import models
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 
-# Create your models here.
+from tours.models import Booking, Tour
+from tours.signals import bookings_expired, bookings_updated
+
+from .analytics import invalidate_analytics
+
+
+def invalidate_analytics_for_tours(tour_ids):
+    organizer_ids = set(Tour.objects.filter(id__in=tour_ids).values_list('organizer_id', flat=True))
+    if organizer_ids:
+        invalidate_analytics(organizer_ids)
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def invalidate_analytics_on_booking_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(lambda: invalidate_analytics_for_tours([instance.tour_id]))
+
+
+@receiver(post_save, sender=Tour)
+@receiver(post_delete, sender=Tour)
+def invalidate_analytics_on_tour_change(sender, instance, raw=False, **kwargs):
+    # Capacity per category comes from the organizer's tours
+    if not raw:
+        transaction.on_commit(lambda: invalidate_analytics([instance.organizer_id]))
+
+
+@receiver(bookings_expired)
+@receiver(bookings_updated)
+def invalidate_analytics_on_bulk_booking_change(sender, tour_ids, **kwargs):
+    invalidate_analytics_for_tours(tour_ids)
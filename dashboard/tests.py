@@ -1,3 +1,55 @@
+import unittest
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.utils import timezone
+
+from tours.models import Booking, Tour
+
+from .analytics import booking_columns, np, organizer_analytics
+
+User = get_user_model()
+
+
+@unittest.skipIf(np is None, 'organizer analytics need numpy')
+class OrganizerAnalyticsTests(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user('org', user_type='organizer')
+        self.tourist = User.objects.create_user('tourist', user_type='tourist')
+        self.tour = Tour.objects.create(
+            title='Campus walk', description='-', organizer=self.organizer, duration_hours=1,
+            max_participants=10, meeting_point='-', tour_date=timezone.now() + timedelta(days=7),
+            status='published', price=100,
+        )
+
+    def book(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Booking.objects.create(
+                tour=self.tour, tourist=self.tourist, participants=2, total_price=200,
+                payment_method='bkash', **kwargs
+            )
+
+    def test_booking_changes_invalidate_cached_payload(self):
+        self.book(status='confirmed')
+        self.assertEqual(sum(organizer_analytics(self.organizer)['series']['revenue']), 200)
+
+        booking = self.book(status='pending')
+        self.assertEqual(sum(organizer_analytics(self.organizer)['series']['bookings']), 2)
+
+        booking.status = 'confirmed'
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.save()
+        result = organizer_analytics(self.organizer)
+        self.assertEqual(sum(result['series']['revenue']), 400)
+        self.assertEqual(result['fill_rate_by_category'], {'campus': 0.4})
+
+    def test_bookings_land_in_their_utc_day_and_month(self):
+        booking = self.book(status='confirmed')
+        Booking.objects.filter(id=booking.id).update(
+            booking_date=datetime(2026, 3, 31, 23, 30, 15, 250000, tzinfo=dt_timezone.utc)
+        )
 
-# Create your tests here.
+        self.assertEqual(booking_columns(self.organizer)['booking_date'].tolist(), [datetime(2026, 3, 31, 23, 30, 15)])
+        self.assertEqual(organizer_analytics(self.organizer, 'day')['series']['periods'], ['2026-03-31'])
+        self.assertEqual(organizer_analytics(self.organizer, 'month')['series']['periods'], ['2026-03'])
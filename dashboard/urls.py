@@ -4,4 +4,6 @@ from . import views
 urlpatterns = [
     path('', views.dashboard, name='dashboard'),
     path('departments/', views.manage_departments, name='manage_departments'),
+    path('analytics/', views.analytics, name='organizer_analytics'),
+    path('analytics.csv', views.analytics_csv, name='organizer_analytics_csv'),
 ]
\ No newline at end of file
@@ -1,28 +1,20 @@
 # dashboard/views.py
+import csv
+
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.http import HttpResponse, JsonResponse
 from tours.models import Tour, Booking, Review, UAPDepartment
-from accounts.models import CustomUser, TouristProfile, OrganizerProfile
+from accounts.models import CustomUser
 from tours.forms import UAPDepartmentForm
+from .analytics import BUCKETS, organizer_analytics
+from tours.events import emit
 
 @login_required
 def dashboard(request):
     user = request.user
     
-    # Ensure user has proper profile
-    try:
-        if user.user_type == 'tourist':
-            profile_obj = TouristProfile.objects.get(user=user)
-        elif user.user_type == 'organizer':
-            profile_obj = OrganizerProfile.objects.get(user=user)
-    except:
-        # Create missing profile
-        if user.user_type == 'tourist':
-            TouristProfile.objects.create(user=user)
-        elif user.user_type == 'organizer':
-            OrganizerProfile.objects.create(user=user, department='CSE Department')
-    
     if user.user_type == 'tourist':
         bookings = Booking.objects.filter(tourist=user).order_by('-booking_date')
         wishlist_count = Tour.objects.filter(wishlist__tourist=user).count()
@@ -40,10 +32,10 @@ def dashboard(request):
     elif user.user_type == 'organizer':
         tours = Tour.objects.filter(organizer=user).order_by('-created_at')
         bookings = Booking.objects.filter(tour__organizer=user)
-        total_revenue = sum(booking.total_price for booking in bookings.filter(status='confirmed'))
+        total_revenue = sum(booking.total_price for booking in bookings.filter(status__in=['confirmed', 'completed']))
         
-        # Get organizer profile
-        organizer_profile = OrganizerProfile.objects.get(user=user)
+        # Get organizer profile, created lazily for accounts made without one
+        organizer_profile = user.get_profile()
         
         # Add publishing AND QR code functionality for organizers
         if request.method == 'POST':
@@ -53,6 +45,7 @@ def dashboard(request):
                     tour_to_publish = Tour.objects.get(id=tour_id, organizer=user)
                     tour_to_publish.status = 'published'
                     tour_to_publish.save()
+                    emit('tour.published', actor=request.user, tour=tour_to_publish)
                     messages.success(request, f'Tour "{tour_to_publish.title}" published successfully!')
                 except Tour.DoesNotExist:
                     messages.error(request, 'Tour not found!')
@@ -64,6 +57,7 @@ def dashboard(request):
                     tour_to_unpublish = Tour.objects.get(id=tour_id, organizer=user)
                     tour_to_unpublish.status = 'draft'
                     tour_to_unpublish.save()
+                    emit('tour.unpublished', actor=request.user, tour=tour_to_unpublish)
                     messages.success(request, f'Tour "{tour_to_unpublish.title}" unpublished successfully!')
                 except Tour.DoesNotExist:
                     messages.error(request, 'Tour not found!')
@@ -106,7 +100,7 @@ def dashboard(request):
         bookings = Booking.objects.all()
         departments = UAPDepartment.objects.all()
         
-        total_revenue = sum(booking.total_price for booking in bookings.filter(status='confirmed'))
+        total_revenue = sum(booking.total_price for booking in bookings.filter(status__in=['confirmed', 'completed']))
         
         if request.method == 'POST':
             if 'delete_user' in request.POST:
@@ -126,6 +120,7 @@ def dashboard(request):
                 tour_id = request.POST.get('tour_id')
                 try:
                     tour_to_delete = Tour.objects.get(id=tour_id)
+                    emit('tour.deleted', actor=request.user, tour=tour_to_delete.id, title=tour_to_delete.title)
                     tour_to_delete.delete()
                     messages.success(request, 'Tour deleted successfully!')
                 except Tour.DoesNotExist:
@@ -153,6 +148,7 @@ def dashboard(request):
                     tour_to_publish = Tour.objects.get(id=tour_id)
                     tour_to_publish.status = 'published'
                     tour_to_publish.save()
+                    emit('tour.published', actor=request.user, tour=tour_to_publish)
                     messages.success(request, f'Tour "{tour_to_publish.title}" published successfully!')
                 except Tour.DoesNotExist:
                     messages.error(request, 'Tour not found!')
@@ -164,6 +160,7 @@ def dashboard(request):
                     tour_to_unpublish = Tour.objects.get(id=tour_id)
                     tour_to_unpublish.status = 'draft'
                     tour_to_unpublish.save()
+                    emit('tour.unpublished', actor=request.user, tour=tour_to_unpublish)
                     messages.success(request, f'Tour "{tour_to_unpublish.title}" unpublished successfully!')
                 except Tour.DoesNotExist:
                     messages.error(request, 'Tour not found!')
@@ -226,4 +223,33 @@ def manage_departments(request):
     return render(request, 'dashboard/manage_departments.html', {
         'departments': departments,
         'form': form
-    })
\ No newline at end of file
+    })
+
+@login_required
+def analytics(request):
+    if request.user.user_type != 'organizer':
+        return JsonResponse({'error': 'Only organizers can view analytics'}, status=403)
+    
+    bucket = request.GET.get('bucket', 'day')
+    if bucket not in BUCKETS:
+        return JsonResponse({'error': f'bucket must be one of {", ".join(BUCKETS)}'}, status=400)
+    
+    return JsonResponse(organizer_analytics(request.user, bucket))
+
+@login_required
+def analytics_csv(request):
+    if request.user.user_type != 'organizer':
+        messages.error(request, 'Access denied!')
+        return redirect('dashboard')
+    
+    bucket = request.GET.get('bucket', 'day')
+    if bucket not in BUCKETS:
+        bucket = 'day'
+    series = organizer_analytics(request.user, bucket)['series']
+    
+    response = HttpResponse(content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="bookings_by_{bucket}.csv"'
+    writer = csv.writer(response)
+    writer.writerow(['period', 'bookings', 'participants', 'revenue'])
+    writer.writerows(zip(series['periods'], series['bookings'], series['participants'], series['revenue']))
+    return response
@@ -0,0 +1,160 @@
+// Site-wide scripts for UAP TripTrack, loaded from base.html
+
+// CSRF token for AJAX requests, rendered into a meta tag by base.html
+function getCsrfToken() {
+    const meta = document.querySelector('meta[name="csrf-token"]');
+    return meta ? meta.content : '';
+}
+
+// Wishlist functionality
+function toggleWishlist(tourId) {
+    fetch(`/tours/wishlist/toggle/${tourId}/`, {
+        method: 'POST',
+        headers: {
+            'X-CSRFToken': getCsrfToken(),
+            'Content-Type': 'application/json',
+        },
+    })
+    .then(response => response.json())
+    .then(data => {
+        const heartIcon = document.querySelector(`[data-tour="${tourId}"]`);
+        if (data.added) {
+            heartIcon.classList.add('active');
+            heartIcon.innerHTML = '<i class="fas fa-heart"></i>';
+        } else {
+            heartIcon.classList.remove('active');
+            heartIcon.innerHTML = '<i class="far fa-heart"></i>';
+        }
+        showNotification(data.message, data.added ? 'success' : 'warning');
+    });
+}
+
+// Notification function
+function showNotification(message, type) {
+    const notification = document.createElement('div');
+    notification.className = `alert alert-${type} alert-dismissible fade show position-fixed`;
+    notification.style.top = '20px';
+    notification.style.right = '20px';
+    notification.style.zIndex = '9999';
+    notification.style.minWidth = '300px';
+    notification.innerHTML = `
+        ${message}
+        <button type="button" class="btn-close" data-bs-dismiss="alert"></button>
+    `;
+    document.body.appendChild(notification);
+
+    setTimeout(() => {
+        if (notification.parentNode) {
+            notification.remove();
+        }
+    }, 3000);
+}
+
+// Image error handling
+document.addEventListener('DOMContentLoaded', function() {
+    const images = document.querySelectorAll('img');
+    images.forEach(img => {
+        img.addEventListener('error', function() {
+            this.src = 'data:image/svg+xml;base64,PHN2ZyB3aWR0aD0iMjAwIiBoZWlnaHQ9IjIwMCIgeG1sbnM9Imh0dHA6Ly93d3cudzMub3JnLzIwMDAvc3ZnIj48cmVjdCB3aWR0aD0iMTAwJSIgaGVpZ2h0PSIxMDAlIiBmaWxsPSIjZjhmOWZhIi8+PHRleHQgeD0iNTAlIiB5PSI1MCUiIGZvbnQtZmFtaWx5PSJBcmlhbCwgc2Fucy1zZXJpZiIgZm9udC1zaXplPSIxNCIgZmlsbD0iIzk5OSIgdGV4dC1hbmNob3I9Im1pZGRsZSIgZHk9Ii4zZW0iPk5vIEltYWdlPC90ZXh0Pjwvc3ZnPg';
+            this.alt = 'Image not available';
+            this.classList.add('image-placeholder');
+        });
+    });
+
+    // Load notification count and dropdown content
+    loadNotificationData();
+});
+
+// Load notification count and dropdown content
+function loadNotificationData() {
+    loadNotificationCount();
+    loadNotificationDropdownContent();
+}
+
+// Load unread notification count
+function loadNotificationCount() {
+    fetch('/notifications/unread-count/')
+        .then(response => response.json())
+        .then(data => {
+            const badge = document.getElementById('notificationBadge');
+            if (data.unread_count > 0) {
+                badge.textContent = data.unread_count;
+                badge.style.display = 'block';
+            } else {
+                badge.style.display = 'none';
+            }
+        })
+        .catch(error => {
+            console.error('Error loading notification count:', error);
+        });
+}
+
+// Human-readable age of an ISO timestamp, e.g. "3h ago"
+function timeAgo(isoString) {
+    const seconds = Math.max(0, (Date.now() - new Date(isoString).getTime()) / 1000);
+    if (seconds >= 86400) return `${Math.floor(seconds / 86400)}d ago`;
+    if (seconds >= 3600) return `${Math.floor(seconds / 3600)}h ago`;
+    if (seconds >= 60) return `${Math.floor(seconds / 60)}m ago`;
+    return 'Just now';
+}
+
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text;
+    return div.innerHTML;
+}
+
+// Load notification dropdown content
+function loadNotificationDropdownContent() {
+    // 'no-cache' revalidates with If-None-Match; an unchanged list comes back
+    // as a 304 and the browser hands us its stored copy
+    fetch('/notifications/recent/', { cache: 'no-cache' })
+        .then(response => response.json())
+        .then(data => {
+            const dropdownContent = document.getElementById('notificationDropdownContent');
+            const notifications = data.notifications.slice(0, 3); // Show only 3 recent notifications
+
+            if (notifications.length > 0) {
+                dropdownContent.innerHTML = notifications.map(notification => {
+                    const message = notification.message;
+                    return `
+                        <li class="dropdown-notification-item ${notification.is_read ? '' : 'unread'}">
+                            <div class="d-flex w-100 justify-content-between">
+                                <h6 class="mb-1" style="font-size: 0.9rem;">${escapeHtml(notification.title)}</h6>
+                                <small title="${escapeHtml(new Date(notification.created_at).toLocaleString())}">${timeAgo(notification.created_at)}</small>
+                            </div>
+                            <p class="mb-1" style="font-size: 0.8rem;">${escapeHtml(message.substring(0, 60))}${message.length > 60 ? '...' : ''}</p>
+                        </li>
+                    `;
+                }).join('');
+            } else {
+                dropdownContent.innerHTML = `
+                    <li class="dropdown-notification-item">
+                        <div class="text-center text-muted py-2">
+                            <i class="fas fa-bell-slash fa-2x mb-2"></i>
+                            <p class="mb-0 small">No notifications</p>
+                        </div>
+                    </li>
+                `;
+            }
+        })
+        .catch(error => {
+            console.error('Error loading notification dropdown:', error);
+            document.getElementById('notificationDropdownContent').innerHTML = `
+                <li class="dropdown-notification-item">
+                    <div class="text-center text-muted py-2">
+                        <i class="fas fa-exclamation-triangle fa-2x mb-2"></i>
+                        <p class="mb-0 small">Error loading notifications</p>
+                    </div>
+                </li>
+            `;
+        });
+}
+
+// Check for new notifications every 30 seconds
+setInterval(loadNotificationCount, 30000);
+
+// Reload dropdown content when it's opened
+document.getElementById('notificationDropdown').addEventListener('click', function() {
+    loadNotificationDropdownContent();
+});
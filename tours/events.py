@@ -0,0 +1,98 @@
+# tours/events.py
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils import timezone
+
+from .models import DomainEvent, event_partition
+
+# A context variable rather than a thread-local so async requests, whose ORM
+# calls hop between threads, keep a single buffer
+_buffer = ContextVar('domain_event_buffer', default=None)
+
+
+def emit(kind, actor=None, tour=None, booking=None, **payload):
+    """Record a domain event; inside batched() it is buffered until the batch ends.
+
+    ``actor``, ``tour`` and ``booking`` may be instances or ids. ``payload``
+    should stay small and JSON-serializable.
+    """
+    now = timezone.now()
+    event = DomainEvent(
+        kind=kind,
+        occurred_at=now,
+        partition=event_partition(now),
+        actor_id=getattr(actor, 'pk', actor),
+        tour_id=getattr(tour, 'pk', tour),
+        booking_id=getattr(booking, 'pk', booking),
+        payload=payload,
+    )
+    events = _buffer.get()
+    if events is None:
+        DomainEvent.objects.bulk_create([event])
+        return
+    events.append(event)
+    if len(events) >= getattr(settings, 'EVENT_BATCH_SIZE', 500):
+        flush()
+
+
+def flush():
+    """Write all buffered events with one bulk INSERT"""
+    events = _buffer.get()
+    if events:
+        pending = events[:]
+        events.clear()
+        DomainEvent.objects.bulk_create(pending, batch_size=500)
+
+
+@contextmanager
+def batched():
+    """Buffer events emitted inside the block and write them together at the end"""
+    if _buffer.get() is not None:
+        yield
+        return
+    token = _buffer.set([])
+    try:
+        yield
+    finally:
+        try:
+            flush()
+        finally:
+            _buffer.reset(token)
+
+
+class EventBufferMiddleware:
+    """Collect the events a request emits and write them in one INSERT after the view"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with batched():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        token = _buffer.set([])
+        try:
+            return await self.get_response(request)
+        finally:
+            events = _buffer.get()
+            _buffer.reset(token)
+            if events:
+                await DomainEvent.objects.abulk_create(events, batch_size=500)
+
+
+def events_since(last_id, kinds=None, limit=1000):
+    """Next page of events after ``last_id``, for consumers that keep their own cursor"""
+    events = DomainEvent.objects.filter(id__gt=last_id).order_by('id')
+    if kinds:
+        events = events.filter(kind__in=kinds)
+    return list(events[:limit])
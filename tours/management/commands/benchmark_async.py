@@ -0,0 +1,181 @@
+import asyncio
+import statistics
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, connection
+from django.http import Http404, HttpResponse, JsonResponse
+from django.test import AsyncClient, Client, override_settings
+from django.urls import include, path
+from django.utils import timezone
+from django.views.decorators.http import require_POST
+
+from tours.models import Notification, Tour, UserNotification, Wishlist
+from tours.notifications import build_recent, invalidate_recent, recent_cache_key, recent_queryset
+
+User = get_user_model()
+
+ENDPOINTS = (
+    ('GET', '/notifications/unread-count/'),
+    ('GET', '/notifications/recent/'),
+    ('POST', '/notifications/mark-read/{notification_id}/'),
+    ('POST', '/tours/wishlist/toggle/{tour_id}/'),
+)
+
+
+# The same endpoints as plain sync views, i.e. what they were before they went
+# async: same queries and caching, so the comparison isolates the handler model
+@login_required
+def get_unread_count(request):
+    return JsonResponse({'unread_count': UserNotification.objects.filter(user=request.user, is_read=False).count()})
+
+
+@login_required
+def get_recent_notifications(request):
+    key = recent_cache_key(request.user.pk)
+    cached = cache.get(key)
+    if cached is None:
+        cached = build_recent(list(recent_queryset(request.user.pk)))
+        cache.set(key, cached, getattr(settings, 'NOTIFICATION_CACHE_SECONDS', 300))
+    etag, body = cached
+    return HttpResponse(body, content_type='application/json', headers={'ETag': etag})
+
+
+@require_POST
+@login_required
+def mark_notification_read(request, notification_id):
+    updated = UserNotification.objects.filter(id=notification_id, user=request.user).update(
+        is_read=True, read_at=timezone.now()
+    )
+    if updated:
+        invalidate_recent([request.user.pk])
+        return JsonResponse({'success': True})
+    return JsonResponse({'success': False, 'error': 'Notification not found'})
+
+
+@login_required
+@require_POST
+def wishlist_toggle(request, tour_id):
+    deleted, _ = Wishlist.objects.filter(tourist=request.user, tour_id=tour_id).delete()
+    if deleted:
+        return JsonResponse({'added': False, 'message': 'Removed from wishlist'})
+    if not Tour.objects.filter(id=tour_id, status='published').exists():
+        raise Http404('Tour not found')
+    try:
+        Wishlist.objects.create(tourist=request.user, tour_id=tour_id)
+    except IntegrityError:
+        pass
+    return JsonResponse({'added': True, 'message': 'Added to wishlist'})
+
+
+# URLconf for the WSGI leg: the sync twins above, everything else as usual
+urlpatterns = [
+    path('notifications/unread-count/', get_unread_count),
+    path('notifications/recent/', get_recent_notifications),
+    path('notifications/mark-read/<int:notification_id>/', mark_notification_read),
+    path('tours/wishlist/toggle/<int:tour_id>/', wishlist_toggle),
+    path('', include(settings.ROOT_URLCONF)),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the JSON notification endpoints as sync views under WSGI (thread per request) '
+        'and as async views under ASGI, on a throwaway database'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=500,
+            help='Requests per endpoint and handler.',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=50,
+            help='Requests in flight at once (threads for WSGI, tasks for ASGI).',
+        )
+
+    def handle(self, **options):
+        # Never touch the real database: run against a fresh test database, on
+        # disk for SQLite so the worker threads share it
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        with tempfile.TemporaryDirectory() as directory:
+            if connection.vendor == 'sqlite':
+                test_settings['NAME'] = str(Path(directory) / 'benchmark.sqlite3')
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+            try:
+                with override_settings(ALLOWED_HOSTS=['testserver']):
+                    self.benchmark(options['requests'], options['concurrency'])
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def benchmark(self, total, concurrency):
+        organizer = User.objects.create_user('bench_async_organizer', user_type='organizer')
+        tourist = User.objects.create_user('bench_async_tourist', user_type='tourist')
+        tour = Tour.objects.create(
+            title='Benchmark tour', description='-', organizer=organizer, duration_hours=1,
+            max_participants=10, meeting_point='-', tour_date=timezone.now(), status='published',
+        )
+        notification = Notification.objects.create(organizer=organizer, title='Benchmark', message='-')
+        user_notification = UserNotification.objects.create(user=tourist, notification=notification)
+        paths = {
+            path.format(notification_id=user_notification.id, tour_id=tour.id): method
+            for method, path in ENDPOINTS
+        }
+
+        for path, method in paths.items():
+            self.stdout.write(f'{method} {path}')
+            with override_settings(ROOT_URLCONF=__name__):
+                self.report('WSGI, sync views', path, *self.run_wsgi(tourist, method, path, total, concurrency))
+            self.report('ASGI, async views', path, *asyncio.run(self.run_asgi(tourist, method, path, total, concurrency)))
+
+    def run_wsgi(self, user, method, path, total, concurrency):
+        local = threading.local()
+
+        def request(_):
+            if not hasattr(local, 'client'):
+                local.client = Client()
+                local.client.force_login(user)
+            started = time.perf_counter()
+            response = getattr(local.client, method.lower())(path)
+            return response.status_code, time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(request, range(total)))
+        return total / (time.perf_counter() - started), results
+
+    async def run_asgi(self, user, method, path, total, concurrency):
+        client = AsyncClient()
+        await client.aforce_login(user)
+        slots = asyncio.Semaphore(concurrency)
+
+        async def request():
+            async with slots:
+                started = time.perf_counter()
+                response = await getattr(client, method.lower())(path)
+                return response.status_code, time.perf_counter() - started
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(request() for _ in range(total)))
+        return total / (time.perf_counter() - started), results
+
+    def report(self, label, path, throughput, results):
+        # Redirects, errors and "database is locked" 500s would otherwise count as throughput
+        statuses = Counter(status for status, _ in results)
+        if set(statuses) != {200}:
+            raise CommandError(f'{label} {path}: expected only 200 responses, got {dict(statuses)}')
+        p95 = statistics.quantiles([latency for _, latency in results], n=20)[-1] * 1000
+        self.stdout.write(f'  {label}: {throughput:7.0f} req/s, p95 {p95:.1f} ms')
@@ -0,0 +1,103 @@
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.utils import timezone
+
+from tours.models import Tour
+from tours.views import tour_list
+
+User = get_user_model()
+
+
+class Rollback(Exception):
+    pass
+
+
+class QueryTimer:
+    """execute_wrapper that adds up the time spent inside database calls"""
+
+    def __init__(self):
+        self.elapsed = 0.0
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.elapsed += time.perf_counter() - started
+            self.count += 1
+
+
+class Command(BaseCommand):
+    help = 'Time tour_list rendering at several catalog sizes, split into query and template time'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[100, 1000, 10000],
+            help='Numbers of published tours to render.',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Renders per size; the fastest one is reported.',
+        )
+
+    def handle(self, **options):
+        for size in options['sizes']:
+            try:
+                with transaction.atomic():
+                    self.create_tours(size)
+                    self.report(size, options['repeat'])
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def create_tours(self, size):
+        organizer = User.objects.create(username='bench_tour_list_organizer', user_type='organizer')
+        tour_date = timezone.now() + timedelta(days=30)
+        Tour.objects.bulk_create([
+            Tour(
+                title=f'Benchmark tour {i}',
+                description='A walk around campus and the department labs. ' * 5,
+                organizer=organizer,
+                price=i % 3 * 250,
+                duration_hours=2,
+                max_participants=40,
+                meeting_point='UAP main gate',
+                tour_date=tour_date,
+                status='published',
+            )
+            for i in range(size)
+        ], batch_size=1000)
+
+    def report(self, size, repeat):
+        request = RequestFactory().get('/tours/')
+        request.user = AnonymousUser()
+
+        best = None
+        for _ in range(repeat):
+            timer = QueryTimer()
+            with connection.execute_wrapper(timer):
+                started = time.perf_counter()
+                response = tour_list(request)
+                total = time.perf_counter() - started
+            if best is None or total < best[0]:
+                best = (total, timer.elapsed, timer.count, len(response.content))
+
+        total, query_time, queries, content_length = best
+        self.stdout.write(
+            f'{size:>6} tours: total {total * 1000:8.1f} ms, '
+            f'queries {query_time * 1000:7.1f} ms ({queries}), '
+            f'template+python {(total - query_time) * 1000:8.1f} ms, '
+            f'{content_length / 1024:.0f} KB'
+        )
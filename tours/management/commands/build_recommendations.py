@@ -0,0 +1,141 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from tours.models import Booking, Review, Tour, TourSimilarity, UserRecommendation, Wishlist
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # only this offline job needs the scientific stack
+    np = sparse = None
+
+# How strongly each kind of interaction ties a tourist to a tour
+BOOKING_WEIGHT = 3.0
+WISHLIST_WEIGHT = 1.0
+REVIEW_WEIGHT_PER_STAR = 0.5
+
+
+class Command(BaseCommand):
+    help = 'Rebuild similar-tour and personalized recommendations from bookings, wishlists and reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=10,
+            help='Neighbors stored per tour and recommendations stored per tourist.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Tourists scored per sparse matrix product.',
+        )
+
+    def handle(self, **options):
+        if np is None:
+            raise CommandError('build_recommendations needs numpy and scipy installed.')
+
+        started = time.perf_counter()
+        users, tours, weights = self.load_interactions()
+        if not len(weights):
+            self.stdout.write('No interactions yet, nothing to build.')
+            return
+
+        user_ids, user_index = np.unique(users, return_inverse=True)
+        tour_ids, tour_index = np.unique(tours, return_inverse=True)
+        # Duplicate (user, tour) pairs are summed when converting to CSR
+        interactions = sparse.coo_matrix(
+            (weights, (user_index, tour_index)), shape=(len(user_ids), len(tour_ids))
+        ).tocsr()
+
+        similarity = self.item_similarity(interactions)
+        upcoming = Tour.objects.filter(status='published', tour_date__gt=timezone.now())
+        bookable = np.isin(tour_ids, list(upcoming.values_list('id', flat=True)))
+
+        similar_rows = list(self.similar_tours(similarity, tour_ids, bookable, options['top']))
+        user_rows = list(self.user_recommendations(
+            interactions, similarity, user_ids, tour_ids, bookable, options['top'], options['chunk_size']
+        ))
+
+        with transaction.atomic():
+            TourSimilarity.objects.all().delete()
+            TourSimilarity.objects.bulk_create(similar_rows, batch_size=1000)
+            UserRecommendation.objects.all().delete()
+            UserRecommendation.objects.bulk_create(user_rows, batch_size=1000)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Built {len(similar_rows)} tour neighbors and {len(user_rows)} user recommendations '
+            f'from {interactions.nnz} interactions ({len(user_ids)} tourists x {len(tour_ids)} tours) '
+            f'in {time.perf_counter() - started:.1f}s.'
+        ))
+
+    def load_interactions(self):
+        """Columnar (user, tour, weight) arrays straight from values_list"""
+        bookings = np.array(
+            Booking.objects.exclude(status='cancelled').values_list('tourist_id', 'tour_id'), dtype=np.int64
+        ).reshape(-1, 2)
+        wishlists = np.array(
+            Wishlist.objects.values_list('tourist_id', 'tour_id'), dtype=np.int64
+        ).reshape(-1, 2)
+        reviews = np.array(
+            Review.objects.values_list('tourist_id', 'tour_id', 'rating'), dtype=np.int64
+        ).reshape(-1, 3)
+
+        users = np.concatenate([bookings[:, 0], wishlists[:, 0], reviews[:, 0]])
+        tours = np.concatenate([bookings[:, 1], wishlists[:, 1], reviews[:, 1]])
+        weights = np.concatenate([
+            np.full(len(bookings), BOOKING_WEIGHT),
+            np.full(len(wishlists), WISHLIST_WEIGHT),
+            reviews[:, 2] * REVIEW_WEIGHT_PER_STAR,
+        ])
+        return users, tours, weights
+
+    def item_similarity(self, interactions):
+        """Cosine similarity between tour columns, without self-similarity"""
+        norms = np.sqrt(np.asarray(interactions.multiply(interactions).sum(axis=0))).ravel()
+        norms[norms == 0] = 1.0
+        normalized = interactions @ sparse.diags(1.0 / norms)
+        similarity = (normalized.T @ normalized).tocsr()
+        similarity.setdiag(0)
+        similarity.eliminate_zeros()
+        return similarity
+
+    def top_n(self, scores, top):
+        """Indexes of the highest positive scores, best first"""
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > top:
+            candidates = candidates[np.argpartition(-scores[candidates], top)[:top]]
+        return candidates[np.argsort(-scores[candidates])]
+
+    def similar_tours(self, similarity, tour_ids, bookable, top):
+        for row in range(similarity.shape[0]):
+            start, end = similarity.indptr[row], similarity.indptr[row + 1]
+            columns = similarity.indices[start:end]
+            scores = np.where(bookable[columns], similarity.data[start:end], 0)
+            for rank, position in enumerate(self.top_n(scores, top), start=1):
+                yield TourSimilarity(
+                    tour_id=int(tour_ids[row]),
+                    similar_tour_id=int(tour_ids[columns[position]]),
+                    score=float(scores[position]),
+                    rank=rank,
+                )
+
+    def user_recommendations(self, interactions, similarity, user_ids, tour_ids, bookable, top, chunk_size):
+        for start in range(0, interactions.shape[0], chunk_size):
+            chunk = interactions[start:start + chunk_size]
+            scores = (chunk @ similarity).toarray()
+            # Never recommend what the tourist already booked, wishlisted or reviewed
+            scores[chunk.nonzero()] = 0
+            scores[:, ~bookable] = 0
+            for offset, user_scores in enumerate(scores):
+                for rank, column in enumerate(self.top_n(user_scores, top), start=1):
+                    yield UserRecommendation(
+                        user_id=int(user_ids[start + offset]),
+                        tour_id=int(tour_ids[column]),
+                        score=float(user_scores[column]),
+                        rank=rank,
+                    )
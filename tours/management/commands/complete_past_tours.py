@@ -0,0 +1,70 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from tours.models import Booking, DepartmentStats, Tour, TourCalendarEntry, WaitlistEntry
+
+
+class Command(BaseCommand):
+    help = 'Mark tours that have taken place, and their confirmed bookings, as completed'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=float,
+            default=getattr(settings, 'TOUR_COMPLETION_GRACE_HOURS', 24),
+            help='How long after tour_date a tour stays published before it is completed.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Tours completed per transaction.',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep sweeping on an interval instead of exiting (for running without cron).',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=3600.0,
+            help='Seconds between sweeps with --loop.',
+        )
+
+    def handle(self, **options):
+        while True:
+            tours, bookings = self.sweep(options['hours'], options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Completed {tours} tours and {bookings} bookings.'))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def sweep(self, hours, batch_size):
+        cutoff = timezone.now() - timedelta(hours=hours)
+        past = Tour.objects.filter(status='published', tour_date__lt=cutoff)
+
+        completed_tours = completed_bookings = 0
+        while True:
+            tour_ids = list(past.order_by('id').values_list('id', flat=True)[:batch_size])
+            if not tour_ids:
+                return completed_tours, completed_bookings
+
+            with transaction.atomic():
+                completed_bookings += Booking.objects.filter(tour_id__in=tour_ids, status='confirmed').update(
+                    status='completed'
+                )
+                completed_tours += Tour.objects.filter(id__in=tour_ids, status='published').update(
+                    status='completed', updated_at=timezone.now()
+                )
+                # Bulk updates skip the model signals, so clear derived state here
+                TourCalendarEntry.objects.filter(tour_id__in=tour_ids).delete()
+                WaitlistEntry.objects.filter(tour_id__in=tour_ids, status__in=['waiting', 'offered']).update(
+                    status='expired'
+                )
+                DepartmentStats.refresh_for_tours(tour_ids)
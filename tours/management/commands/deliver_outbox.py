@@ -0,0 +1,71 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from tours.models import OutboxMessage
+from tours.outbox import Throttle, deliver_batch
+
+
+class Command(BaseCommand):
+    help = 'Send pending email/SMS outbox messages in batches, with retry and dead-lettering'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--channel',
+            choices=[value for value, _ in OutboxMessage.CHANNEL_CHOICES],
+            action='append',
+            help='Channel to drain; repeat for several. Defaults to all channels.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Messages claimed and sent per SMTP session / SMS backend connection.',
+        )
+        parser.add_argument(
+            '--rate',
+            type=float,
+            help='Maximum messages per second per channel, overriding OUTBOX_RATE_LIMITS.',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling for new messages instead of exiting once the outbox is drained.',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5.0,
+            help='Seconds to wait between polls when nothing is due (with --loop).',
+        )
+
+    def handle(self, **options):
+        channels = options['channel'] or [value for value, _ in OutboxMessage.CHANNEL_CHOICES]
+        rate_limits = getattr(settings, 'OUTBOX_RATE_LIMITS', {})
+        throttles = {
+            channel: Throttle(options['rate'] if options['rate'] is not None else rate_limits.get(channel))
+            for channel in channels
+        }
+        totals = {'sent': 0, 'retried': 0, 'dead': 0}
+
+        while True:
+            handled = 0
+            for channel in channels:
+                sent, retried, dead = deliver_batch(channel, options['batch_size'], throttles[channel])
+                handled += sent + retried + dead
+                totals['sent'] += sent
+                totals['retried'] += retried
+                totals['dead'] += dead
+                if sent or retried or dead:
+                    self.stdout.write(f'{channel}: {sent} sent, {retried} to retry, {dead} dead-lettered')
+            if handled:
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Sent {totals["sent"]} messages; {totals["retried"]} scheduled for retry, '
+            f'{totals["dead"]} dead-lettered.'
+        ))
@@ -0,0 +1,89 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from tours.models import Booking, DepartmentStats, Tour, TourCalendarEntry
+from tours.signals import bookings_expired
+from tours.waitlist import expire_offers
+
+
+class Command(BaseCommand):
+    help = 'Cancel unpaid pending bookings past the payment deadline and release their seats and stale waitlist offers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=float,
+            default=getattr(settings, 'PAYMENT_DEADLINE_HOURS', 24),
+            help='Payment deadline, counted from the booking date.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Bookings cancelled per transaction.',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep sweeping on an interval instead of exiting (for running without cron).',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=60.0,
+            help='Seconds between sweeps with --loop.',
+        )
+
+    def handle(self, **options):
+        while True:
+            expired = self.sweep(options['hours'], options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Expired {expired} unpaid bookings.'))
+            self.stdout.write(self.style.SUCCESS(f'Expired {expire_offers()} unclaimed waitlist offers.'))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def sweep(self, hours, batch_size):
+        cutoff = timezone.now() - timedelta(hours=hours)
+        overdue = Booking.objects.filter(
+            status='pending',
+            payment_status__in=['pending', 'failed'],
+            booking_date__lt=cutoff,
+        )
+
+        expired, last_id = 0, 0
+        while True:
+            # Walk forward by id so rows skipped below aren't picked up again
+            candidates = list(overdue.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+            if not candidates:
+                return expired
+            last_id = candidates[-1]
+
+            with transaction.atomic():
+                # Lock the rows and re-check the status, so a booking paid since
+                # the first SELECT is neither cancelled nor reported as expired.
+                # Rows a payment is holding right now are left for the next sweep
+                rows = list(
+                    Booking.objects.select_for_update(skip_locked=True)
+                    .filter(id__in=candidates, status='pending')
+                    .values_list('id', 'tour_id', 'participants')
+                )
+                booking_ids = [booking_id for booking_id, _, _ in rows]
+                tour_ids = sorted({tour_id for _, tour_id, _ in rows})
+                released_seats = {}
+                for _, tour_id, participants in rows:
+                    released_seats[tour_id] = released_seats.get(tour_id, 0) + participants
+                Booking.objects.filter(id__in=booking_ids).update(status='cancelled', payment_status='failed')
+                for tour in Tour.objects.filter(id__in=tour_ids):
+                    TourCalendarEntry.refresh_for_tour(tour)
+                DepartmentStats.release_seats(released_seats)
+                if booking_ids:
+                    transaction.on_commit(lambda booking_ids=booking_ids, tour_ids=tour_ids: bookings_expired.send(
+                        sender=Booking, booking_ids=booking_ids, tour_ids=tour_ids
+                    ))
+            expired += len(booking_ids)
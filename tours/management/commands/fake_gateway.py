@@ -0,0 +1,107 @@
+import json
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from tours.models import Booking
+from tours.payments import sign_payload
+
+
+class Command(BaseCommand):
+    help = 'Local stand-in for a payment gateway that fires signed webhook callbacks and reports throughput'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--events',
+            type=int,
+            default=1000,
+            help='Number of distinct payment callbacks to send.',
+        )
+        parser.add_argument(
+            '--duplicates',
+            type=float,
+            default=0.1,
+            help='Fraction of callbacks to deliver a second time, like a gateway retrying.',
+        )
+        parser.add_argument(
+            '--url',
+            help='Webhook URL of a running server. Without it callbacks go through the in-process test client.',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=8,
+            help='Parallel connections when sending to --url.',
+        )
+
+    def handle(self, **options):
+        callbacks = self.build_callbacks(options['events'])
+        retries = random.sample(callbacks, int(len(callbacks) * options['duplicates']))
+        deliveries = callbacks + retries
+        random.shuffle(deliveries)
+
+        started = time.perf_counter()
+        if options['url']:
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                statuses = list(pool.map(lambda body: self.post_http(options['url'], body), deliveries))
+        else:
+            client = Client(HTTP_HOST='localhost')
+            statuses = [self.post_local(client, body) for body in deliveries]
+        elapsed = time.perf_counter() - started
+
+        accepted = statuses.count(202)
+        duplicates = statuses.count(200)
+        errors = len(statuses) - accepted - duplicates
+        self.stdout.write(
+            f'Sent {len(deliveries)} callbacks in {elapsed:.2f}s '
+            f'({len(deliveries) / elapsed * 60:.0f}/min): '
+            f'{accepted} queued, {duplicates} deduplicated, {errors} errors'
+        )
+        if errors:
+            raise CommandError(f'{errors} callbacks were rejected')
+
+    def build_callbacks(self, count):
+        """Settle real pending bookings first, then pad with unknown transactions"""
+        pending = Booking.objects.filter(payment_status='pending').exclude(transaction_id='')
+        targets = list(pending.values_list('transaction_id', 'total_price', 'payment_method')[:count])
+        while len(targets) < count:
+            targets.append((f'FAKE-{uuid.uuid4().hex[:12]}', 100, 'bkash'))
+
+        return [
+            json.dumps({
+                'event_id': uuid.uuid4().hex,
+                'transaction_id': transaction_id,
+                'amount': str(amount),
+                'status': 'success',
+                'payment_method': payment_method,
+            }).encode()
+            for transaction_id, amount, payment_method in targets
+        ]
+
+    def post_local(self, client, body):
+        response = client.post(
+            '/payments/webhook/',
+            data=body,
+            content_type='application/json',
+            headers={'X-Signature': sign_payload(body)},
+        )
+        return response.status_code
+
+    def post_http(self, url, body):
+        request = Request(url, data=body, method='POST', headers={
+            'Content-Type': 'application/json',
+            'X-Signature': sign_payload(body),
+        })
+        try:
+            with urlopen(request, timeout=10) as response:
+                return response.status
+        except HTTPError as e:
+            return e.code
+        except URLError:
+            return 0
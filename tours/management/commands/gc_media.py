@@ -0,0 +1,83 @@
+import time
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from uap_tours.storage import MEDIA_FIELDS
+
+
+class Command(BaseCommand):
+    help = 'Delete media files that no Tour, UAPDepartment or CustomUser row references any more'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age-hours',
+            type=float,
+            default=24,
+            help='Leave files younger than this alone; their row may not be committed yet.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Files deleted between pauses.',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0.0,
+            help='Seconds to pause between batches to spare the disk.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report what would be deleted.',
+        )
+
+    def handle(self, **options):
+        referenced = set()
+        prefixes = set()
+        for label, field_name in MEDIA_FIELDS:
+            model = apps.get_model(label)
+            prefixes.add(model._meta.get_field(field_name).upload_to.rstrip('/'))
+            names = model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+            referenced.update(names.values_list(field_name, flat=True).iterator(chunk_size=5000))
+        self.stdout.write(f'{len(referenced)} media files are referenced.')
+
+        cutoff = timezone.now() - timedelta(hours=options['min_age_hours'])
+        orphans = [
+            name
+            for prefix in sorted(prefixes)
+            for name in self.walk(prefix)
+            if name not in referenced and default_storage.get_modified_time(name) < cutoff
+        ]
+        freed = sum(default_storage.size(name) for name in orphans)
+
+        if options['dry_run']:
+            for name in orphans:
+                self.stdout.write(f'Would delete {name}')
+            self.stdout.write(f'{len(orphans)} orphaned files ({freed / 1024:.0f} KiB) would be deleted.')
+            return
+
+        batch_size = options['batch_size']
+        for start in range(0, len(orphans), batch_size):
+            for name in orphans[start:start + batch_size]:
+                # delete() re-checks references, so a row saved since the scan keeps its file
+                default_storage.delete(name)
+            self.stdout.write(f'Deleted {min(start + batch_size, len(orphans))}/{len(orphans)} files...')
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f'Removed {len(orphans)} orphaned files ({freed / 1024:.0f} KiB).'))
+
+    def walk(self, directory):
+        if not default_storage.exists(directory):
+            return
+        subdirectories, files = default_storage.listdir(directory)
+        for filename in files:
+            yield f'{directory}/{filename}'
+        for subdirectory in subdirectories:
+            yield from self.walk(f'{directory}/{subdirectory}')
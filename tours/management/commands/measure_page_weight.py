@@ -0,0 +1,74 @@
+import gzip
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+
+from uap_tours.static import HASHED_NAME
+
+ASSET_URL = re.compile(r'(?:src|href)="(%s[^"]+)"' % re.escape(settings.STATIC_URL))
+
+
+class Command(BaseCommand):
+    help = 'Report bytes transferred for first and repeat views of the main pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths',
+            nargs='*',
+            default=['/', '/tours/', '/accounts/login/'],
+            help='Pages to measure.',
+        )
+        parser.add_argument(
+            '--debug-urls',
+            action='store_true',
+            help='Measure with DEBUG static URLs (unhashed) instead of the collectstatic manifest.',
+        )
+
+    def handle(self, **options):
+        if not options['debug_urls'] and not getattr(settings, 'STATIC_MANIFEST', False):
+            self.stderr.write(
+                'STATIC_MANIFEST is not set, so pages link unhashed static files. '
+                'Run collectstatic and this command with STATIC_MANIFEST=1 to measure the manifest.'
+            )
+        overrides = {} if options['debug_urls'] else {'DEBUG': False, 'ALLOWED_HOSTS': ['localhost']}
+        with override_settings(**overrides):
+            client = Client(HTTP_HOST='localhost')
+            for path in options['paths']:
+                self.measure(client, path)
+
+    def measure(self, client, path):
+        response = client.get(path)
+        html = response.content
+        html_bytes = len(gzip.compress(html))
+
+        first_view = repeat_view = html_bytes
+        revalidations = 0
+        for url in sorted(set(ASSET_URL.findall(html.decode()))):
+            name = url[len(settings.STATIC_URL):]
+            asset_bytes = self.asset_size(name)
+            first_view += asset_bytes
+            if not HASHED_NAME.search(name):
+                # Unhashed assets are revalidated on every view
+                revalidations += 1
+
+        self.stdout.write(
+            f'{path}: HTML {len(html)} B ({html_bytes} B gzip), '
+            f'first view {first_view} B, repeat view {repeat_view} B '
+            f'+ {revalidations} revalidation request{"s" if revalidations != 1 else ""}'
+        )
+
+    def asset_size(self, name):
+        """Size on the wire, preferring the precompressed copy collectstatic wrote"""
+        for suffix in ('.br', '.gz', ''):
+            candidate = settings.STATIC_ROOT / f'{name}{suffix}'
+            if candidate.is_file():
+                return candidate.stat().st_size
+
+        source = finders.find(re.sub(r'\.[0-9a-f]{12}(\.[^/.]+)$', r'\1', name))
+        if source:
+            with open(source, 'rb') as f:
+                return len(gzip.compress(f.read()))
+        return 0
@@ -0,0 +1,119 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from tours.models import PaymentWebhookEvent
+from tours.payments import apply_settlements
+
+
+class Command(BaseCommand):
+    help = 'Apply queued payment webhook events to bookings and payments in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Events claimed and applied per transaction.',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling for new events instead of exiting once the queue is empty.',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='Seconds to wait between polls when the queue is empty (with --loop).',
+        )
+
+    def handle(self, **options):
+        processed = 0
+        started = time.perf_counter()
+
+        while True:
+            handled = self.process_batch(options['batch_size'])
+            processed += handled
+            if handled:
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f'Applied {processed} events ({processed / elapsed * 60:.0f}/min)')
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} payment events.'))
+
+    def process_batch(self, batch_size):
+        # Locked rows are skipped, so several workers can drain the queue side by side
+        with transaction.atomic():
+            events = list(
+                PaymentWebhookEvent.objects.select_for_update(skip_locked=True)
+                .filter(status='pending')
+                .order_by('id')[:batch_size]
+            )
+            if not events:
+                return 0
+
+            # Events for one transaction must apply in order (e.g. success then
+            # refunded). Only the earliest pending one is applied; later ones
+            # stay pending for the next batch, including when the earlier event
+            # is locked by another worker
+            transaction_ids = {event.id: self.transaction_id(event) for event in events}
+            earlier = {}
+            for event_id, payload in (
+                PaymentWebhookEvent.objects.filter(status='pending', id__lt=events[-1].id)
+                .exclude(id__in=transaction_ids)
+                .values_list('id', 'payload')
+            ):
+                if isinstance(payload, dict):
+                    transaction_id = str(payload.get('transaction_id') or '').strip()
+                    earlier[transaction_id] = min(event_id, earlier.get(transaction_id, event_id))
+
+            seen, claimed = set(), []
+            for event in events:
+                transaction_id = transaction_ids[event.id]
+                if transaction_id in seen or earlier.get(transaction_id, event.id) < event.id:
+                    continue
+                seen.add(transaction_id)
+                claimed.append(event)
+
+            failures = self.apply(claimed)
+
+            now = timezone.now()
+            for event in claimed:
+                event.processed_at = now
+                event.error = failures.get(event.id, '')
+                event.status = 'failed' if event.error else 'processed'
+            PaymentWebhookEvent.objects.bulk_update(claimed, ['status', 'error', 'processed_at'])
+        return len(claimed)
+
+    def apply(self, events):
+        """Apply events as one batch, or one by one if the batch fails; returns {event id: error}"""
+        rows = [self.row(event) for event in events]
+        try:
+            with transaction.atomic():
+                return {row['event_id']: reason for row, reason in apply_settlements(rows)}
+        except Exception as exc:
+            self.stderr.write(f'Batch failed ({exc!r}); applying its {len(rows)} events one by one')
+
+        # Isolate the failing event so it can't hold the rest of the queue hostage
+        failures = {}
+        for row in rows:
+            try:
+                with transaction.atomic():
+                    failures.update({row['event_id']: reason for row, reason in apply_settlements([row])})
+            except Exception as exc:
+                failures[row['event_id']] = exc.__class__.__name__[:100]
+        return failures
+
+    def row(self, event):
+        row = dict(event.payload) if isinstance(event.payload, dict) else {}
+        row['event_id'] = event.id
+        return row
+
+    def transaction_id(self, event):
+        return str(self.row(event).get('transaction_id') or '').strip()
@@ -0,0 +1,124 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from tours.models import NotificationArchive, UserNotification
+from tours.notifications import invalidate_recent
+
+
+class Command(BaseCommand):
+    help = 'Move old read user notifications into the compact archive table in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=getattr(settings, 'NOTIFICATION_RETENTION_DAYS', 90),
+            help='Archive read notifications older than this many days.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows archived and deleted per transaction.',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0.0,
+            help='Seconds to pause between batches so other writers can get the lock.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many rows would be pruned.',
+        )
+
+    def handle(self, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        batch_size = options['batch_size']
+        expired = UserNotification.objects.filter(is_read=True, created_at__lt=cutoff)
+
+        before = self.measure()
+        self.report('Before', before)
+
+        if options['dry_run']:
+            self.stdout.write(f'{expired.count()} read notifications older than {options["days"]} days would be pruned.')
+            return
+
+        pruned = 0
+        while True:
+            rows = list(
+                expired.order_by('id').values_list('id', 'notification_id', 'user_id')[:batch_size]
+            )
+            if not rows:
+                break
+            pruned += self.archive_batch(rows)
+            self.stdout.write(f'Pruned {pruned} rows...')
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.report('After', self.measure())
+        self.stdout.write(self.style.SUCCESS(f'Archived and removed {pruned} read notifications.'))
+
+    def archive_batch(self, rows):
+        recipients = {}
+        for _, notification_id, user_id in rows:
+            recipients.setdefault(notification_id, []).append(user_id)
+
+        # One short transaction per batch keeps lock hold times bounded
+        with transaction.atomic():
+            archives = {
+                archive.notification_id: archive
+                for archive in NotificationArchive.objects.select_for_update().filter(
+                    notification_id__in=recipients
+                )
+            }
+            now = timezone.now()
+            new_archives = []
+            for notification_id, user_ids in recipients.items():
+                archive = archives.get(notification_id)
+                if archive is None:
+                    archive = NotificationArchive(notification_id=notification_id)
+                    new_archives.append(archive)
+                archive.add_recipients(user_ids)
+                archive.archived_at = now
+
+            NotificationArchive.objects.bulk_create(new_archives)
+            NotificationArchive.objects.bulk_update(
+                list(archives.values()),
+                ['recipients', 'recipient_count', 'archived_at'],
+            )
+            deleted, _ = UserNotification.objects.filter(id__in=[row[0] for row in rows]).delete()
+        invalidate_recent({row[2] for row in rows})
+        return deleted
+
+    def measure(self, runs=20):
+        """Row count plus the latency of the my_notifications query for the busiest user."""
+        total_rows = UserNotification.objects.count()
+        busiest = (
+            UserNotification.objects.values('user_id')
+            .annotate(total=Count('id'))
+            .order_by('-total')
+            .first()
+        )
+        if not busiest:
+            return total_rows, 0.0
+
+        started = time.perf_counter()
+        for _ in range(runs):
+            list(UserNotification.objects.filter(user_id=busiest['user_id']).order_by('-created_at'))
+        latency_ms = (time.perf_counter() - started) * 1000 / runs
+        return total_rows, latency_ms
+
+    def report(self, label, measurement):
+        total_rows, latency_ms = measurement
+        self.stdout.write(
+            f'{label}: {total_rows} UserNotification rows, '
+            f'busiest inbox query {latency_ms:.2f} ms'
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from tours.models import DepartmentStats, UAPDepartment
+
+
+class Command(BaseCommand):
+    help = 'Recompute department landing stats, e.g. nightly so tours that have started drop out of "upcoming"'
+
+    def handle(self, **options):
+        department_ids = list(UAPDepartment.objects.values_list('id', flat=True))
+        for department_id in department_ids:
+            DepartmentStats.refresh(department_id)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt stats for {len(department_ids)} departments.'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from tours.models import Booking, Review, Tour, Wishlist
+from tours.trending import event_log_score, log_add
+
+
+class Command(BaseCommand):
+    help = 'Recompute every tour trending score from booking, wishlist and review history'
+
+    def handle(self, **options):
+        scores = {}
+        sources = (
+            ('booking', Booking.objects.values_list('tour_id', 'booking_date')),
+            ('wishlist', Wishlist.objects.values_list('tour_id', 'added_date')),
+            ('review', Review.objects.values_list('tour_id', 'created_at')),
+        )
+        for kind, events in sources:
+            for tour_id, when in events.iterator(chunk_size=5000):
+                # Start from log2(1) = 0, the score of a tour with no events
+                scores[tour_id] = log_add(scores.get(tour_id, 0.0), event_log_score(kind, when))
+
+        tours = [Tour(id=tour_id, trending_score=score) for tour_id, score in scores.items()]
+        with transaction.atomic():
+            Tour.objects.exclude(id__in=list(scores)).update(trending_score=0)
+            Tour.objects.bulk_update(tours, ['trending_score'], batch_size=1000)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt trending scores for {len(tours)} tours.'))
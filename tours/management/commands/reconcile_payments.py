@@ -0,0 +1,64 @@
+import csv
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tours.payments import apply_settlements
+
+
+class Command(BaseCommand):
+    help = 'Match a provider settlement CSV against bookings and confirm their payments in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'settlement_file',
+            help='CSV with transaction_id, amount, status and optional payment_method columns.',
+        )
+        parser.add_argument(
+            '--report',
+            default='reconcile_mismatches.csv',
+            help='Where to write rows that could not be matched.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Settlement rows matched per query and transaction.',
+        )
+
+    def handle(self, **options):
+        batch_size = options['batch_size']
+        processed = mismatched = 0
+
+        try:
+            settlement_file = open(options['settlement_file'], newline='', encoding='utf-8-sig')
+        except OSError as e:
+            raise CommandError(f'Cannot open settlement file: {e}')
+
+        with settlement_file, open(options['report'], 'w', newline='', encoding='utf-8') as report_file:
+            reader = csv.DictReader(settlement_file)
+            missing = {'transaction_id', 'amount', 'status'} - set(reader.fieldnames or [])
+            if missing:
+                raise CommandError(f'Settlement file is missing columns: {", ".join(sorted(missing))}')
+
+            report = csv.writer(report_file)
+            report.writerow(['line', 'transaction_id', 'amount', 'status', 'reason'])
+
+            # Only one batch of rows is held in memory at a time
+            while True:
+                batch = list(islice(reader, batch_size))
+                if not batch:
+                    break
+                # Row numbers as a spreadsheet would show them, after the header
+                for line, row in enumerate(batch, start=processed + 2):
+                    row['line'] = line
+                for row, reason in apply_settlements(batch):
+                    report.writerow([row['line'], row.get('transaction_id'), row.get('amount'), row.get('status'), reason])
+                    mismatched += 1
+                processed += len(batch)
+                self.stdout.write(f'Processed {processed} rows ({mismatched} mismatches)...')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Reconciled {processed - mismatched} of {processed} settlement rows. '
+            f'Mismatches written to {options["report"]}.'
+        ))
@@ -0,0 +1,68 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tours.models import Booking
+from tours.tickets import TICKET_KINDS, ensure_ticket, ticket_details, ticket_digest, ticket_name
+
+
+def _init_worker():
+    # Needed when the pool spawns fresh interpreters instead of forking
+    django.setup()
+
+
+def _render(job):
+    details, kind = job
+    return ensure_ticket(details, kind)
+
+
+class Command(BaseCommand):
+    help = 'Pre-render ticket PNGs and PDFs for confirmed bookings of upcoming tours in a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tour',
+            type=int,
+            help='Only render tickets for this tour id.',
+        )
+        parser.add_argument(
+            '--kind',
+            choices=TICKET_KINDS,
+            action='append',
+            help='Artifact to render; repeat for several. Defaults to all kinds.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Processes used for rendering.',
+        )
+
+    def handle(self, **options):
+        kinds = options['kind'] or TICKET_KINDS
+        bookings = Booking.objects.filter(
+            status='confirmed',
+            tour__status='published',
+            tour__tour_date__gt=timezone.now(),
+        ).select_related('tour', 'tourist')
+        if options['tour']:
+            bookings = bookings.filter(tour_id=options['tour'])
+
+        # Tickets already on disk under their content name are up to date
+        jobs = []
+        for booking in bookings.iterator(chunk_size=1000):
+            details = ticket_details(booking)
+            digest = ticket_digest(details)
+            jobs.extend((details, kind) for kind in kinds if not default_storage.exists(ticket_name(digest, kind)))
+
+        if jobs:
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as pool:
+                for rendered, _ in enumerate(pool.map(_render, jobs, chunksize=16), start=1):
+                    if rendered % 500 == 0:
+                        self.stdout.write(f'Rendered {rendered}/{len(jobs)} tickets...')
+
+        self.stdout.write(self.style.SUCCESS(f'Rendered {len(jobs)} ticket files.'))
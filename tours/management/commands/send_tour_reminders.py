@@ -0,0 +1,105 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from tours.models import Booking, Notification, Tour, TourReminder
+from tours.notifications import fan_out
+
+
+class Command(BaseCommand):
+    help = 'Send reminder notifications for published tours starting within the configured windows'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--windows',
+            type=int,
+            nargs='+',
+            default=list(getattr(settings, 'TOUR_REMINDER_WINDOWS_HOURS', (24, 2))),
+            help='Hours before the start of a tour at which to remind booked tourists.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Tours reminded per transaction.',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep ticking on an interval instead of exiting (for running without cron).',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=60.0,
+            help='Seconds between ticks with --loop.',
+        )
+
+    def handle(self, **options):
+        windows = sorted(set(options['windows']))
+        while True:
+            reminded = self.tick(windows, options['batch_size'])
+            self.stdout.write(f'{timezone.now():%Y-%m-%d %H:%M:%S} sent {reminded} tour reminders')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def tick(self, windows, batch_size):
+        now = timezone.now()
+        upcoming = Tour.objects.filter(
+            status='published',
+            tour_date__gt=now,
+            tour_date__lte=now + timedelta(hours=windows[-1]),
+        )
+        already_sent = set(TourReminder.objects.filter(tour__in=upcoming).values_list('tour_id', 'window'))
+
+        due = []
+        for tour in upcoming.only('id', 'title', 'tour_date', 'meeting_point', 'organizer_id').iterator(chunk_size=2000):
+            # Only the tightest window applies, so a tour found 1h out gets the 2h reminder, not the 24h one
+            window = next(hours for hours in windows if tour.tour_date <= now + timedelta(hours=hours))
+            if (tour.id, window) not in already_sent:
+                due.append((tour, window))
+
+        reminded = 0
+        for start in range(0, len(due), batch_size):
+            reminded += self.send_batch(due[start:start + batch_size])
+        return reminded
+
+    def send_batch(self, batch):
+        recipients = {}
+        bookings = Booking.objects.filter(
+            tour_id__in=[tour.id for tour, _ in batch], status='confirmed'
+        ).values_list('tour_id', 'tourist_id').distinct()
+        for tour_id, tourist_id in bookings:
+            recipients.setdefault(tour_id, []).append(tourist_id)
+
+        try:
+            with transaction.atomic():
+                reminders = []
+                for tour, window in batch:
+                    notification = None
+                    if tour.id in recipients:
+                        notification = Notification.objects.create(
+                            organizer_id=tour.organizer_id,
+                            tour=tour,
+                            title=f'Reminder: {tour.title}',
+                            message=(
+                                f'Your tour starts {timezone.localtime(tour.tour_date):%a %b %d at %H:%M} '
+                                f'at {tour.meeting_point}.'
+                            ),
+                            notification_type='reminder',
+                            send_to_all_tourists=False,
+                            is_sent=True,
+                        )
+                        fan_out(notification, recipients[tour.id])
+                    reminders.append(TourReminder(tour=tour, window=window, notification=notification))
+                # The unique (tour, window) constraint stops a second worker from sending twice
+                TourReminder.objects.bulk_create(reminders)
+        except IntegrityError:
+            self.stderr.write('Skipped a batch already reminded by another worker.')
+            return 0
+        return len(batch)
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0006_alter_tour_category_notification_usernotification'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipients', models.BinaryField(default=bytes)),
+                ('recipient_count', models.PositiveIntegerField(default=0)),
+                ('archived_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='usernotification',
+            index=models.Index(fields=['user', '-created_at'], name='tours_usern_user_id_cd16a2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usernotification',
+            index=models.Index(fields=['is_read', 'created_at'], name='tours_usern_is_read_df2c77_idx'),
+        ),
+        migrations.AddField(
+            model_name='notificationarchive',
+            name='notification',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='archive', to='tours.notification'),
+        ),
+    ]
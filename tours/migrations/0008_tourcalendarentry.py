@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+from django.utils import timezone
+
+
+def build_calendar(apps, schema_editor):
+    Tour = apps.get_model('tours', 'Tour')
+    Booking = apps.get_model('tours', 'Booking')
+    TourCalendarEntry = apps.get_model('tours', 'TourCalendarEntry')
+
+    # Unpaid pending bookings hold their seats too, as in Tour.available_spots
+    held = dict(
+        Booking.objects.filter(status__in=['pending', 'confirmed'])
+        .values('tour_id')
+        .annotate(total=Sum('participants'))
+        .values_list('tour_id', 'total')
+    )
+    TourCalendarEntry.objects.bulk_create([
+        TourCalendarEntry(
+            tour_id=tour.id,
+            date=timezone.localtime(tour.tour_date).date(),
+            department_id=tour.department_id,
+            remaining_seats=tour.max_participants - (held.get(tour.id) or 0),
+        )
+        for tour in Tour.objects.filter(status='published')
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0007_notificationarchive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TourCalendarEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('remaining_seats', models.IntegerField()),
+                ('department', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='tours.uapdepartment')),
+                ('tour', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='calendar_entry', to='tours.tour')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', 'department'], name='tours_tourc_date_a2eb9b_idx'), models.Index(fields=['department', 'date'], name='tours_tourc_departm_91ed3b_idx')],
+            },
+        ),
+        migrations.RunPython(build_calendar, migrations.RunPython.noop),
+    ]
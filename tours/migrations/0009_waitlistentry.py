@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0008_tourcalendarentry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('participants', models.IntegerField(default=1)),
+                ('status', models.CharField(choices=[('waiting', 'Waiting'), ('offered', 'Seat Offered'), ('booked', 'Booked'), ('expired', 'Offer Expired')], default='waiting', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('offered_at', models.DateTimeField(blank=True, null=True)),
+                ('tour', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='tours.tour')),
+                ('tourist', models.ForeignKey(limit_choices_to={'user_type': 'tourist'}, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tour', 'status', 'created_at'], name='tours_waitl_tour_id_fc2989_idx')],
+                'unique_together': {('tour', 'tourist')},
+            },
+        ),
+    ]
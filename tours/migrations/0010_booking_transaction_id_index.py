@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0009_waitlistentry'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='booking',
+            name='transaction_id',
+            field=models.CharField(blank=True, db_index=True, max_length=100),
+        ),
+    ]
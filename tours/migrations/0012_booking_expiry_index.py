@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0011_paymentwebhookevent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['status', 'payment_status', 'booking_date'], name='tours_booki_status_f31779_idx'),
+        ),
+    ]
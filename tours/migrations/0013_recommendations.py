@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0012_booking_expiry_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TourSimilarity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('similar_tour', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_to', to='tours.tour')),
+                ('tour', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarities', to='tours.tour')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tour', 'rank'], name='tours_tours_tour_id_a107be_idx')],
+                'unique_together': {('tour', 'similar_tour')},
+            },
+        ),
+        migrations.CreateModel(
+            name='UserRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('tour', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='tours.tour')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'rank'], name='tours_userr_user_id_d982cf_idx')],
+                'unique_together': {('user', 'tour')},
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0013_recommendations'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tour',
+            name='trending_score',
+            field=models.FloatField(default=0, help_text='Time-decayed popularity, see tours/trending.py'),
+        ),
+        migrations.AddIndex(
+            model_name='tour',
+            index=models.Index(fields=['status', '-trending_score'], name='tours_tour_status_c1087a_idx'),
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:46
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+# Frozen copy of tours.models.department_key; migrations must not import live code
+DEPARTMENT_NOISE_WORDS = {'department', 'dept', 'of', 'the', 'and'}
+
+
+def department_key(text):
+    words = re.findall(r'[a-z0-9]+', (text or '').lower())
+    return ''.join(word for word in words if word not in DEPARTMENT_NOISE_WORDS)
+
+
+def build_department_stats(apps, schema_editor):
+    UAPDepartment = apps.get_model('tours', 'UAPDepartment')
+    Tour = apps.get_model('tours', 'Tour')
+    Booking = apps.get_model('tours', 'Booking')
+    Review = apps.get_model('tours', 'Review')
+    DepartmentStats = apps.get_model('tours', 'DepartmentStats')
+
+    departments = list(UAPDepartment.objects.all())
+    for department in departments:
+        department.key = department_key(department.name)
+    UAPDepartment.objects.bulk_update(departments, ['key'])
+
+    upcoming = Tour.objects.filter(status='published', tour_date__gte=timezone.now(), department__isnull=False)
+    capacity = {
+        row['department_id']: row
+        for row in upcoming.values('department_id').annotate(tours=Count('id'), seats=Sum('max_participants'))
+    }
+    booked = dict(
+        Booking.objects.filter(tour__in=upcoming, status__in=['pending', 'confirmed'])
+        .values('tour__department_id')
+        .annotate(seats=Sum('participants'))
+        .values_list('tour__department_id', 'seats')
+    )
+    ratings = {
+        row['tour__department_id']: row
+        for row in Review.objects.filter(tour__department__isnull=False)
+        .values('tour__department_id')
+        .annotate(total=Sum('rating'), count=Count('id'))
+    }
+    DepartmentStats.objects.bulk_create([
+        DepartmentStats(
+            department_id=department.id,
+            upcoming_tours=capacity.get(department.id, {}).get('tours', 0),
+            seats_left=(capacity.get(department.id, {}).get('seats') or 0) - (booked.get(department.id) or 0),
+            rating_sum=ratings.get(department.id, {}).get('total') or 0,
+            rating_count=ratings.get(department.id, {}).get('count', 0),
+        )
+        for department in departments
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0014_tour_trending_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DepartmentStats',
+            fields=[
+                ('department', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='tours.uapdepartment')),
+                ('upcoming_tours', models.PositiveIntegerField(default=0)),
+                ('seats_left', models.IntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='uapdepartment',
+            name='key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=200),
+        ),
+        migrations.RunPython(build_department_stats, migrations.RunPython.noop),
+    ]
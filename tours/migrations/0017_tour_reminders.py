@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0016_outboxmessage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TourReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window', models.PositiveIntegerField(help_text='Hours before the tour starts')),
+                ('sent_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='tour',
+            index=models.Index(fields=['status', 'tour_date'], name='tours_tour_status_e73ce0_idx'),
+        ),
+        migrations.AddField(
+            model_name='tourreminder',
+            name='notification',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='tours.notification'),
+        ),
+        migrations.AddField(
+            model_name='tourreminder',
+            name='tour',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='tours.tour'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='tourreminder',
+            unique_together={('tour', 'window')},
+        ),
+    ]
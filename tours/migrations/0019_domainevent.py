@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:56
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0018_attendance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DomainEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=50)),
+                ('occurred_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('partition', models.PositiveIntegerField(editable=False)),
+                ('actor_id', models.BigIntegerField(blank=True, null=True)),
+                ('tour_id', models.BigIntegerField(blank=True, null=True)),
+                ('booking_id', models.BigIntegerField(blank=True, null=True)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['partition', 'id'], name='tours_domai_partiti_eebba8_idx'), models.Index(fields=['kind', 'id'], name='tours_domai_kind_c272b3_idx')],
+            },
+        ),
+    ]
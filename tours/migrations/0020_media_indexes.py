@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0019_domainevent'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tour',
+            name='image',
+            field=models.ImageField(blank=True, db_index=True, null=True, upload_to='tours/'),
+        ),
+        migrations.AlterField(
+            model_name='tour',
+            name='qr_code',
+            field=models.ImageField(blank=True, db_index=True, null=True, upload_to='qr_codes/'),
+        ),
+        migrations.AlterField(
+            model_name='uapdepartment',
+            name='image',
+            field=models.ImageField(blank=True, db_index=True, null=True, upload_to='departments/'),
+        ),
+    ]
@@ -1,22 +1,69 @@
 # tours/models.py - COMPLETE VERSION
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import F, Sum
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+from django.urls import reverse
+from .signals import bookings_expired
 from django.contrib.auth import get_user_model
 import qrcode
 from io import BytesIO
 from django.core.files import File
 from django.utils import timezone
+import re
 import uuid
 
 User = get_user_model()
 
+DEPARTMENT_NOISE_WORDS = {'department', 'dept', 'of', 'the', 'and'}
+
+
+def department_key(text):
+    """Normalize a free-text department name, e.g. 'Dept. of CSE' -> 'cse'"""
+    words = re.findall(r'[a-z0-9]+', (text or '').lower())
+    return ''.join(word for word in words if word not in DEPARTMENT_NOISE_WORDS)
+
 class UAPDepartment(models.Model):
     name = models.CharField(max_length=200)
     code = models.CharField(max_length=20)
     description = models.TextField(blank=True)
-    image = models.ImageField(upload_to='departments/', blank=True, null=True)
+    image = models.ImageField(upload_to='departments/', blank=True, null=True, db_index=True)
+    key = models.CharField(max_length=200, blank=True, db_index=True, editable=False)
     
     def __str__(self):
         return f"{self.code} - {self.name}"
+    
+    def save(self, *args, **kwargs):
+        self.key = department_key(self.name)
+        previous = UAPDepartment.objects.filter(pk=self.pk).values_list('name', 'code').first() if self.pk else None
+        super().save(*args, **kwargs)
+        # A new or renamed department may now be the match for existing organizers
+        if previous != (self.name, self.code):
+            UAPDepartment.relink_organizers(self.id)
+    
+    @classmethod
+    def resolve(cls, text):
+        """Find the department a free-text value refers to, by normalized name, code, then substring"""
+        key = department_key(text)
+        if not key:
+            return None
+        return (
+            cls.objects.filter(key=key).order_by('id').first()
+            or cls.objects.filter(code__iexact=key).order_by('id').first()
+            or cls.objects.filter(name__icontains=text.strip()).order_by('id').first()
+        )
+    
+    @classmethod
+    def relink_organizers(cls, department_id=None):
+        """Re-resolve organizer profiles that are unlinked or linked to ``department_id``"""
+        from accounts.models import OrganizerProfile
+        profiles = OrganizerProfile.objects.filter(
+            models.Q(uap_department__isnull=True) | models.Q(uap_department_id=department_id)
+        )
+        for text in profiles.values_list('department', flat=True).distinct():
+            department = cls.resolve(text)
+            profiles.filter(department=text).update(uap_department=department)
 
 class Tour(models.Model):
     CATEGORY_CHOICES = (
@@ -49,21 +96,29 @@ class Tour(models.Model):
     includes = models.TextField(blank=True, help_text="What's included in the tour")
     requirements = models.TextField(blank=True, help_text="What participants should bring")
     itinerary = models.TextField(blank=True, help_text="Detailed schedule")
-    image = models.ImageField(upload_to='tours/', blank=True, null=True)
-    qr_code = models.ImageField(upload_to='qr_codes/', blank=True, null=True)
+    image = models.ImageField(upload_to='tours/', blank=True, null=True, db_index=True)
+    qr_code = models.ImageField(upload_to='qr_codes/', blank=True, null=True, db_index=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft')
+    trending_score = models.FloatField(default=0, help_text="Time-decayed popularity, see tours/trending.py")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', '-trending_score']),
+            models.Index(fields=['status', 'tour_date']),
+        ]
+    
     def __str__(self):
         return self.title
     
     @property
     def available_spots(self):
-        confirmed_bookings = self.booking_set.filter(status='confirmed').aggregate(
+        # Pending bookings hold their seats until paid or expired by expire_bookings
+        held_bookings = self.booking_set.filter(status__in=['pending', 'confirmed']).aggregate(
             total_participants=models.Sum('participants')
         )['total_participants'] or 0
-        return self.max_participants - confirmed_bookings
+        return self.max_participants - held_bookings
     
     @property
     def is_upcoming(self):
@@ -78,7 +133,7 @@ class Tour(models.Model):
         )
         
         # Generate URL for this tour
-        tour_url = f"http://localhost:8000/tours/{self.id}/"  # Update with your domain
+        tour_url = settings.SITE_URL.rstrip('/') + reverse('tour_detail', args=[self.id])
         qr.add_data(tour_url)
         qr.make(fit=True)
         
@@ -123,10 +178,38 @@ class Booking(models.Model):
     payment_number = models.CharField(max_length=20, blank=True, help_text="bKash/Nagad/Rocket number")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     payment_status = models.CharField(max_length=20, choices=PAYMENT_STATUS_CHOICES, default='pending')
-    transaction_id = models.CharField(max_length=100, blank=True)
+    transaction_id = models.CharField(max_length=100, blank=True, db_index=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'payment_status', 'booking_date']),
+        ]
     
     def __str__(self):
         return f"{self.tourist.username} - {self.tour.title}"
+    
+    @property
+    def ticket_token(self):
+        from .tickets import make_ticket_token
+        return make_ticket_token(self)
+
+
+class Attendance(models.Model):
+    """One row per checked-in ticket; the unique booking makes repeated scans no-ops"""
+    booking = models.OneToOneField(Booking, on_delete=models.CASCADE, related_name='attendance')
+    tour = models.ForeignKey(Tour, on_delete=models.CASCADE)
+    checked_in_at = models.DateTimeField(default=timezone.now, help_text="When the ticket was scanned")
+    checked_in_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    synced_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['tour', 'checked_in_at']),
+        ]
+    
+    def __str__(self):
+        return f"Booking {self.booking_id} checked in at {self.checked_in_at}"
+
 
 class Review(models.Model):
     RATING_CHOICES = (
@@ -178,6 +261,29 @@ class Payment(models.Model):
     def __str__(self):
         return f"Payment for {self.booking}"
 
+class PaymentWebhookEvent(models.Model):
+    """Verified gateway callback queued for the process_payment_events worker"""
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('processed', 'Processed'),
+        ('failed', 'Failed'),
+    )
+    
+    idempotency_key = models.CharField(max_length=100, unique=True)
+    payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    error = models.CharField(max_length=100, blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id']),
+        ]
+    
+    def __str__(self):
+        return f"Webhook {self.idempotency_key} ({self.status})"
+
 class Notification(models.Model):
     NOTIFICATION_TYPES = (
         ('reminder', 'Tour Reminder'),
@@ -225,11 +331,489 @@ class UserNotification(models.Model):
     
     class Meta:
         unique_together = ['user', 'notification']
+        indexes = [
+            models.Index(fields=['user', '-created_at']),
+            models.Index(fields=['is_read', 'created_at']),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.notification.title}"
     
     def mark_as_read(self):
+        from .notifications import invalidate_recent
         self.is_read = True
         self.read_at = timezone.now()
-        self.save()
\ No newline at end of file
+        self.save()
+        invalidate_recent([self.user_id])
+
+class NotificationArchive(models.Model):
+    """Compact record of read UserNotification rows pruned from the hot table.
+
+    Instead of one row per recipient, each archived notification keeps a
+    bitmap where bit N is set when user id N had received (and read) it.
+    """
+    notification = models.OneToOneField(Notification, on_delete=models.CASCADE, related_name='archive')
+    recipients = models.BinaryField(default=bytes)
+    recipient_count = models.PositiveIntegerField(default=0)
+    archived_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Archive: {self.notification.title} ({self.recipient_count} recipients)"
+    
+    def add_recipients(self, user_ids):
+        bitmap = bytearray(self.recipients or b'')
+        for user_id in user_ids:
+            byte, bit = divmod(user_id, 8)
+            if byte >= len(bitmap):
+                bitmap.extend(bytes(byte - len(bitmap) + 1))
+            if not bitmap[byte] & (1 << bit):
+                bitmap[byte] |= 1 << bit
+                self.recipient_count += 1
+        self.recipients = bytes(bitmap)
+    
+    def has_recipient(self, user_id):
+        byte, bit = divmod(user_id, 8)
+        bitmap = bytes(self.recipients or b'')
+        return byte < len(bitmap) and bool(bitmap[byte] & (1 << bit))
+    
+    def recipient_ids(self):
+        bitmap = bytes(self.recipients or b'')
+        return [
+            byte * 8 + bit
+            for byte, value in enumerate(bitmap) if value
+            for bit in range(8) if value & (1 << bit)
+        ]
+
+
+class OutboxMessage(models.Model):
+    """Email/SMS copy of a notification, written in the same transaction as the inbox rows.
+
+    deliver_outbox drains pending rows; a row that keeps failing is retried
+    with backoff until OUTBOX_MAX_ATTEMPTS and then dead-lettered.
+    """
+    CHANNEL_CHOICES = (
+        ('email', 'Email'),
+        ('sms', 'SMS'),
+    )
+    
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('dead', 'Dead Letter'),
+    )
+    
+    notification = models.ForeignKey(Notification, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES)
+    recipient = models.CharField(max_length=254)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        unique_together = ['notification', 'user', 'channel']
+        indexes = [
+            models.Index(fields=['channel', 'status', 'next_attempt_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.channel} to {self.recipient} ({self.status})"
+
+
+class TourReminder(models.Model):
+    """Marks that the reminder for one window (hours before start) went out for a tour"""
+    tour = models.ForeignKey(Tour, on_delete=models.CASCADE, related_name='reminders')
+    window = models.PositiveIntegerField(help_text="Hours before the tour starts")
+    notification = models.ForeignKey(Notification, on_delete=models.SET_NULL, null=True, blank=True)
+    sent_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ['tour', 'window']
+    
+    def __str__(self):
+        return f"{self.tour_id} ({self.window}h reminder)"
+
+
+def event_partition(when):
+    """Month partition key for DomainEvent, e.g. 202610"""
+    return when.year * 100 + when.month
+
+
+class DomainEvent(models.Model):
+    """Append-only log of things that happened, written in batches by tours/events.py.
+
+    Ids are plain integers rather than foreign keys so history survives the
+    deletion of the rows it mentions. ``partition`` is the event month; old
+    months can be exported and dropped with a single range delete.
+    """
+    kind = models.CharField(max_length=50)
+    occurred_at = models.DateTimeField(default=timezone.now)
+    partition = models.PositiveIntegerField(editable=False)
+    actor_id = models.BigIntegerField(null=True, blank=True)
+    tour_id = models.BigIntegerField(null=True, blank=True)
+    booking_id = models.BigIntegerField(null=True, blank=True)
+    payload = models.JSONField(default=dict, blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['partition', 'id']),
+            models.Index(fields=['kind', 'id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.occurred_at:%Y-%m-%d %H:%M} {self.kind}"
+    
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError('Domain events are append-only')
+        self.partition = event_partition(self.occurred_at)
+        super().save(*args, **kwargs)
+
+
+class WaitlistEntry(models.Model):
+    STATUS_CHOICES = (
+        ('waiting', 'Waiting'),
+        ('offered', 'Seat Offered'),
+        ('booked', 'Booked'),
+        ('expired', 'Offer Expired'),
+    )
+    
+    tour = models.ForeignKey(Tour, on_delete=models.CASCADE)
+    tourist = models.ForeignKey(User, on_delete=models.CASCADE, limit_choices_to={'user_type': 'tourist'})
+    participants = models.IntegerField(default=1)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='waiting')
+    created_at = models.DateTimeField(auto_now_add=True)
+    offered_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        unique_together = ['tour', 'tourist']
+        indexes = [
+            models.Index(fields=['tour', 'status', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.tourist.username} waiting for {self.tour.title} ({self.status})"
+
+class TourSimilarity(models.Model):
+    """Top-N similar tours per tour, rebuilt nightly by build_recommendations"""
+    tour = models.ForeignKey(Tour, on_delete=models.CASCADE, related_name='similarities')
+    similar_tour = models.ForeignKey(Tour, on_delete=models.CASCADE, related_name='similar_to')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+    
+    class Meta:
+        unique_together = ['tour', 'similar_tour']
+        indexes = [
+            models.Index(fields=['tour', 'rank']),
+        ]
+    
+    def __str__(self):
+        return f"{self.tour_id} ~ {self.similar_tour_id} ({self.score:.2f})"
+
+
+class UserRecommendation(models.Model):
+    """Top-N personalized tours per tourist, rebuilt nightly by build_recommendations"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    tour = models.ForeignKey(Tour, on_delete=models.CASCADE)
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+    
+    class Meta:
+        unique_together = ['user', 'tour']
+        indexes = [
+            models.Index(fields=['user', 'rank']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} -> {self.tour_id} ({self.score:.2f})"
+
+class TourCalendarEntry(models.Model):
+    """Per-tour row of the availability calendar, keyed by local tour date and department.
+
+    Only published tours have an entry. Rows are refreshed from the Tour and
+    Booking signals below so the month view never has to aggregate bookings.
+    """
+    tour = models.OneToOneField(Tour, on_delete=models.CASCADE, related_name='calendar_entry')
+    date = models.DateField()
+    department = models.ForeignKey(UAPDepartment, on_delete=models.CASCADE, null=True, blank=True)
+    remaining_seats = models.IntegerField()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'department']),
+            models.Index(fields=['department', 'date']),
+        ]
+    
+    def __str__(self):
+        return f"{self.date} - {self.tour_id} ({self.remaining_seats} seats)"
+    
+    @classmethod
+    def refresh_for_tour(cls, tour):
+        if tour.status != 'published':
+            cls.objects.filter(tour_id=tour.id).delete()
+            return
+        cls.objects.update_or_create(
+            tour_id=tour.id,
+            defaults={
+                'date': timezone.localtime(tour.tour_date).date(),
+                'department_id': tour.department_id,
+                'remaining_seats': tour.available_spots,
+            }
+        )
+
+class DepartmentStats(models.Model):
+    """Precomputed numbers for a department landing page.
+
+    The Tour, Booking and Review signals below apply each write as a delta
+    with one F() UPDATE, so a booking never rescans its department. Whether a
+    tour is upcoming depends on the clock, so rebuild_department_stats
+    recomputes every department from scratch, e.g. nightly.
+    """
+    department = models.OneToOneField(UAPDepartment, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    upcoming_tours = models.PositiveIntegerField(default=0)
+    seats_left = models.IntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    # Bookings in these statuses hold their seats (see Tour.available_spots)
+    HOLDING_STATUSES = ('pending', 'confirmed')
+    
+    def __str__(self):
+        return f"{self.department_id}: {self.upcoming_tours} upcoming, {self.seats_left} seats"
+    
+    @property
+    def average_rating(self):
+        if not self.rating_count:
+            return None
+        return round(self.rating_sum / self.rating_count, 1)
+    
+    @classmethod
+    def refresh(cls, department_id):
+        if department_id is None:
+            return
+        upcoming = Tour.objects.filter(
+            department_id=department_id, status='published', tour_date__gte=timezone.now()
+        )
+        capacity = upcoming.aggregate(tours=models.Count('id'), seats=Sum('max_participants'))
+        booked = Booking.objects.filter(
+            tour__in=upcoming, status__in=cls.HOLDING_STATUSES
+        ).aggregate(seats=Sum('participants'))['seats'] or 0
+        ratings = Review.objects.filter(tour__department_id=department_id).aggregate(
+            total=Sum('rating'), count=models.Count('id')
+        )
+        cls.objects.update_or_create(
+            department_id=department_id,
+            defaults={
+                'upcoming_tours': capacity['tours'],
+                'seats_left': (capacity['seats'] or 0) - booked,
+                'rating_sum': ratings['total'] or 0,
+                'rating_count': ratings['count'],
+            }
+        )
+    
+    @classmethod
+    def refresh_for_tours(cls, tour_ids):
+        """Recompute every department touched by a bulk change to these tours"""
+        department_ids = set(
+            Tour.objects.filter(id__in=tour_ids, department__isnull=False).values_list('department_id', flat=True)
+        )
+        for department_id in department_ids:
+            cls.refresh(department_id)
+    
+    @classmethod
+    def adjust(cls, department_id, tours=0, seats=0, rating=0, ratings=0):
+        """Apply a change to one department's counts with a single UPDATE"""
+        if department_id is None or not (tours or seats or rating or ratings):
+            return
+        updated = cls.objects.filter(department_id=department_id).update(
+            upcoming_tours=F('upcoming_tours') + tours,
+            seats_left=F('seats_left') + seats,
+            rating_sum=F('rating_sum') + rating,
+            rating_count=F('rating_count') + ratings,
+        )
+        if not updated:
+            # No row yet; the first one is computed in full and already
+            # includes the change being applied
+            cls.refresh(department_id)
+    
+    @classmethod
+    def add_rating(cls, department_id, rating, count=1):
+        cls.adjust(department_id, rating=rating, ratings=count)
+    
+    @classmethod
+    def counts_tour(cls, department_id, status, tour_date):
+        """Whether a tour in this state is one of its department's upcoming tours"""
+        return department_id is not None and status == 'published' and tour_date >= timezone.now()
+    
+    @classmethod
+    def release_seats(cls, seats_by_tour):
+        """Give ``{tour_id: seats}`` back to the departments of upcoming tours (negative to take them)"""
+        seats_by_tour = {tour_id: seats for tour_id, seats in seats_by_tour.items() if seats}
+        if not seats_by_tour:
+            return
+        seats_by_department = {}
+        upcoming = Tour.objects.filter(
+            id__in=seats_by_tour, department__isnull=False, status='published', tour_date__gte=timezone.now()
+        )
+        for tour_id, department_id in upcoming.values_list('id', 'department_id'):
+            seats_by_department[department_id] = seats_by_department.get(department_id, 0) + seats_by_tour[tour_id]
+        for department_id, seats in seats_by_department.items():
+            cls.adjust(department_id, seats=seats)
+
+
+@receiver(post_save, sender=Tour)
+def refresh_calendar_on_tour_save(sender, instance, **kwargs):
+    TourCalendarEntry.refresh_for_tour(instance)
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def refresh_calendar_on_booking_change(sender, instance, **kwargs):
+    tour_id = instance.tour_id
+    
+    def refresh():
+        # Runs after commit so a cascading Tour delete doesn't recreate the entry
+        tour = Tour.objects.filter(id=tour_id).first()
+        if tour:
+            TourCalendarEntry.refresh_for_tour(tour)
+    
+    transaction.on_commit(refresh)
+
+
+@receiver(pre_save, sender=Booking)
+def remember_booking_state(sender, instance, raw=False, **kwargs):
+    if instance.pk and not raw:
+        instance._previous_state = (
+            Booking.objects.filter(pk=instance.pk).values_list('status', 'participants', 'tour_id').first()
+        )
+
+
+@receiver(post_save, sender=Booking)
+def promote_waitlist_on_cancellation(sender, instance, created, raw=False, **kwargs):
+    # Only the save that cancels the booking frees its seats
+    previous = getattr(instance, '_previous_state', None)
+    if raw or created or instance.status != 'cancelled' or (previous and previous[0] == 'cancelled'):
+        return
+    from .waitlist import promote_waitlist
+    tour_id = instance.tour_id
+    transaction.on_commit(lambda: promote_waitlist(tour_id))
+
+
+@receiver(bookings_expired)
+def log_expired_bookings(sender, booking_ids, **kwargs):
+    from .events import batched, emit
+    with batched():
+        for booking_id in booking_ids:
+            emit('booking.expired', booking=booking_id)
+
+
+@receiver(bookings_expired)
+def promote_waitlist_on_expiry(sender, tour_ids, **kwargs):
+    from .waitlist import promote_waitlist
+    for tour_id in tour_ids:
+        promote_waitlist(tour_id)
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_save, sender=Wishlist)
+@receiver(post_save, sender=Review)
+def bump_trending_score(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        from .trending import bump
+        bump({instance.tour_id: 1}, sender._meta.model_name)
+
+
+@receiver(pre_save, sender=Tour)
+def remember_tour_state(sender, instance, raw=False, **kwargs):
+    if instance.pk and not raw:
+        instance._previous_state = (
+            Tour.objects.filter(pk=instance.pk)
+            .values_list('department_id', 'status', 'tour_date', 'max_participants')
+            .first()
+        )
+
+
+@receiver(post_save, sender=Tour)
+@receiver(post_delete, sender=Tour)
+def update_department_stats_on_tour_change(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    current = (instance.department_id, instance.status, instance.tour_date, instance.max_participants)
+    if kwargs['signal'] is post_delete:
+        # Its bookings were deleted first and have already given their seats back
+        states = [(current, -1)]
+    else:
+        previous = None if created else getattr(instance, '_previous_state', None)
+        if previous == current:
+            return
+        states = [(previous, -1), (current, 1)] if previous else [(current, 1)]
+    
+    counted = [(state, sign) for state, sign in states if DepartmentStats.counts_tour(*state[:3])]
+    if not counted:
+        return
+    held = instance.booking_set.filter(status__in=DepartmentStats.HOLDING_STATUSES).aggregate(
+        seats=Sum('participants')
+    )['seats'] or 0
+    for (department_id, _, _, max_participants), sign in counted:
+        DepartmentStats.adjust(department_id, tours=sign, seats=sign * (max_participants - held))
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def update_department_stats_on_booking_change(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    current = (instance.status, instance.participants, instance.tour_id)
+    if kwargs['signal'] is post_delete:
+        previous, current = current, None
+    else:
+        previous = None if created else getattr(instance, '_previous_state', None)
+    # A booking takes seats from its tour while it holds them and gives them back after
+    seats = {}
+    for state, sign in ((previous, 1), (current, -1)):
+        if state and state[0] in DepartmentStats.HOLDING_STATUSES:
+            _, participants, tour_id = state
+            seats[tour_id] = seats.get(tour_id, 0) + sign * participants
+    DepartmentStats.release_seats(seats)
+
+
+@receiver(pre_save, sender=Review)
+def remember_review_rating(sender, instance, raw=False, **kwargs):
+    if instance.pk and not raw:
+        instance._previous_rating = Review.objects.filter(pk=instance.pk).values_list('rating', flat=True).first()
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def update_department_rating(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    department_id = Tour.objects.filter(id=instance.tour_id).values_list('department_id', flat=True).first()
+    if department_id is None:
+        return
+    if kwargs['signal'] is post_delete:
+        DepartmentStats.add_rating(department_id, -instance.rating, -1)
+    elif created or getattr(instance, '_previous_rating', None) is None:
+        DepartmentStats.add_rating(department_id, instance.rating)
+    else:
+        DepartmentStats.add_rating(department_id, instance.rating - instance._previous_rating, 0)
+
+
+@receiver(pre_delete, sender=Notification)
+def invalidate_recent_on_notification_delete(sender, instance, **kwargs):
+    # Also sent for notifications removed along with their tour; the inbox rows
+    # themselves are cascade-deleted without signals
+    from .notifications import invalidate_recent
+    user_ids = list(UserNotification.objects.filter(notification=instance).values_list('user_id', flat=True))
+    if user_ids:
+        transaction.on_commit(lambda: invalidate_recent(user_ids))
+
+
+@receiver(post_delete, sender=UAPDepartment)
+def relink_organizers_on_department_delete(sender, instance, **kwargs):
+    # Their profiles were just set to NULL; another department may still match
+    UAPDepartment.relink_organizers()
@@ -0,0 +1,108 @@
+# tours/notifications.py
+import hashlib
+import json
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import QuerySet
+
+from .models import OutboxMessage, UserNotification
+
+User = get_user_model()
+
+
+def fan_out(notification, users):
+    """Create the per-user inbox rows for a notification in bulk.
+
+    ``users`` may be a queryset or an iterable of user instances or ids.
+    Email (and, for urgent types, SMS) outbox rows are written in the same
+    transaction so deliver_outbox picks them up. Returns the number of recipients.
+    """
+    if not isinstance(users, QuerySet):
+        users = User.objects.filter(pk__in=[getattr(user, 'pk', user) for user in users])
+    recipients = list(users.values_list('pk', 'email', 'phone'))
+
+    sms_types = getattr(settings, 'OUTBOX_SMS_TYPES', ('cancellation', 'reminder'))
+    outbox = []
+    for user_id, email, phone in recipients:
+        if email:
+            outbox.append(OutboxMessage(notification=notification, user_id=user_id, channel='email', recipient=email))
+        if phone and notification.notification_type in sms_types:
+            outbox.append(OutboxMessage(notification=notification, user_id=user_id, channel='sms', recipient=phone))
+
+    with transaction.atomic():
+        UserNotification.objects.bulk_create(
+            [UserNotification(user_id=user_id, notification=notification) for user_id, _, _ in recipients],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        OutboxMessage.objects.bulk_create(outbox, batch_size=1000, ignore_conflicts=True)
+        user_ids = [user_id for user_id, _, _ in recipients]
+        transaction.on_commit(lambda: invalidate_recent(user_ids))
+    return len(recipients)
+
+
+RECENT_LIMIT = 5
+RECENT_FIELDS = (
+    'id',
+    'is_read',
+    'created_at',
+    'notification__title',
+    'notification__message',
+    'notification__notification_type',
+)
+
+
+def recent_cache_key(user_id):
+    return f'recent-notifications:{user_id}'
+
+
+def invalidate_recent(user_ids):
+    """Drop the cached dropdown payload for these users after their inbox changed"""
+    cache.delete_many([recent_cache_key(user_id) for user_id in user_ids])
+
+
+async def ainvalidate_recent(user_ids):
+    await cache.adelete_many([recent_cache_key(user_id) for user_id in user_ids])
+
+
+def recent_queryset(user_id):
+    # .values() joins Notification in the same query, so there is no per-row lookup
+    return (
+        UserNotification.objects.filter(user_id=user_id)
+        .order_by('-created_at')
+        .values(*RECENT_FIELDS)[:RECENT_LIMIT]
+    )
+
+
+def build_recent(rows):
+    """Serialise dropdown rows; returns (etag, body) so both can be cached together"""
+    payload = {
+        'notifications': [
+            {
+                'id': row['id'],
+                'title': row['notification__title'],
+                'message': row['notification__message'],
+                'type': row['notification__notification_type'],
+                'is_read': row['is_read'],
+                # ISO 8601; the browser formats it in the reader's own time zone
+                'created_at': row['created_at'],
+            }
+            for row in rows
+        ]
+    }
+    body = json.dumps(payload, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return '"%s"' % hashlib.md5(body.encode()).hexdigest(), body
+
+
+async def arecent_notifications(user_id):
+    """Cached (etag, body) for the notification dropdown of one user"""
+    key = recent_cache_key(user_id)
+    cached = await cache.aget(key)
+    if cached is None:
+        cached = build_recent([row async for row in recent_queryset(user_id)])
+        await cache.aset(key, cached, getattr(settings, 'NOTIFICATION_CACHE_SECONDS', 300))
+    return cached
@@ -0,0 +1,154 @@
+# tours/outbox.py
+import sys
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import OutboxMessage
+
+
+class ConsoleSMSBackend:
+    """Development SMS backend that writes messages to stdout, like the console email backend"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def send(self, phone, text):
+        self.stream.write(f'SMS to {phone}: {text}\n')
+
+
+def get_sms_backend():
+    return import_string(getattr(settings, 'SMS_BACKEND', 'tours.outbox.ConsoleSMSBackend'))()
+
+
+class Throttle:
+    """Blocks just long enough to keep calls under ``rate`` per second"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_at = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if now < self.next_at:
+            time.sleep(self.next_at - now)
+        self.next_at = max(now, self.next_at) + self.interval
+
+
+def claim(channel, batch_size):
+    """Lease a batch of due messages so parallel workers never send the same row"""
+    now = timezone.now()
+    lease = timedelta(seconds=getattr(settings, 'OUTBOX_LEASE_SECONDS', 300))
+    with transaction.atomic():
+        messages = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True, of=('self',))
+            .select_related('notification')
+            .filter(channel=channel, status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        # A worker that dies mid-batch leaves its rows to be retried when the lease runs out
+        OutboxMessage.objects.filter(id__in=[message.id for message in messages]).update(
+            attempts=F('attempts') + 1, next_attempt_at=now + lease
+        )
+    for message in messages:
+        message.attempts += 1
+    return messages
+
+
+def send_emails(messages, throttle):
+    """Send over a single SMTP session; returns {message id: error or None}"""
+    results = {}
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as exc:
+        return {message.id: str(exc) or exc.__class__.__name__ for message in messages}
+    try:
+        for message in messages:
+            throttle.wait()
+            email = EmailMessage(
+                subject=message.notification.title,
+                body=message.notification.message,
+                to=[message.recipient],
+                connection=connection,
+            )
+            try:
+                connection.send_messages([email])
+                results[message.id] = None
+            except Exception as exc:
+                results[message.id] = str(exc) or exc.__class__.__name__
+    finally:
+        connection.close()
+    return results
+
+
+def send_sms(messages, throttle):
+    results = {}
+    backend = get_sms_backend()
+    backend.open()
+    try:
+        for message in messages:
+            throttle.wait()
+            try:
+                backend.send(message.recipient, f'{message.notification.title}: {message.notification.message}')
+                results[message.id] = None
+            except Exception as exc:
+                results[message.id] = str(exc) or exc.__class__.__name__
+    finally:
+        backend.close()
+    return results
+
+
+SENDERS = {
+    'email': send_emails,
+    'sms': send_sms,
+}
+
+
+def retry_delay(attempts):
+    base = getattr(settings, 'OUTBOX_RETRY_SECONDS', 60)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), 24 * 60 * 60))
+
+
+def deliver_batch(channel, batch_size, throttle):
+    """Claim, send and record one batch; returns (sent, retried, dead) counts"""
+    messages = claim(channel, batch_size)
+    if not messages:
+        return 0, 0, 0
+
+    results = SENDERS[channel](messages, throttle)
+
+    now = timezone.now()
+    max_attempts = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5)
+    sent = retried = dead = 0
+    for message in messages:
+        error = results.get(message.id)
+        if error is None:
+            message.status = 'sent'
+            message.sent_at = now
+            message.last_error = ''
+            sent += 1
+        elif message.attempts >= max_attempts:
+            message.status = 'dead'
+            message.last_error = error
+            dead += 1
+        else:
+            message.next_attempt_at = now + retry_delay(message.attempts)
+            message.last_error = error
+            retried += 1
+    OutboxMessage.objects.bulk_update(messages, ['status', 'sent_at', 'last_error', 'next_attempt_at'])
+    return sent, retried, dead
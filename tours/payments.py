@@ -0,0 +1,159 @@
+# tours/payments.py
+import hashlib
+import hmac
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+
+from .events import batched, emit
+from .models import Booking, DepartmentStats, Payment, TourCalendarEntry, Tour
+from .signals import bookings_updated
+
+# Provider status strings mapped onto Booking/Payment payment statuses
+SETTLEMENT_STATUSES = {
+    'paid': 'paid',
+    'success': 'paid',
+    'successful': 'paid',
+    'completed': 'paid',
+    'failed': 'failed',
+    'declined': 'failed',
+    'refunded': 'refunded',
+    'reversed': 'refunded',
+}
+
+
+def sign_payload(body):
+    """HMAC-SHA256 signature a gateway sends with a webhook body"""
+    secret = settings.PAYMENT_WEBHOOK_SECRET.encode()
+    return hmac.new(secret, body, hashlib.sha256).hexdigest()
+
+
+def verify_signature(body, signature):
+    return bool(signature) and hmac.compare_digest(sign_payload(body), signature)
+
+
+def apply_settlements(rows):
+    """Apply a batch of provider settlement rows to bookings and payments.
+
+    Each row is a dict with ``transaction_id``, ``amount``, ``status`` and an
+    optional ``payment_method``. Everything is matched with one query per
+    table and written with bulk statements in a single transaction.
+    Returns a list of ``(row, reason)`` tuples for rows that could not be applied.
+    """
+    mismatches = []
+    settlements = {}
+    for row in rows:
+        transaction_id = (row.get('transaction_id') or '').strip()
+        status = SETTLEMENT_STATUSES.get((row.get('status') or '').strip().lower())
+        try:
+            amount = Decimal(str(row.get('amount')).strip())
+        except (InvalidOperation, TypeError):
+            amount = None
+        
+        if not transaction_id:
+            mismatches.append((row, 'missing_transaction_id'))
+        elif status is None:
+            mismatches.append((row, 'unknown_status'))
+        elif amount is None:
+            mismatches.append((row, 'invalid_amount'))
+        elif transaction_id in settlements:
+            mismatches.append((row, 'duplicate_in_batch'))
+        else:
+            settlements[transaction_id] = (row, amount, status)
+    
+    if not settlements:
+        return mismatches
+    
+    with transaction.atomic():
+        # Tourists type the TrxID in themselves, so several bookings can claim one
+        matches = {}
+        for booking in Booking.objects.select_for_update().filter(
+            transaction_id__in=settlements
+        ).only('id', 'tour_id', 'transaction_id', 'total_price', 'status', 'payment_status', 'payment_method', 'participants'):
+            matches.setdefault(booking.transaction_id, []).append(booking)
+        booking_ids = [booking.id for candidates in matches.values() for booking in candidates]
+        payments = {
+            payment.booking_id: payment
+            for payment in Payment.objects.filter(booking_id__in=booking_ids)
+        }
+        # Payment.transaction_id is unique; a TrxID already paid against some
+        # other booking can't be recorded again
+        paid_transactions = dict(
+            Payment.objects.filter(transaction_id__in=settlements).values_list('transaction_id', 'booking_id')
+        )
+        
+        changed_bookings, new_payments, changed_payments = [], [], []
+        touched_tours, cancelled_tours = set(), set()
+        released_seats = {}
+        events = []
+        for transaction_id, (row, amount, status) in settlements.items():
+            candidates = matches.get(transaction_id, [])
+            if not candidates:
+                mismatches.append((row, 'unknown_transaction'))
+                continue
+            if len(candidates) > 1:
+                mismatches.append((row, 'ambiguous_transaction'))
+                continue
+            booking = candidates[0]
+            if paid_transactions.get(transaction_id, booking.id) != booking.id:
+                mismatches.append((row, 'transaction_already_used'))
+                continue
+            if amount != booking.total_price:
+                mismatches.append((row, 'amount_mismatch'))
+                continue
+            if status == 'paid' and booking.status == 'cancelled':
+                mismatches.append((row, 'booking_cancelled'))
+                continue
+            
+            old_status = booking.status
+            booking.payment_status = status
+            if status == 'paid' and booking.status == 'pending':
+                booking.status = 'confirmed'
+            elif status == 'refunded' and booking.status in ('pending', 'confirmed'):
+                booking.status = 'cancelled'
+                cancelled_tours.add(booking.tour_id)
+                released_seats[booking.tour_id] = released_seats.get(booking.tour_id, 0) + booking.participants
+            if booking.status != old_status:
+                touched_tours.add(booking.tour_id)
+                events.append((booking, old_status))
+            changed_bookings.append(booking)
+            
+            payment = payments.get(booking.id)
+            if payment is None:
+                new_payments.append(Payment(
+                    booking_id=booking.id,
+                    amount=amount,
+                    payment_method=row.get('payment_method') or booking.payment_method,
+                    transaction_id=transaction_id,
+                    status=status,
+                ))
+            elif payment.status != status:
+                payment.status = status
+                changed_payments.append(payment)
+        
+        Booking.objects.bulk_update(changed_bookings, ['status', 'payment_status'], batch_size=500)
+        Payment.objects.bulk_create(new_payments, batch_size=500)
+        Payment.objects.bulk_update(changed_payments, ['status'], batch_size=500)
+        # Bulk writes skip the model signals, so apply the department deltas here
+        DepartmentStats.release_seats(released_seats)
+        with batched():
+            for booking, old_status in events:
+                emit('booking.status_changed', tour=booking.tour_id, booking=booking,
+                     old=old_status, new=booking.status, payment_status=booking.payment_status)
+        
+        # Calendar rows and waitlist offers are refreshed once the batch is committed
+        transaction.on_commit(lambda: refresh_tours(touched_tours, cancelled_tours))
+    
+    return mismatches
+
+
+def refresh_tours(tour_ids, cancelled_tour_ids=()):
+    """Rebuild calendar rows and run waitlist promotion after bulk booking changes"""
+    from .waitlist import promote_waitlist
+    
+    for tour in Tour.objects.filter(id__in=tour_ids):
+        TourCalendarEntry.refresh_for_tour(tour)
+    for tour_id in cancelled_tour_ids:
+        promote_waitlist(tour_id)
+    bookings_updated.send(sender=Booking, tour_ids=list(tour_ids))
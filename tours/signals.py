@@ -0,0 +1,10 @@
+# tours/signals.py
+from django.dispatch import Signal
+
+# Sent after commit when unpaid pending bookings pass the payment deadline
+# and are cancelled in bulk. Arguments: booking_ids, tour_ids
+bookings_expired = Signal()
+
+# Sent after commit when bookings change status in bulk, e.g. by payment
+# settlements. Arguments: tour_ids
+bookings_updated = Signal()
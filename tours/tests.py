@@ -1,3 +1,1163 @@
-from django.test import TestCase
+import csv
+import json
+import math
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core import mail, signing
+from django.core.files.storage import default_storage
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import connection, transaction
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import EmergencyContact, OrganizerProfile
+
+from .models import (
+    Attendance, Booking, DepartmentStats, DomainEvent, Notification, NotificationArchive, OutboxMessage, Payment,
+    PaymentWebhookEvent, Review, Tour, TourCalendarEntry, TourReminder, TourSimilarity, UAPDepartment, UserNotification,
+    UserRecommendation, WaitlistEntry, Wishlist,
+)
+from .management.commands.build_recommendations import np as recommendations_np
+from .events import EventBufferMiddleware, batched, emit, events_since
+from .notifications import fan_out
+from .waitlist import expire_offers
+from .payments import apply_settlements, sign_payload
+from .signals import bookings_expired
+from .tickets import read_ticket_token, ticket_details, ticket_digest, ticket_name
+from .trending import EPOCH, bump, event_log_score, log_add
+
+User = get_user_model()
+
+
+def make_tour(organizer, **kwargs):
+    fields = {
+        'title': 'Campus walk',
+        'description': 'A walk around campus',
+        'organizer': organizer,
+        'duration_hours': 2,
+        'max_participants': 10,
+        'meeting_point': 'Main gate',
+        'tour_date': timezone.now() + timedelta(days=7),
+        'status': 'published',
+        'price': 100,
+    }
+    fields.update(kwargs)
+    return Tour.objects.create(**fields)
+
+
+def make_booking(tour, tourist, **kwargs):
+    fields = {'participants': 1, 'total_price': tour.price, 'payment_method': 'bkash', 'status': 'confirmed'}
+    fields.update(kwargs)
+    return Booking.objects.create(tour=tour, tourist=tourist, **fields)
+
+
+class CheckInTests(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user('org1', password='pw', user_type='organizer')
+        self.other_organizer = User.objects.create_user('org2', password='pw', user_type='organizer')
+        self.tourist = User.objects.create_user('tourist', password='pw', user_type='tourist')
+        self.tour = make_tour(self.organizer)
+        self.booking = make_booking(self.tour, self.tourist)
+        self.url = reverse('check_in', args=[self.tour.id])
+        self.sync_url = reverse('check_in_sync', args=[self.tour.id])
+
+    def test_organizer_checks_in_once(self):
+        self.client.force_login(self.organizer)
+        response = self.client.post(self.url, {'token': self.booking.ticket_token})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['status'], 'checked_in')
+
+        response = self.client.post(self.url, {'token': self.booking.ticket_token})
+        self.assertEqual(response.json()['status'], 'duplicate')
+        self.assertEqual(Attendance.objects.count(), 1)
+
+    def test_other_organizer_is_forbidden(self):
+        self.client.force_login(self.other_organizer)
+        response = self.client.post(self.url, {'token': self.booking.ticket_token})
+        self.assertEqual(response.status_code, 403)
+        response = self.client.post(self.sync_url, json.dumps({'scans': []}), content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Attendance.objects.exists())
+
+    def test_cancelled_booking_is_rejected(self):
+        self.booking.status = 'cancelled'
+        self.booking.save()
+        self.client.force_login(self.organizer)
+
+        response = self.client.post(self.url, {'token': self.booking.ticket_token})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['status'], 'invalid')
+
+        body = {'scans': [{'token': self.booking.ticket_token}]}
+        response = self.client.post(self.sync_url, json.dumps(body), content_type='application/json')
+        self.assertEqual(response.json()['results'][0]['status'], 'invalid')
+        self.assertFalse(Attendance.objects.exists())
+
+    def test_sync_keeps_earliest_scan_and_reports_bad_timestamps(self):
+        other = make_booking(self.tour, User.objects.create_user('tourist2', user_type='tourist'))
+        earliest = timezone.now() - timedelta(hours=1)
+        body = {'scans': [
+            {'token': self.booking.ticket_token, 'scanned_at': timezone.now().isoformat()},
+            {'token': self.booking.ticket_token, 'scanned_at': earliest.isoformat()},
+            {'token': other.ticket_token, 'scanned_at': 12345},
+            {'token': other.ticket_token, 'scanned_at': 'garbage'},
+            {'token': other.ticket_token, 'scanned_at': '2026-13-01T00:00'},
+            {'token': 'forged:token'},
+        ]}
+        self.client.force_login(self.organizer)
+        response = self.client.post(self.sync_url, json.dumps(body), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+        statuses = [result['status'] for result in response.json()['results']]
+        self.assertEqual(statuses, ['checked_in', 'duplicate', 'invalid', 'invalid', 'invalid', 'invalid'])
+        self.assertEqual(response.json()['checked_in'], 1)
+        self.assertEqual(Attendance.objects.get().checked_in_at, earliest)
+
+
+class ApplySettlementsTests(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user('org', user_type='organizer')
+        self.tourist = User.objects.create_user('tourist', user_type='tourist')
+        self.tour = make_tour(self.organizer)
+
+    def settle(self, transaction_id, status='success', amount='100'):
+        return apply_settlements([{'transaction_id': transaction_id, 'amount': amount, 'status': status}])
+
+    def test_paid_settlement_confirms_booking(self):
+        booking = make_booking(self.tour, self.tourist, status='pending', transaction_id='TRX1')
+        self.assertEqual(self.settle('TRX1'), [])
+
+        booking.refresh_from_db()
+        self.assertEqual((booking.status, booking.payment_status), ('confirmed', 'paid'))
+        self.assertEqual(Payment.objects.get(booking=booking).transaction_id, 'TRX1')
+
+    def test_amount_mismatch_leaves_booking_alone(self):
+        booking = make_booking(self.tour, self.tourist, status='pending', transaction_id='TRX1')
+        self.assertEqual([reason for _, reason in self.settle('TRX1', amount='99')], ['amount_mismatch'])
+        booking.refresh_from_db()
+        self.assertEqual(booking.payment_status, 'pending')
+
+    def test_transaction_id_shared_by_two_bookings_is_ambiguous(self):
+        first = make_booking(self.tour, self.tourist, status='pending', transaction_id='TRX1')
+        second = make_booking(self.tour, self.tourist, status='pending', transaction_id='TRX1')
+
+        self.assertEqual([reason for _, reason in self.settle('TRX1')], ['ambiguous_transaction'])
+        self.assertEqual(
+            set(Booking.objects.filter(id__in=[first.id, second.id]).values_list('payment_status', flat=True)),
+            {'pending'},
+        )
+        self.assertFalse(Payment.objects.exists())
+
+    def test_transaction_id_already_paid_elsewhere_is_reported(self):
+        paid = make_booking(self.tour, self.tourist, status='pending', transaction_id='TRX1')
+        self.settle('TRX1')
+        Booking.objects.filter(id=paid.id).update(transaction_id='TRX1-old')
+        make_booking(self.tour, self.tourist, status='pending', transaction_id='TRX1')
+
+        self.assertEqual([reason for _, reason in self.settle('TRX1')], ['transaction_already_used'])
+        self.assertEqual(Payment.objects.count(), 1)
+
+
+class PaymentEventTests(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user('org', user_type='organizer')
+        self.tourist = User.objects.create_user('tourist', user_type='tourist')
+        self.tour = make_tour(self.organizer)
+        self.booking = make_booking(self.tour, self.tourist, status='pending', transaction_id='TRX1')
+
+    def queue(self, key, transaction_id, status):
+        return PaymentWebhookEvent.objects.create(
+            idempotency_key=key,
+            payload={'event_id': key, 'transaction_id': transaction_id, 'amount': '100', 'status': status},
+        )
+
+    def process(self):
+        call_command('process_payment_events', stdout=StringIO(), stderr=StringIO())
+
+    def test_later_event_for_same_transaction_is_deferred_not_failed(self):
+        paid = self.queue('e1', 'TRX1', 'success')
+        refunded = self.queue('e2', 'TRX1', 'refunded')
+        self.process()
+
+        paid.refresh_from_db()
+        refunded.refresh_from_db()
+        self.booking.refresh_from_db()
+        self.assertEqual((paid.status, refunded.status), ('processed', 'processed'))
+        self.assertEqual((self.booking.status, self.booking.payment_status), ('cancelled', 'refunded'))
+
+    def test_failing_event_does_not_block_the_batch(self):
+        other = make_booking(self.tour, self.tourist, status='pending', transaction_id='TRX2')
+        good = self.queue('e1', 'TRX1', 'success')
+        bad = self.queue('e2', 'TRX2', 'success')
+
+        def flaky(rows):
+            if any(row['transaction_id'] == 'TRX2' for row in rows):
+                raise RuntimeError('boom')
+            return apply_settlements(rows)
+
+        with mock.patch('tours.management.commands.process_payment_events.apply_settlements', flaky):
+            self.process()
+
+        good.refresh_from_db()
+        bad.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(good.status, 'processed')
+        self.assertEqual((bad.status, bad.error), ('failed', 'RuntimeError'))
+        self.assertEqual(other.payment_status, 'pending')
+
+    def post_webhook(self, payload):
+        body = json.dumps(payload).encode()
+        return self.client.post(
+            reverse('payment_webhook'), body, content_type='application/json',
+            HTTP_X_SIGNATURE=sign_payload(body),
+        )
+
+    def test_webhook_accepts_numeric_ids(self):
+        booking = make_booking(self.tour, self.tourist, status='pending', transaction_id='12345')
+        response = self.post_webhook({'event_id': 42, 'transaction_id': 12345, 'amount': 100, 'status': 'success'})
+        self.assertEqual(response.status_code, 202)
+
+        event = PaymentWebhookEvent.objects.get()
+        self.assertEqual((event.idempotency_key, event.payload['transaction_id']), ('42', '12345'))
+        self.process()
+        event.refresh_from_db()
+        booking.refresh_from_db()
+        self.assertEqual(event.status, 'processed')
+        self.assertEqual(booking.payment_status, 'paid')
+
+    def test_webhook_rejects_non_scalar_fields(self):
+        for payload in (
+            {'event_id': ['e1'], 'transaction_id': 'TRX1', 'amount': '100', 'status': 'success'},
+            {'event_id': 'e1', 'transaction_id': {'id': 'TRX1'}, 'amount': '100', 'status': 'success'},
+            {'event_id': 'e1', 'transaction_id': 'TRX1', 'amount': '100', 'status': True},
+        ):
+            self.assertEqual(self.post_webhook(payload).status_code, 400)
+        self.assertFalse(PaymentWebhookEvent.objects.exists())
+
+    def test_webhook_rejects_non_object_payload(self):
+        body = b'[1, 2]'
+        response = self.client.post(
+            reverse('payment_webhook'), body, content_type='application/json',
+            HTTP_X_SIGNATURE=sign_payload(body),
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(PaymentWebhookEvent.objects.exists())
+
+
+class RecentNotificationsTests(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user('org', user_type='organizer')
+        self.tourist = User.objects.create_user('tourist', user_type='tourist')
+        self.tour = make_tour(self.organizer)
+        self.url = reverse('get_recent_notifications')
+        self.client.force_login(self.tourist)
+
+    def notify(self, title):
+        notification = Notification.objects.create(organizer=self.organizer, tour=self.tour, title=title, message='-')
+        with self.captureOnCommitCallbacks(execute=True):
+            fan_out(notification, [self.tourist])
+        return notification
+
+    def test_unchanged_list_is_not_modified(self):
+        self.notify('First')
+        response = self.client.get(self.url)
+        self.assertEqual([item['title'] for item in response.json()['notifications']], ['First'])
+
+        etag = response['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=f'"stale", {etag}')
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_must_match_exactly(self):
+        self.notify('First')
+        etag = self.client.get(self.url)['ETag']
+        # A substring of the header used to count as a match
+        for header in (f'"x{etag[1:-1]}x"', f'{etag[:-1]}0"', etag[1:-1]):
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=header).status_code, 200)
+
+    def test_fan_out_and_deletes_invalidate(self):
+        self.notify('First')
+        etag = self.client.get(self.url)['ETag']
+
+        self.notify('Second')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual([item['title'] for item in response.json()['notifications']], ['Second', 'First'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tour.delete()
+        self.assertEqual(self.client.get(self.url).json()['notifications'], [])
+
+
+    def test_mark_read_updates_count_and_dropdown(self):
+        self.notify('First')
+        self.assertEqual(self.client.get(reverse('get_unread_count')).json(), {'unread_count': 1})
+        etag = self.client.get(self.url)['ETag']
+        inbox = UserNotification.objects.get(user=self.tourist)
+
+        response = self.client.post(reverse('mark_notification_read', args=[inbox.id]))
+        self.assertEqual(response.json(), {'success': True})
+        self.assertEqual(self.client.get(reverse('get_unread_count')).json(), {'unread_count': 0})
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['notifications'][0]['is_read'])
+
+    def test_cannot_mark_someone_elses_notification(self):
+        self.notify('First')
+        inbox = UserNotification.objects.get(user=self.tourist)
+        self.client.force_login(User.objects.create_user('other', user_type='tourist'))
+
+        response = self.client.post(reverse('mark_notification_read', args=[inbox.id]))
+        self.assertEqual(response.json()['success'], False)
+        self.assertFalse(UserNotification.objects.get(id=inbox.id).is_read)
+
+    def test_anonymous_polls_redirect_to_login(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('get_unread_count')).status_code, 302)
+
+
+class OrganizerDepartmentTests(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user('org', password='pw', user_type='organizer')
+        self.profile = self.organizer.organizerprofile
+        self.profile.department = 'Dept. of CSE'
+        self.profile.save()
+
+    def test_department_created_later_is_linked(self):
+        self.assertIsNone(self.profile.uap_department)
+        department = UAPDepartment.objects.create(name='CSE Department', code='CSE')
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.uap_department, department)
+
+    def test_renamed_and_deleted_departments_are_relinked(self):
+        department = UAPDepartment.objects.create(name='CSE Department', code='CSE')
+        department.name, department.code = 'Architecture', 'ARCH'
+        department.save()
+        self.profile.refresh_from_db()
+        self.assertIsNone(self.profile.uap_department)
+
+        replacement = UAPDepartment.objects.create(name='Computer Science', code='CSE')
+        department.delete()
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.uap_department, replacement)
+
+    def test_unchanged_department_save_does_not_relink(self):
+        department = UAPDepartment.objects.create(name='CSE Department', code='CSE')
+        with mock.patch.object(UAPDepartment, 'relink_organizers') as relink:
+            department.description = 'Computer Science and Engineering'
+            department.save()
+            relink.assert_not_called()
+            department.code = 'CS'
+            department.save()
+            relink.assert_called_once_with(department.id)
+
+    def test_create_tour_uses_profile_department(self):
+        department = UAPDepartment.objects.create(name='CSE Department', code='CSE')
+        self.client.force_login(self.organizer)
+        self.client.post(reverse('create_tour'), {
+            'title': 'Lab tour', 'description': '-', 'category': 'department', 'price': '0',
+            'duration_hours': 1, 'max_participants': 5, 'meeting_point': '-',
+            'tour_date': '2030-01-01 10:00',
+        })
+        self.assertEqual(Tour.objects.get().department, department)
+
+    def test_create_tour_without_profile_does_not_create_one(self):
+        self.profile.delete()
+        self.client.force_login(self.organizer)
+        self.client.post(reverse('create_tour'), {
+            'title': 'Lab tour', 'description': '-', 'category': 'department', 'price': '0',
+            'duration_hours': 1, 'max_participants': 5, 'meeting_point': '-',
+            'tour_date': '2030-01-01 10:00',
+        })
+        self.assertIsNone(Tour.objects.get().department)
+        self.assertFalse(OrganizerProfile.objects.exists())
+
+
+class DepartmentStatsTests(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user('org', user_type='organizer')
+        self.tourist = User.objects.create_user('tourist', user_type='tourist')
+        self.cse = UAPDepartment.objects.create(name='CSE Department', code='CSE')
+        self.eee = UAPDepartment.objects.create(name='EEE Department', code='EEE')
+
+    def assertStats(self, department, upcoming_tours, seats_left, rating_sum=0, rating_count=0):
+        expected = (upcoming_tours, seats_left, rating_sum, rating_count)
+        fields = ('upcoming_tours', 'seats_left', 'rating_sum', 'rating_count')
+        self.assertEqual(DepartmentStats.objects.values_list(*fields).get(department=department), expected)
+        # The deltas must agree with a full recompute
+        DepartmentStats.refresh(department.id)
+        self.assertEqual(DepartmentStats.objects.values_list(*fields).get(department=department), expected)
+
+    def test_booking_changes_apply_deltas(self):
+        tour = make_tour(self.organizer, department=self.cse, max_participants=10)
+        self.assertStats(self.cse, 1, 10)
+
+        with mock.patch.object(DepartmentStats, 'refresh') as refresh:
+            booking = make_booking(tour, self.tourist, status='pending', participants=2)
+            booking.status = 'confirmed'
+            booking.save()
+            booking.participants = 3
+            booking.save()
+            refresh.assert_not_called()
+        self.assertStats(self.cse, 1, 7)
+
+        booking.status = 'cancelled'
+        booking.save()
+        booking.save()
+        self.assertStats(self.cse, 1, 10)
+
+        held = make_booking(tour, self.tourist, participants=4)
+        self.assertStats(self.cse, 1, 6)
+        held.delete()
+        booking.delete()
+        self.assertStats(self.cse, 1, 10)
+
+    def test_tour_changes_apply_deltas(self):
+        tour = make_tour(self.organizer, department=self.cse, max_participants=10)
+        make_booking(tour, self.tourist, participants=3)
+        self.assertStats(self.cse, 1, 7)
+
+        tour.max_participants = 12
+        tour.save()
+        self.assertStats(self.cse, 1, 9)
+
+        tour.department = self.eee
+        tour.save()
+        self.assertStats(self.cse, 0, 0)
+        self.assertStats(self.eee, 1, 9)
+
+        tour.status = 'draft'
+        tour.save()
+        self.assertStats(self.eee, 0, 0)
+        tour.status = 'published'
+        tour.save()
+        self.assertStats(self.eee, 1, 9)
+
+        tour.delete()
+        self.assertStats(self.eee, 0, 0)
+
+    def test_review_ratings_apply_deltas(self):
+        tour = make_tour(self.organizer, department=self.cse)
+        review = Review.objects.create(tour=tour, tourist=self.tourist, rating=4, comment='-')
+        self.assertStats(self.cse, 1, 10, 4, 1)
+        review.rating = 2
+        review.save()
+        self.assertStats(self.cse, 1, 10, 2, 1)
+        review.delete()
+        self.assertStats(self.cse, 1, 10, 0, 0)
+
+    def test_bulk_expiry_and_refunds_release_seats(self):
+        tour = make_tour(self.organizer, department=self.cse, max_participants=10)
+        overdue = make_booking(tour, self.tourist, status='pending', participants=2)
+        make_booking(tour, self.tourist, status='pending', participants=3, transaction_id='TRX1')
+        Booking.objects.filter(id=overdue.id).update(booking_date=timezone.now() - timedelta(days=2))
+        self.assertStats(self.cse, 1, 5)
+
+        call_command('expire_bookings', stdout=StringIO())
+        self.assertStats(self.cse, 1, 7)
+
+        apply_settlements([{'transaction_id': 'TRX1', 'amount': '100', 'status': 'success'}])
+        self.assertStats(self.cse, 1, 7)
+        apply_settlements([{'transaction_id': 'TRX1', 'amount': '100', 'status': 'refunded'}])
+        self.assertStats(self.cse, 1, 10)
+
+
+class WaitlistTests(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user('org', user_type='organizer')
+        self.tourist = User.objects.create_user('tourist', password='pw', user_type='tourist')
+        self.tour = make_tour(self.organizer, max_participants=2)
+        self.url = reverse('tour_detail', args=[self.tour.id])
+
+    def wait(self, username, **kwargs):
+        return WaitlistEntry.objects.create(
+            tour=self.tour, tourist=User.objects.create_user(username, user_type='tourist'), **kwargs
+        )
+
+    def test_rejoining_after_an_expired_offer_requeues(self):
+        entry = WaitlistEntry.objects.create(tour=self.tour, tourist=self.tourist, status='expired')
+        self.client.force_login(self.tourist)
+        self.client.post(self.url, {'join_waitlist': '1', 'participants': '2'})
+
+        entry.refresh_from_db()
+        self.assertEqual((entry.status, entry.participants, entry.offered_at), ('waiting', 2, None))
+
+    def test_seats_held_by_an_offer_show_the_waitlist_form(self):
+        make_booking(self.tour, User.objects.create_user('booked', user_type='tourist'))
+        self.wait('offered', status='offered', offered_at=timezone.now())
+        self.client.force_login(self.tourist)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['bookable_spots'], 0)
+        self.assertContains(response, 'name="join_waitlist"')
+
+    def test_cancelling_a_booking_offers_its_seats_once(self):
+        booking = make_booking(self.tour, self.tourist, participants=2)
+        too_big = self.wait('group', participants=3)
+        waiting = self.wait('next', participants=2)
+        self.client.force_login(self.tourist)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('cancel_booking', args=[booking.id]))
+        too_big.refresh_from_db()
+        waiting.refresh_from_db()
+        self.assertEqual((too_big.status, waiting.status), ('waiting', 'offered'))
+        self.assertEqual(
+            list(UserNotification.objects.values_list('user__username', flat=True)), ['next'],
+        )
+
+        # Later saves of the cancelled booking don't promote again
+        booking.refresh_from_db()
+        booking.special_requirements = 'Wheelchair access'
+        with mock.patch('tours.waitlist.promote_waitlist') as promote:
+            with self.captureOnCommitCallbacks(execute=True):
+                booking.save()
+        promote.assert_not_called()
+
+    def test_expired_offer_is_passed_to_the_next_tourist(self):
+        stale = self.wait('slow', status='offered', offered_at=timezone.now() - timedelta(days=2), participants=2)
+        waiting = self.wait('next', participants=2)
+
+        self.assertEqual(expire_offers(), 1)
+        stale.refresh_from_db()
+        waiting.refresh_from_db()
+        self.assertEqual((stale.status, waiting.status), ('expired', 'offered'))
+
+
+class ExpireBookingsTests(TestCase):
+    def test_counts_only_cancelled_bookings_and_frees_calendar_seats(self):
+        organizer = User.objects.create_user('org', user_type='organizer')
+        tourist = User.objects.create_user('tourist', user_type='tourist')
+        tour = make_tour(organizer, max_participants=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            overdue = make_booking(tour, tourist, status='pending', participants=2)
+            make_booking(tour, tourist, status='pending', participants=1)
+        Booking.objects.filter(id=overdue.id).update(booking_date=timezone.now() - timedelta(days=2))
+        self.assertEqual(TourCalendarEntry.objects.get(tour=tour).remaining_seats, 2)
+
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('expire_bookings', stdout=out)
+        self.assertIn('Expired 1 unpaid bookings.', out.getvalue())
+        overdue.refresh_from_db()
+        self.assertEqual(overdue.status, 'cancelled')
+        self.assertEqual(TourCalendarEntry.objects.get(tour=tour).remaining_seats, 4)
+
+    def test_booking_paid_mid_sweep_is_not_expired(self):
+        organizer = User.objects.create_user('org', user_type='organizer')
+        tourist = User.objects.create_user('tourist', user_type='tourist')
+        tour = make_tour(organizer)
+        overdue = make_booking(tour, tourist, status='pending')
+        paid = make_booking(tour, tourist, status='pending')
+        Booking.objects.update(booking_date=timezone.now() - timedelta(days=2))
+
+        def pay_then_atomic():
+            # The payment lands after the sweep picked its candidates
+            Booking.objects.filter(id=paid.id).update(status='confirmed', payment_status='paid')
+            return transaction.atomic()
+
+        expired = []
+        receiver = lambda booking_ids, **kwargs: expired.extend(booking_ids)
+        bookings_expired.connect(receiver)
+        self.addCleanup(bookings_expired.disconnect, receiver)
+        out = StringIO()
+        stub = SimpleNamespace(atomic=pay_then_atomic, on_commit=transaction.on_commit)
+        with mock.patch('tours.management.commands.expire_bookings.transaction', stub):
+            with self.captureOnCommitCallbacks(execute=True):
+                call_command('expire_bookings', stdout=out)
+
+        self.assertIn('Expired 1 unpaid bookings.', out.getvalue())
+        self.assertEqual(expired, [overdue.id])
+        paid.refresh_from_db()
+        self.assertEqual((paid.status, paid.payment_status), ('confirmed', 'paid'))
+
+
+class TourCalendarTests(TestCase):
+    def test_lists_published_tours_of_the_month(self):
+        tour = make_tour(User.objects.create_user('org', user_type='organizer'))
+        date = timezone.localtime(tour.tour_date)
+        response = self.client.get(reverse('tour_calendar', args=[date.year, date.month]))
+        self.assertEqual(response.json()['days'], {
+            date.date().isoformat(): [{'tour_id': tour.id, 'department_id': None, 'remaining_seats': 10}],
+        })
+
+    def test_years_outside_the_date_range_are_not_found(self):
+        for year in (0, 10000):
+            self.assertEqual(self.client.get(reverse('tour_calendar', args=[year, 1])).status_code, 404)
+
+
+class PruneNotificationsTests(TestCase):
+    def test_archives_old_read_rows_only(self):
+        organizer = User.objects.create_user('org', user_type='organizer')
+        tourists = [User.objects.create_user(f'tourist{i}', user_type='tourist') for i in range(3)]
+        notification = Notification.objects.create(organizer=organizer, title='Old news', message='-')
+        fan_out(notification, tourists)
+        inbox = UserNotification.objects.filter(notification=notification)
+        inbox.exclude(user=tourists[2]).update(is_read=True)
+        inbox.update(created_at=timezone.now() - timedelta(days=365))
+
+        out = StringIO()
+        call_command('prune_notifications', '--batch-size', '1', stdout=out)
+
+        self.assertIn('Archived and removed 2 read notifications.', out.getvalue())
+        self.assertEqual(list(inbox.values_list('user_id', flat=True)), [tourists[2].id])
+        archive = NotificationArchive.objects.get(notification=notification)
+        self.assertEqual(sorted(archive.recipient_ids()), [tourists[0].id, tourists[1].id])
+
+
+class TrendingTests(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user('org', user_type='organizer')
+        self.tourist = User.objects.create_user('tourist', user_type='tourist')
+        self.tour = make_tour(self.organizer)
+
+    def score(self, tour):
+        return Tour.objects.values_list('trending_score', flat=True).get(id=tour.id)
+
+    def test_log_add(self):
+        self.assertAlmostEqual(log_add(3.0, 3.0), 4.0)
+        self.assertAlmostEqual(log_add(0.0, 1.0), math.log2(3))
+        # Far beyond float range as plain numbers, still exact in log space
+        self.assertEqual(log_add(5000.0, 10.0), 5000.0)
+
+    def test_bump_adds_events_in_log_space(self):
+        when = EPOCH + timedelta(days=400)
+        bump({self.tour.id: 1}, 'wishlist', when)
+        self.assertAlmostEqual(self.score(self.tour), log_add(0.0, event_log_score('wishlist', when)))
+
+        bump({self.tour.id: 2}, 'booking', when)
+        expected = log_add(log_add(0.0, event_log_score('wishlist', when)), event_log_score('booking', when, 2))
+        self.assertAlmostEqual(self.score(self.tour), expected)
+
+    @override_settings(TRENDING_HALF_LIFE_DAYS=0.5)
+    def test_newer_events_outrank_older_ones_without_overflow(self):
+        older = make_tour(self.organizer, title='Older')
+        # Thousands of half-lives past the epoch, where 2 ** t overflows a float
+        bump({older.id: 5}, 'booking', EPOCH + timedelta(days=3000))
+        bump({self.tour.id: 1}, 'wishlist', EPOCH + timedelta(days=3002))
+
+        self.assertTrue(math.isfinite(self.score(older)))
+        self.assertGreater(self.score(self.tour), self.score(older))
+        self.assertEqual(
+            list(Tour.objects.order_by('-trending_score').values_list('id', flat=True)[:2]),
+            [self.tour.id, older.id],
+        )
+
+    def test_rebuild_matches_incremental_scores(self):
+        make_booking(self.tour, self.tourist)
+        Wishlist.objects.create(tourist=self.tourist, tour=self.tour)
+        quiet = make_tour(self.organizer, title='Quiet')
+        incremental = self.score(self.tour)
+        Tour.objects.update(trending_score=123)
+
+        call_command('rebuild_trending', stdout=StringIO())
+        self.assertAlmostEqual(self.score(self.tour), incremental, places=6)
+        self.assertEqual(self.score(quiet), 0)
+
+
+class WishlistTests(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user('org', user_type='organizer')
+        self.tourist = User.objects.create_user('tourist', user_type='tourist')
+        self.tour = make_tour(self.organizer)
+        self.draft = make_tour(self.organizer, title='Draft', status='draft')
+        self.client.force_login(self.tourist)
+
+    def toggle(self, tour_id):
+        return self.client.post(reverse('wishlist_toggle', args=[tour_id]))
+
+    def sync(self, operations):
+        return self.client.post(
+            reverse('wishlist_sync'), json.dumps({'operations': operations}), content_type='application/json'
+        )
+
+    def test_toggle_adds_then_removes(self):
+        self.assertTrue(self.toggle(self.tour.id).json()['added'])
+        self.assertTrue(Wishlist.objects.filter(tourist=self.tourist, tour=self.tour).exists())
+        self.assertFalse(self.toggle(self.tour.id).json()['added'])
+        self.assertFalse(Wishlist.objects.exists())
+
+    def test_toggle_rejects_missing_and_draft_tours(self):
+        self.assertEqual(self.toggle(999).status_code, 404)
+        self.assertEqual(self.toggle(self.draft.id).status_code, 404)
+        self.assertFalse(Wishlist.objects.exists())
+
+    def test_sync_applies_last_operation_per_tour(self):
+        other = make_tour(self.organizer, title='Other')
+        Wishlist.objects.create(tourist=self.tourist, tour=other)
+        response = self.sync([
+            {'op': 'add', 'tour_id': self.tour.id},
+            {'op': 'add', 'tour_id': other.id},
+            {'op': 'remove', 'tour_id': other.id},
+            {'op': 'add', 'tour_id': self.draft.id},
+            {'op': 'add', 'tour_id': 999},
+        ])
+        self.assertEqual(response.json(), {'wishlist': [self.tour.id]})
+        self.assertGreater(Tour.objects.get(id=self.tour.id).trending_score, 0)
+
+    def test_sync_rejects_malformed_operations(self):
+        self.assertEqual(self.sync([{'op': 'star', 'tour_id': self.tour.id}]).status_code, 400)
+        self.assertEqual(self.sync([{'op': 'add', 'tour_id': 'x'}]).status_code, 400)
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    def open(self):
+        raise ConnectionRefusedError('SMTP server unavailable')
+
+
+class RecordingSMSBackend:
+    sent = []
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def send(self, phone, text):
+        self.sent.append((phone, text))
+
+
+@override_settings(SMS_BACKEND='tours.tests.RecordingSMSBackend', OUTBOX_MAX_ATTEMPTS=3, OUTBOX_RETRY_SECONDS=60)
+class DeliverOutboxTests(TestCase):
+    def setUp(self):
+        RecordingSMSBackend.sent = []
+        organizer = User.objects.create_user('org', user_type='organizer')
+        self.tourist = User.objects.create_user('tourist', user_type='tourist')
+        self.notification = Notification.objects.create(
+            organizer=organizer, title='Bus moved', message='Meet at gate 2', notification_type='reminder',
+        )
+
+    def queue(self, channel, recipient, **kwargs):
+        return OutboxMessage.objects.create(
+            notification=self.notification, user=self.tourist, channel=channel, recipient=recipient, **kwargs
+        )
+
+    def deliver(self):
+        out = StringIO()
+        call_command('deliver_outbox', '--rate', '0', stdout=out)
+        return out.getvalue()
+
+    def test_sends_and_marks_messages(self):
+        email = self.queue('email', 'tourist@example.com')
+        sms = self.queue('sms', '01700000000')
+        self.assertIn('Sent 2 messages', self.deliver())
+
+        self.assertEqual([(m.subject, m.to) for m in mail.outbox], [('Bus moved', ['tourist@example.com'])])
+        self.assertEqual(RecordingSMSBackend.sent, [('01700000000', 'Bus moved: Meet at gate 2')])
+        for message in (email, sms):
+            message.refresh_from_db()
+            self.assertEqual((message.status, message.attempts), ('sent', 1))
+            self.assertIsNotNone(message.sent_at)
+
+        self.assertIn('Sent 0 messages', self.deliver())
+        self.assertEqual(len(mail.outbox), 1)
+
+    @override_settings(EMAIL_BACKEND='tours.tests.FailingEmailBackend')
+    def test_failures_back_off_then_dead_letter(self):
+        message = self.queue('email', 'tourist@example.com')
+
+        started = timezone.now()
+        self.assertIn('1 scheduled for retry', self.deliver())
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts, message.last_error), ('pending', 1, 'SMTP server unavailable'))
+        self.assertAlmostEqual((message.next_attempt_at - started).total_seconds(), 60, delta=5)
+
+        # Not due yet, so a second run leaves it alone
+        self.assertIn('Sent 0 messages; 0 scheduled', self.deliver())
+
+        OutboxMessage.objects.update(next_attempt_at=timezone.now())
+        started = timezone.now()
+        self.deliver()
+        message.refresh_from_db()
+        self.assertEqual(message.attempts, 2)
+        self.assertAlmostEqual((message.next_attempt_at - started).total_seconds(), 120, delta=5)
+
+        OutboxMessage.objects.update(next_attempt_at=timezone.now())
+        self.assertIn('1 dead-lettered', self.deliver())
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), ('dead', 3))
+        self.assertIsNone(message.sent_at)
+
+
+class TourCardTests(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user('org', user_type='organizer')
+        self.tourist = User.objects.create_user('tourist', user_type='tourist')
+        self.department = UAPDepartment.objects.create(name='CSE Department', code='CSE')
+        self.client.force_login(self.tourist)
+
+    def make_catalog_tour(self, title, booked=0, **kwargs):
+        tour = make_tour(self.organizer, title=title, department=self.department, **kwargs)
+        if booked:
+            make_booking(tour, self.tourist, participants=booked)
+        return tour
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_cards_show_seats_left_and_wishlist_state(self):
+        open_tour = self.make_catalog_tour('Open tour', booked=2)
+        sold_out = self.make_catalog_tour('Sold out tour', booked=10)
+        make_booking(open_tour, self.tourist, participants=3, status='cancelled')
+        Wishlist.objects.create(tourist=self.tourist, tour=sold_out)
+
+        for url in (reverse('tour_list'), reverse('department_tours', args=[self.department.id])):
+            content = self.client.get(url).content.decode()
+            self.assertIn('8 spots left', content)
+            self.assertIn('0 spots left', content)
+            self.assertIn('Sold out', content)
+            self.assertRegex(content, rf'wishlist-btn active"\s+data-tour="{sold_out.id}"')
+            self.assertRegex(content, rf'wishlist-btn "\s+data-tour="{open_tour.id}"')
+
+    def test_query_count_does_not_grow_with_tours(self):
+        self.make_catalog_tour('First tour', booked=1)
+        urls = (reverse('tour_list'), reverse('department_tours', args=[self.department.id]))
+        baseline = [self.count_queries(url) for url in urls]
+
+        for i in range(5):
+            self.make_catalog_tour(f'Tour {i}', booked=i + 1)
+        self.assertEqual([self.count_queries(url) for url in urls], baseline)
+
+
+@unittest.skipIf(recommendations_np is None, 'build_recommendations needs numpy and scipy')
+class RecommendationTests(TestCase):
+    def setUp(self):
+        organizer = User.objects.create_user('org', user_type='organizer')
+        self.walk = make_tour(organizer, title='Campus walk')
+        self.museum = make_tour(organizer, title='Museum visit')
+        self.past = make_tour(organizer, title='Last year\'s trip', tour_date=timezone.now() - timedelta(days=30))
+        self.alice, self.bob, self.carol = (
+            User.objects.create_user(name, user_type='tourist') for name in ('alice', 'bob', 'carol')
+        )
+        for tour in (self.walk, self.museum, self.past):
+            make_booking(tour, self.alice)
+        make_booking(self.walk, self.bob)
+        Wishlist.objects.create(tourist=self.bob, tour=self.museum)
+        make_booking(self.walk, self.carol)
+        make_booking(self.past, self.carol, status='cancelled')
+
+    def build(self):
+        call_command('build_recommendations', stdout=StringIO())
+
+    def test_recommends_co_booked_upcoming_tours_only(self):
+        self.build()
+
+        self.assertEqual(
+            list(UserRecommendation.objects.filter(user=self.carol).values_list('tour', 'rank')),
+            [(self.museum.id, 1)],
+        )
+        # alice already has every tour, and past tours are never suggested
+        self.assertFalse(UserRecommendation.objects.filter(user=self.alice).exists())
+        self.assertFalse(UserRecommendation.objects.filter(tour=self.past).exists())
+        self.assertEqual(
+            list(TourSimilarity.objects.filter(tour=self.walk).values_list('similar_tour', flat=True)),
+            [self.museum.id],
+        )
+
+        self.client.force_login(self.carol)
+        home = self.client.get(reverse('home'))
+        self.assertEqual(list(home.context['recommended_tours']), [self.museum])
+        detail = self.client.get(reverse('tour_detail', args=[self.walk.id]))
+        self.assertEqual(list(detail.context['similar_tours']), [self.museum])
+
+    def test_rebuild_replaces_previous_rows(self):
+        self.build()
+        Booking.objects.filter(tourist=self.carol).update(status='cancelled')
+        self.build()
+
+        self.assertFalse(UserRecommendation.objects.filter(user=self.carol).exists())
+        self.assertEqual(TourSimilarity.objects.filter(tour=self.walk).count(), 1)
+
+
+class SendTourRemindersTests(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user('org', user_type='organizer')
+        self.tourist = User.objects.create_user('tourist', user_type='tourist')
+        self.pending = User.objects.create_user('pending', user_type='tourist')
+
+    def remind(self):
+        out = StringIO()
+        call_command('send_tour_reminders', '--windows', '24', '2', stdout=out)
+        return out.getvalue()
+
+    def reminded(self, tour):
+        return list(TourReminder.objects.filter(tour=tour).order_by('-window').values_list('window', flat=True))
+
+    def test_each_window_is_sent_once_to_confirmed_tourists(self):
+        tour = make_tour(self.organizer, tour_date=timezone.now() + timedelta(hours=20))
+        make_booking(tour, self.tourist)
+        make_booking(tour, self.pending, status='pending')
+
+        self.assertIn('sent 1 tour reminders', self.remind())
+        self.assertIn('sent 0 tour reminders', self.remind())
+        self.assertEqual(self.reminded(tour), [24])
+
+        Tour.objects.filter(id=tour.id).update(tour_date=timezone.now() + timedelta(hours=1))
+        self.assertIn('sent 1 tour reminders', self.remind())
+        self.assertIn('sent 0 tour reminders', self.remind())
+        self.assertEqual(self.reminded(tour), [24, 2])
+
+        self.assertEqual(
+            list(UserNotification.objects.order_by('id').values_list('user', 'notification__notification_type')),
+            [(self.tourist.id, 'reminder'), (self.tourist.id, 'reminder')],
+        )
+
+    def test_only_the_tightest_window_applies(self):
+        soon = make_tour(self.organizer, tour_date=timezone.now() + timedelta(hours=1))
+        later = make_tour(self.organizer, tour_date=timezone.now() + timedelta(hours=30))
+        make_booking(soon, self.tourist)
+
+        self.assertIn('sent 1 tour reminders', self.remind())
+        self.assertEqual(self.reminded(soon), [2])
+        self.assertEqual(self.reminded(later), [])
+        self.assertEqual(UserNotification.objects.filter(user=self.tourist).count(), 1)
+
+    def test_tours_without_bookings_are_marked_without_a_notification(self):
+        tour = make_tour(self.organizer, tour_date=timezone.now() + timedelta(hours=5))
+
+        self.assertIn('sent 1 tour reminders', self.remind())
+        self.assertIsNone(TourReminder.objects.get(tour=tour).notification)
+        self.assertFalse(Notification.objects.exists())
+
+
+class CompletePastToursTests(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user('org', user_type='organizer')
+        self.tourist = User.objects.create_user('tourist', user_type='tourist')
+
+    def past_tour(self, hours_ago, **kwargs):
+        return make_tour(self.organizer, tour_date=timezone.now() - timedelta(hours=hours_ago), **kwargs)
+
+    def test_completes_tours_past_the_grace_period_and_their_confirmed_bookings(self):
+        first, second = self.past_tour(72), self.past_tour(48)
+        recent = self.past_tour(2)
+        draft = self.past_tour(72, status='draft')
+        confirmed = make_booking(first, self.tourist)
+        pending = make_booking(second, self.tourist, status='pending')
+        cancelled = make_booking(second, self.tourist, status='cancelled')
+        recent_booking = make_booking(recent, self.tourist)
+        waiting = WaitlistEntry.objects.create(tour=first, tourist=User.objects.create_user('late', user_type='tourist'))
+        self.assertEqual(TourCalendarEntry.objects.count(), 3)
+
+        out = StringIO()
+        call_command('complete_past_tours', '--hours', '24', '--batch-size', '1', stdout=out)
+        self.assertIn('Completed 2 tours and 1 bookings.', out.getvalue())
+
+        statuses = dict(Tour.objects.values_list('id', 'status'))
+        self.assertEqual(
+            [statuses[tour.id] for tour in (first, second, recent, draft)],
+            ['completed', 'completed', 'published', 'draft'],
+        )
+        self.assertEqual(
+            [Booking.objects.get(id=booking.id).status for booking in (confirmed, pending, cancelled, recent_booking)],
+            ['completed', 'pending', 'cancelled', 'confirmed'],
+        )
+        self.assertEqual(list(TourCalendarEntry.objects.values_list('tour_id', flat=True)), [recent.id])
+        waiting.refresh_from_db()
+        self.assertEqual(waiting.status, 'expired')
+
+        out = StringIO()
+        call_command('complete_past_tours', '--hours', '24', stdout=out)
+        self.assertIn('Completed 0 tours and 0 bookings.', out.getvalue())
+
+
+class TicketTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        overrides = override_settings(MEDIA_ROOT=directory.name)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        self.organizer = User.objects.create_user('org', user_type='organizer')
+        self.tourist = User.objects.create_user('tourist', user_type='tourist')
+        self.tour = make_tour(self.organizer)
+        self.booking = make_booking(self.tour, self.tourist)
+        self.client.force_login(self.tourist)
+
+    def fetch(self, kind):
+        response = self.client.get(reverse('booking_ticket', args=[self.booking.id, kind]))
+        self.assertEqual(response.status_code, 302)
+        return self.client.get(response.url)
+
+    def test_ticket_token_round_trip(self):
+        token = self.booking.ticket_token
+        self.assertEqual(read_ticket_token(f' {token}\n'), (self.booking.id, self.tour.id))
+        with self.assertRaises(signing.BadSignature):
+            read_ticket_token(token.replace(f'{self.booking.id}.', f'{self.booking.id + 1}.', 1))
+
+    def test_tickets_are_rendered_once_and_cached_immutably(self):
+        for kind, content_type, magic in (('png', 'image/png', b'\x89PNG'), ('pdf', 'application/pdf', b'%PDF')):
+            response = self.fetch(kind)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.headers['Content-Type'], content_type)
+            self.assertIn('immutable', response.headers['Cache-Control'])
+            self.assertTrue(b''.join(response.streaming_content).startswith(magic))
+
+        name = ticket_name(ticket_digest(ticket_details(self.booking)), 'png')
+        with mock.patch('tours.tickets.RENDERERS', {}):
+            response = self.fetch('png')
+            self.assertEqual(response.status_code, 200)
+            with default_storage.open(name) as f:
+                self.assertEqual(b''.join(response.streaming_content), f.read())
+
+    def test_changed_booking_gets_a_new_url(self):
+        current_url = reverse('booking_ticket', args=[self.booking.id, 'png'])
+        old_url = self.client.get(current_url).url
+        Booking.objects.filter(id=self.booking.id).update(participants=3)
+
+        self.assertNotEqual(self.client.get(current_url).url, old_url)
+        self.assertRedirects(self.client.get(old_url), current_url, target_status_code=302)
+
+    def test_only_confirmed_bookings_of_the_user_have_tickets(self):
+        other = User.objects.create_user('other', user_type='tourist')
+        pending = make_booking(self.tour, other, status='pending')
+        self.assertEqual(self.client.get(reverse('booking_ticket', args=[pending.id, 'png'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('booking_ticket', args=[self.booking.id, 'gif'])).status_code, 404)
+
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(reverse('booking_ticket', args=[self.booking.id, 'png'])).status_code, 404)
+        self.client.force_login(self.organizer)
+        self.assertEqual(self.fetch('png').status_code, 200)
+
+    def test_render_tickets_skips_tickets_already_on_disk(self):
+        make_booking(self.tour, User.objects.create_user('pending', user_type='tourist'), status='pending')
+
+        def render():
+            out = StringIO()
+            # Threads instead of processes keep the workers inside this test's settings
+            with mock.patch('tours.management.commands.render_tickets.ProcessPoolExecutor', ThreadPoolExecutor):
+                call_command('render_tickets', '--workers', '2', stdout=out)
+            return out.getvalue()
+
+        self.assertIn('Rendered 2 ticket files.', render())
+        digest = ticket_digest(ticket_details(self.booking))
+        self.assertTrue(all(default_storage.exists(ticket_name(digest, kind)) for kind in ('png', 'pdf')))
+        self.assertIn('Rendered 0 ticket files.', render())
+
+
+class TourManifestTests(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user('org', user_type='organizer')
+        self.tour = make_tour(self.organizer)
+        self.url = reverse('tour_manifest', args=[self.tour.id])
+
+    def manifest(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Type'], 'text/csv')
+        return list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+
+    def test_lists_confirmed_participants_with_their_primary_contact(self):
+        rahim = User.objects.create_user('rahim', first_name='Rahim', last_name='Khan', phone='017', user_type='tourist')
+        karim = User.objects.create_user('karim', user_type='tourist')
+        EmergencyContact.objects.create(user=rahim, full_name='Uncle', relationship='guardian', phone='018')
+        EmergencyContact.objects.create(user=rahim, full_name='Mother', relationship='parent', phone='019', is_primary=True)
+        first = make_booking(self.tour, rahim, participants=2, special_requirements='Vegetarian, no nuts')
+        second = make_booking(self.tour, karim, status='completed')
+        make_booking(self.tour, User.objects.create_user('pending', user_type='tourist'), status='pending')
+
+        self.client.force_login(self.organizer)
+        self.assertEqual(self.manifest(), [
+            ['Booking', 'Username', 'Name', 'Phone', 'Participants', 'Special Requirements',
+             'Emergency Contact', 'Relationship', 'Emergency Phone'],
+            [str(second.id), 'karim', '', '', '1', '', '', '', ''],
+            [str(first.id), 'rahim', 'Rahim Khan', '017', '2', 'Vegetarian, no nuts', 'Mother', 'parent', '019'],
+        ])
+
+    def test_only_the_organizer_and_developers_can_download(self):
+        self.client.force_login(User.objects.create_user('other', user_type='organizer'))
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+        self.client.force_login(User.objects.create_superuser('dev', password='secret-pass'))
+        self.assertEqual(len(self.manifest()), 1)
+
+
+class DomainEventTests(TestCase):
+    def kinds(self):
+        return list(DomainEvent.objects.order_by('id').values_list('kind', flat=True))
+
+    def test_emit_outside_a_batch_writes_immediately(self):
+        tourist = User.objects.create_user('tourist', user_type='tourist')
+        emit('booking.created', actor=tourist, tour=7, seats=2)
+
+        event = DomainEvent.objects.get()
+        self.assertEqual((event.actor_id, event.tour_id, event.booking_id), (tourist.id, 7, None))
+        self.assertEqual(event.payload, {'seats': 2})
+        self.assertEqual(event.partition, event.occurred_at.year * 100 + event.occurred_at.month)
+        with self.assertRaises(ValueError):
+            event.save()
+
+    @override_settings(EVENT_BATCH_SIZE=3)
+    def test_batched_buffers_until_the_outermost_block_ends(self):
+        with self.assertRaises(RuntimeError):
+            with batched():
+                emit('a')
+                with batched():
+                    emit('b')
+                self.assertEqual(self.kinds(), [])
+                emit('c')
+                # Reaching EVENT_BATCH_SIZE flushes early
+                self.assertEqual(self.kinds(), ['a', 'b', 'c'])
+                emit('d')
+                raise RuntimeError
+        # Events buffered before an error are still written
+        self.assertEqual(self.kinds(), ['a', 'b', 'c', 'd'])
+
+    def test_middleware_writes_a_request_s_events_in_one_insert(self):
+        def view(request):
+            emit('first')
+            emit('second')
+            self.assertEqual(self.kinds(), [])
+            return 'response'
+
+        request = RequestFactory().get('/')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(EventBufferMiddleware(view)(request), 'response')
+        self.assertEqual(self.kinds(), ['first', 'second'])
+        self.assertEqual(sum('INSERT' in query['sql'] for query in queries), 1)
+
+    def test_async_middleware_writes_events_after_the_view(self):
+        async def view(request):
+            emit('first')
+            emit('second')
+            return 'response'
+
+        middleware = EventBufferMiddleware(view)
+        self.assertEqual(async_to_sync(middleware)(RequestFactory().get('/')), 'response')
+        self.assertEqual(self.kinds(), ['first', 'second'])
+
+    def test_publishing_a_tour_is_logged(self):
+        organizer = User.objects.create_user('org', user_type='organizer')
+        tour = make_tour(organizer, status='draft')
+        self.client.force_login(organizer)
+        self.client.post(reverse('dashboard'), {'publish_tour': '1', 'tour_id': tour.id})
+
+        self.assertEqual(
+            list(DomainEvent.objects.values_list('kind', 'actor_id', 'tour_id')),
+            [('tour.published', organizer.id, tour.id)],
+        )
+
+    def test_events_since_pages_by_id_and_kind(self):
+        for kind in ('a', 'b', 'a', 'a'):
+            emit(kind)
+        first, second, third, fourth = DomainEvent.objects.order_by('id')
+
+        self.assertEqual(events_since(first.id, limit=2), [second, third])
+        self.assertEqual(events_since(first.id, kinds=['a']), [third, fourth])
+        self.assertEqual(events_since(fourth.id), [])
@@ -0,0 +1,117 @@
+# tours/tickets.py
+import hashlib
+import json
+from io import BytesIO
+
+import qrcode
+from django.core import signing
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageDraw, ImageFont
+
+TICKET_SALT = 'tours.ticket'
+
+
+def make_ticket_token(booking):
+    """Signed, self-describing ticket code for a booking, small enough for a QR"""
+    return signing.Signer(salt=TICKET_SALT).sign(f'{booking.id}.{booking.tour_id}')
+
+
+def read_ticket_token(token):
+    """Return (booking_id, tour_id) from a ticket code, raising signing.BadSignature if forged"""
+    value = signing.Signer(salt=TICKET_SALT).unsign(token.strip())
+    booking_id, tour_id = value.split('.')
+    return int(booking_id), int(tour_id)
+
+
+# Bump when the ticket layout changes so every artifact gets a new name
+TICKET_LAYOUT_VERSION = 1
+TICKET_KINDS = ('png', 'pdf')
+
+
+def ticket_details(booking):
+    """Everything printed on a ticket, as plain data a worker process can render from"""
+    return {
+        'token': make_ticket_token(booking),
+        'booking_id': booking.id,
+        'tour': booking.tour.title,
+        'date': f'{timezone.localtime(booking.tour.tour_date):%a %d %b %Y, %H:%M}',
+        'meeting_point': booking.tour.meeting_point,
+        'participants': booking.participants,
+        'tourist': booking.tourist.get_full_name() or booking.tourist.username,
+    }
+
+
+def ticket_digest(details):
+    payload = json.dumps(details, sort_keys=True) + f'|v{TICKET_LAYOUT_VERSION}'
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def ticket_name(digest, kind):
+    """Content-addressed path under MEDIA_ROOT; a changed booking gets a new file"""
+    return f'tickets/{digest[:2]}/{digest}.{kind}'
+
+
+def qr_image(token):
+    qr = qrcode.QRCode(
+        version=None,
+        error_correction=qrcode.constants.ERROR_CORRECT_M,
+        box_size=10,
+        border=4,
+    )
+    qr.add_data(token)
+    qr.make(fit=True)
+    return qr.make_image(fill_color="black", back_color="white").get_image().convert('RGB')
+
+
+def render_png(details):
+    buffer = BytesIO()
+    qr_image(details['token']).save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def render_pdf(details):
+    """One A6 page (150 dpi) with the tour details and the check-in QR"""
+    page = Image.new('RGB', (620, 874), 'white')
+    draw = ImageDraw.Draw(page)
+    title_font = ImageFont.load_default(size=32)
+    body_font = ImageFont.load_default(size=22)
+
+    draw.text((40, 40), 'UAP Tours - Ticket', font=title_font, fill='black')
+    lines = [
+        details['tour'],
+        details['date'],
+        f"Meeting point: {details['meeting_point']}",
+        f"Participants: {details['participants']}",
+        f"Name: {details['tourist']}",
+        f"Booking #{details['booking_id']}",
+    ]
+    y = 110
+    for line in lines:
+        draw.text((40, y), line[:48], font=body_font, fill='black')
+        y += 36
+
+    qr = qr_image(details['token']).resize((420, 420), Image.NEAREST)
+    page.paste(qr, ((page.width - qr.width) // 2, y + 30))
+
+    buffer = BytesIO()
+    page.save(buffer, format='PDF', resolution=150)
+    return buffer.getvalue()
+
+
+RENDERERS = {
+    'png': render_png,
+    'pdf': render_pdf,
+}
+
+
+def ensure_ticket(details, kind):
+    """Return the storage name of a ticket artifact, rendering it on first use"""
+    name = ticket_name(ticket_digest(details), kind)
+    if not default_storage.exists(name):
+        saved = default_storage.save(name, ContentFile(RENDERERS[kind](details)))
+        if saved != name:
+            # Another process rendered the same content first; keep theirs
+            default_storage.delete(saved)
+    return name
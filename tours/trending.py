@@ -0,0 +1,63 @@
+# tours/trending.py
+import math
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Greatest, Least, Log, Power
+from django.utils import timezone
+
+from .models import Tour
+
+# How much each kind of event counts towards a tour's trending score
+EVENT_WEIGHTS = {
+    'booking': 3.0,
+    'review': 2.0,
+    'wishlist': 1.0,
+}
+
+# Each event at time t is worth weight * 2 ** ((t - EPOCH) / half_life), so
+# older events count exponentially less than newer ones without ever rewriting
+# stored scores. That raw sum outgrows a float within a few years (sooner
+# with a short half-life), so the column stores log2(1 + sum) instead: still
+# monotonic in the sum, 0 for a tour with no events, and growing only
+# linearly with time. Adding an event is then a single log-sum-exp UPDATE and
+# ordering by the column still ranks tours by their decayed score. Run
+# rebuild_trending whenever the weights or the half-life change.
+EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+# Beyond this many doublings the smaller term no longer changes a float64 sum
+LOG_SUM_CUTOFF = 64
+
+
+def half_life_seconds():
+    return getattr(settings, 'TRENDING_HALF_LIFE_DAYS', 7) * 86400
+
+
+def event_log_score(kind, when=None, count=1):
+    """log2 of ``count`` events of ``kind`` at ``when``; finite for any date"""
+    when = when or timezone.now()
+    return math.log2(EVENT_WEIGHTS[kind] * count) + (when - EPOCH).total_seconds() / half_life_seconds()
+
+
+def log_add(a, b):
+    """log2(2 ** a + 2 ** b) without leaving float range"""
+    high, low = max(a, b), min(a, b)
+    if high - low > LOG_SUM_CUTOFF:
+        return high
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def bump(counts, kind, when=None):
+    """Add ``counts[tour_id]`` events of ``kind`` to each tour's score"""
+    for tour_id, count in counts.items():
+        score = event_log_score(kind, when, count)
+        current = F('trending_score')
+        Tour.objects.filter(id=tour_id).update(trending_score=Case(
+            When(trending_score__gte=score + LOG_SUM_CUTOFF, then=current),
+            When(trending_score__lte=score - LOG_SUM_CUTOFF, then=Value(score)),
+            default=Greatest(current, Value(score)) + Log(
+                Value(2.0), Value(1.0) + Power(Value(2.0), Least(current, Value(score)) - Greatest(current, Value(score)))
+            ),
+            output_field=FloatField(),
+        ))
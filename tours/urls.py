@@ -7,11 +7,20 @@ urlpatterns = [
     path('tours/', views.tour_list, name='tour_list'),
     path('tours/<int:tour_id>/', views.tour_detail, name='tour_detail'),
     path('tours/create/', views.create_tour, name='create_tour'),
+    path('tours/bookings/<int:booking_id>/cancel/', views.cancel_booking, name='cancel_booking'),
+    path('tours/bookings/<int:booking_id>/ticket.<str:kind>', views.booking_ticket, name='booking_ticket'),
+    path('tours/bookings/<int:booking_id>/ticket/<str:digest>.<str:kind>', views.booking_ticket_file, name='booking_ticket_file'),
     path('tours/wishlist/toggle/<int:tour_id>/', views.wishlist_toggle, name='wishlist_toggle'),
+    path('tours/wishlist/sync/', views.wishlist_sync, name='wishlist_sync'),
     path('tours/wishlist/', views.my_wishlist, name='my_wishlist'),
     path('tours/reviews/', views.my_reviews, name='my_reviews'),
     path('tours/department/<int:department_id>/', views.department_tours, name='department_tours'),
+    path('tours/calendar/<int:year>/<int:month>/', views.tour_calendar, name='tour_calendar'),
     path('tours/generate-qr/<int:tour_id>/', views.generate_qr_code, name='generate_qr_code'),
+    path('tours/<int:tour_id>/manifest.csv', views.tour_manifest, name='tour_manifest'),
+    path('tours/<int:tour_id>/check-in/', views.check_in, name='check_in'),
+    path('tours/<int:tour_id>/check-in/sync/', views.check_in_sync, name='check_in_sync'),
+    path('payments/webhook/', views.payment_webhook, name='payment_webhook'),
     
     # Notification URLs
     path('notifications/send/', views.send_notification, name='send_notification'),
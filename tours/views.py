@@ -1,40 +1,87 @@
 # tours/views.py - COMPLETE FIXED VERSION
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q, Avg
+from django.db.models import Q, Avg, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse,
+)
+from django.core.files.storage import default_storage
+from django.core.paginator import Paginator
 from django.utils import timezone
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_POST, require_safe
+from django.views.decorators.csrf import csrf_exempt
+from django.db import IntegrityError, transaction
+from django.conf import settings
+from django.core import signing
+from django.utils.dateparse import parse_datetime
+from django.utils.http import parse_etags
+import calendar
+import csv
+import json
 import uuid
 import qrcode
 from io import BytesIO
 from django.core.files import File
 from django.contrib.auth import get_user_model
+from accounts.models import EmergencyContact, OrganizerProfile
 
 # Import ALL models from your fixed models.py
 from .models import (
     Tour, UAPDepartment, Booking, Review, Wishlist, 
-    Payment, Notification, UserNotification
+    Payment, Notification, UserNotification, TourCalendarEntry, WaitlistEntry,
+    PaymentWebhookEvent, DepartmentStats, Attendance
 )
 from .forms import (
     TourForm, BookingForm, ReviewForm, UAPDepartmentForm, 
     NotificationForm, QuickReminderForm
 )
+from .notifications import ainvalidate_recent, arecent_notifications, fan_out, invalidate_recent
+from .waitlist import held_seats
+from .payments import verify_signature
+from .trending import bump as bump_trending
+from .events import emit
+from .tickets import TICKET_KINDS, ensure_ticket, read_ticket_token, ticket_details, ticket_digest
 
 User = get_user_model()
 
+DEPARTMENT_TOURS_PER_PAGE = 12
+
+def catalog_tours(tours):
+    """Annotate a tour queryset with everything the shared tour card renders"""
+    return tours.select_related('organizer').annotate(
+        seats_left=F('max_participants') - Coalesce(
+            Sum('booking__participants', filter=Q(booking__status__in=['pending', 'confirmed'])),
+            Value(0)
+        )
+    )
+
+def wishlist_tour_ids(user):
+    """Set of wishlisted tour ids, so cards check membership without rescanning"""
+    if user.is_authenticated and user.user_type == 'tourist':
+        return set(Wishlist.objects.filter(tourist=user).values_list('tour_id', flat=True))
+    return set()
+
 # CORE VIEWS
 def home(request):
-    featured_tours = Tour.objects.filter(status='published').order_by('-created_at')[:8]
+    featured_tours = Tour.objects.filter(status='published').order_by('-trending_score', '-created_at')[:8]
     departments = UAPDepartment.objects.all()[:12]
     upcoming_tours = Tour.objects.filter(
         status='published', 
         tour_date__gt=timezone.now()
     ).count()
     
+    recommended_tours = []
+    if request.user.is_authenticated and request.user.user_type == 'tourist':
+        recommended_tours = Tour.objects.filter(
+            userrecommendation__user=request.user,
+            status='published'
+        ).order_by('userrecommendation__rank')[:8]
+    
     context = {
         'featured_tours': featured_tours,
+        'recommended_tours': recommended_tours,
         'departments': departments,
         'upcoming_tours': upcoming_tours,
     }
@@ -75,13 +122,13 @@ def tour_list(request):
         tours = tours.order_by('-price')
     elif sort_by == 'date':
         tours = tours.order_by('tour_date')
+    elif sort_by == 'trending':
+        tours = tours.order_by('-trending_score')
     else:  # newest
         tours = tours.order_by('-created_at')
     
     # Get user wishlist for template
-    user_wishlist = []
-    if request.user.is_authenticated and request.user.user_type == 'tourist':
-        user_wishlist = Wishlist.objects.filter(tourist=request.user).values_list('tour_id', flat=True)
+    user_wishlist = wishlist_tour_ids(request.user)
     
     categories = Tour.CATEGORY_CHOICES
     
@@ -89,7 +136,7 @@ def tour_list(request):
     free_tours_count = Tour.objects.filter(status='published', price=0).count()
     
     context = {
-        'tours': tours,
+        'tours': list(catalog_tours(tours)),
         'categories': categories,
         'user_wishlist': user_wishlist,
         'free_tours_count': free_tours_count,  # ADD THIS LINE
@@ -132,17 +179,46 @@ def tour_detail(request, tour_id):
                     messages.success(request, 'Review added successfully!')
                 return redirect('tour_detail', tour_id=tour_id)
         
+        elif 'join_waitlist' in request.POST and request.user.is_authenticated and request.user.user_type == 'tourist':
+            try:
+                participants = int(request.POST.get('participants', 1))
+            except ValueError:
+                participants = 0
+            if participants < 1:
+                messages.error(request, 'Please enter a valid number of participants.')
+                return redirect('tour_detail', tour_id=tour_id)
+            
+            entry, created = WaitlistEntry.objects.get_or_create(
+                tour=tour,
+                tourist=request.user,
+                defaults={'participants': participants}
+            )
+            if not created and entry.status in ('expired', 'booked'):
+                # One row per tourist and tour; rejoining goes to the back of the queue
+                WaitlistEntry.objects.filter(id=entry.id).update(
+                    status='waiting', participants=participants, created_at=timezone.now(), offered_at=None
+                )
+                created = True
+            if created:
+                messages.success(request, 'You are on the waitlist. We will notify you when a spot opens up.')
+            else:
+                messages.info(request, 'You are already on the waitlist for this tour.')
+            return redirect('tour_detail', tour_id=tour_id)
+        
         elif request.user.is_authenticated and request.user.user_type == 'tourist':
             # Handle booking
             participants = request.POST.get('participants', 1)
             payment_method = request.POST.get('payment_method')
             payment_number = request.POST.get('payment_number')
             special_requirements = request.POST.get('special_requirements', '')
+            transaction_id = request.POST.get('transaction_id', '').strip()
             
             try:
                 participants = int(participants)
-                if participants > tour.available_spots:
-                    messages.error(request, f'Only {tour.available_spots} spots available!')
+                # Seats offered to waitlisted tourists stay reserved for them
+                spots = tour.available_spots - held_seats(tour, exclude_user=request.user)
+                if participants > spots:
+                    messages.error(request, f'Only {max(spots, 0)} spots available!')
                     return redirect('tour_detail', tour_id=tour_id)
                 
                 total_price = tour.price * participants
@@ -155,12 +231,22 @@ def tour_detail(request, tour_id):
                     special_requirements=special_requirements,
                     payment_method=payment_method,
                     payment_number=payment_number,
+                    transaction_id=transaction_id,
                     status='confirmed' if tour.price == 0 else 'pending',
                     payment_status='paid' if tour.price == 0 else 'pending'
                 )
+                WaitlistEntry.objects.filter(
+                    tour=tour, tourist=request.user, status='offered'
+                ).update(status='booked')
+                emit('booking.created', actor=request.user, tour=tour, booking=booking,
+                     participants=participants, status=booking.status)
                 
                 if tour.price > 0:
-                    messages.success(request, 'Booking created! Please complete your payment.')
+                    messages.success(
+                        request,
+                        f'Booking created! Please complete your payment within '
+                        f'{settings.PAYMENT_DEADLINE_HOURS} hours or your seats will be released.'
+                    )
                 else:
                     messages.success(request, 'Booking confirmed successfully!')
                 
@@ -169,9 +255,25 @@ def tour_detail(request, tour_id):
             except ValueError:
                 messages.error(request, 'Please enter a valid number of participants.')
     
+    waitlist_entry = None
+    is_tourist = request.user.is_authenticated and request.user.user_type == 'tourist'
+    if is_tourist:
+        waitlist_entry = WaitlistEntry.objects.filter(tour=tour, tourist=request.user).first()
+    # What this visitor could book: open seats minus those held for other tourists' offers
+    bookable_spots = max(tour.available_spots - held_seats(tour, exclude_user=request.user if is_tourist else None), 0)
+    
+    # Precomputed by build_recommendations
+    similar_tours = Tour.objects.filter(
+        similar_to__tour=tour,
+        status='published'
+    ).order_by('similar_to__rank')[:4]
+    
     context = {
         'tour': tour,
         'in_wishlist': in_wishlist,
+        'waitlist_entry': waitlist_entry,
+        'bookable_spots': bookable_spots,
+        'similar_tours': similar_tours,
         'reviews': reviews,
         'average_rating': average_rating,
         'review_count': review_count,
@@ -190,14 +292,10 @@ def create_tour(request):
             tour = form.save(commit=False)
             tour.organizer = request.user
             
-            # Auto-assign department from organizer's profile
-            try:
-                organizer_profile = request.user.organizerprofile
-                tour.department = UAPDepartment.objects.filter(
-                    name__icontains=organizer_profile.department
-                ).first()
-            except:
-                pass
+            # Auto-assign department from the organizer's resolved profile department
+            tour.department_id = (
+                OrganizerProfile.objects.filter(user=request.user).values_list('uap_department_id', flat=True).first()
+            )
             
             tour.save()
             messages.success(request, 'Tour created successfully!')
@@ -209,28 +307,93 @@ def create_tour(request):
 
 @login_required
 @require_POST
-def wishlist_toggle(request, tour_id):
-    if request.user.user_type != 'tourist':
+async def wishlist_toggle(request, tour_id):
+    user = await request.auser()
+    if user.user_type != 'tourist':
         return JsonResponse({'error': 'Only tourists can use wishlist'}, status=403)
     
-    tour = get_object_or_404(Tour, id=tour_id)
-    wishlist_item, created = Wishlist.objects.get_or_create(
-        tourist=request.user,
-        tour=tour
-    )
-    
-    if not created:
-        wishlist_item.delete()
+    # Removing is a single DELETE; adding is a single INSERT unless it fails
+    deleted, _ = await Wishlist.objects.filter(tourist=user, tour_id=tour_id).adelete()
+    if deleted:
         return JsonResponse({
             'added': False,
             'message': 'Removed from wishlist'
         })
     
+    # Checked up front: inside a transaction the foreign key isn't enforced
+    # until commit, and drafts mustn't be wishlisted either
+    if not await Tour.objects.filter(id=tour_id, status='published').aexists():
+        raise Http404('Tour not found')
+    try:
+        await Wishlist.objects.acreate(tourist=user, tour_id=tour_id)
+    except IntegrityError:
+        # A concurrent click already added it
+        pass
+    
     return JsonResponse({
         'added': True,
         'message': 'Added to wishlist'
     })
 
+@login_required
+@require_POST
+def wishlist_sync(request):
+    """Apply a batch of wishlist operations in one transaction.
+
+    Expects JSON like {"operations": [{"op": "add", "tour_id": 3}, {"op": "remove", "tour_id": 5}]}.
+    Operations apply in order, so the last one for a tour wins.
+    """
+    if request.user.user_type != 'tourist':
+        return JsonResponse({'error': 'Only tourists can use wishlist'}, status=403)
+    
+    try:
+        operations = json.loads(request.body)['operations']
+        final_state = {}
+        for operation in operations:
+            if operation['op'] not in ('add', 'remove'):
+                raise ValueError
+            final_state[int(operation['tour_id'])] = operation['op']
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Expected {"operations": [{"op": "add"|"remove", "tour_id": <id>}]}'}, status=400)
+    
+    if len(final_state) > 500:
+        return JsonResponse({'error': 'At most 500 tours per sync'}, status=400)
+    
+    adds = [tour_id for tour_id, op in final_state.items() if op == 'add']
+    removes = [tour_id for tour_id, op in final_state.items() if op == 'remove']
+    
+    with transaction.atomic():
+        if removes:
+            Wishlist.objects.filter(tourist=request.user, tour_id__in=removes).delete()
+        if adds:
+            # bulk_create skips the post_save signal, so bump trending for new adds here
+            new_tours = (
+                set(Tour.objects.filter(id__in=adds, status='published').values_list('id', flat=True))
+                - wishlist_tour_ids(request.user)
+            )
+            Wishlist.objects.bulk_create(
+                [Wishlist(tourist=request.user, tour_id=tour_id) for tour_id in new_tours],
+                ignore_conflicts=True
+            )
+            bump_trending(dict.fromkeys(new_tours, 1), 'wishlist')
+    
+    return JsonResponse({'wishlist': sorted(wishlist_tour_ids(request.user))})
+
+@login_required
+@require_POST
+def cancel_booking(request, booking_id):
+    booking = get_object_or_404(Booking, id=booking_id, tourist=request.user)
+    
+    if booking.status in ('cancelled', 'completed'):
+        messages.error(request, 'This booking can no longer be cancelled.')
+        return redirect('dashboard')
+    
+    booking.status = 'cancelled'
+    booking.save()
+    emit('booking.cancelled', actor=request.user, tour=booking.tour_id, booking=booking)
+    messages.success(request, f'Your booking for "{booking.tour.title}" was cancelled.')
+    return redirect('dashboard')
+
 @login_required
 def my_wishlist(request):
     if request.user.user_type != 'tourist':
@@ -259,17 +422,61 @@ def my_reviews(request):
     })
 
 def department_tours(request, department_id):
-    department = get_object_or_404(UAPDepartment, id=department_id)
+    department = get_object_or_404(UAPDepartment.objects.select_related('stats'), id=department_id)
     tours = Tour.objects.filter(
         department=department,
         status='published'
     ).order_by('-created_at')
+    page = Paginator(catalog_tours(tours), DEPARTMENT_TOURS_PER_PAGE).get_page(request.GET.get('page'))
+    
+    try:
+        stats = department.stats
+    except DepartmentStats.DoesNotExist:
+        stats = None
+    
+    user_wishlist = wishlist_tour_ids(request.user)
     
     return render(request, 'tours/department_tours.html', {
         'department': department,
-        'tours': tours
+        'stats': stats,
+        'page': page,
+        'tours': list(page),
+        'user_wishlist': user_wishlist,
     })
 
+def tour_calendar(request, year, month):
+    """Month view of published tours, served from the precomputed calendar index"""
+    if not 1 <= year <= 9999:
+        # Outside what datetime.date can represent
+        return JsonResponse({'error': 'No calendar for this year'}, status=404)
+    if not 1 <= month <= 12:
+        return JsonResponse({'error': 'Invalid month'}, status=400)
+    
+    last_day = calendar.monthrange(year, month)[1]
+    entries = TourCalendarEntry.objects.filter(
+        date__range=(f'{year:04d}-{month:02d}-01', f'{year:04d}-{month:02d}-{last_day:02d}')
+    )
+    
+    department_id = request.GET.get('department')
+    min_seats = request.GET.get('min_seats')
+    try:
+        if department_id:
+            entries = entries.filter(department_id=int(department_id))
+        if min_seats:
+            entries = entries.filter(remaining_seats__gte=int(min_seats))
+    except ValueError:
+        return JsonResponse({'error': 'department and min_seats must be numbers'}, status=400)
+    
+    days = {}
+    for entry in entries.order_by('date').values('date', 'tour_id', 'department_id', 'remaining_seats'):
+        days.setdefault(entry['date'].isoformat(), []).append({
+            'tour_id': entry['tour_id'],
+            'department_id': entry['department_id'],
+            'remaining_seats': entry['remaining_seats'],
+        })
+    
+    return JsonResponse({'year': year, 'month': month, 'days': days})
+
 @login_required
 @require_POST
 def generate_qr_code(request, tour_id):
@@ -297,6 +504,279 @@ def generate_qr_code(request, tour_id):
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)})
 
+# TICKETS
+TICKET_CACHE_SECONDS = 365 * 24 * 60 * 60
+
+def ticket_booking(request, booking_id, kind):
+    """A confirmed booking whose ticket the current user may download"""
+    if kind not in TICKET_KINDS:
+        raise Http404('Unknown ticket format')
+    booking = get_object_or_404(
+        Booking.objects.select_related('tour', 'tourist'),
+        id=booking_id,
+        status__in=['confirmed', 'completed'],
+    )
+    if request.user.user_type != 'developer' and request.user.id not in (booking.tourist_id, booking.tour.organizer_id):
+        raise Http404('Ticket not found')
+    return booking
+
+@login_required
+def booking_ticket(request, booking_id, kind):
+    """Redirect to the content-addressed URL of the booking's current ticket"""
+    booking = ticket_booking(request, booking_id, kind)
+    digest = ticket_digest(ticket_details(booking))
+    return redirect('booking_ticket_file', booking_id=booking.id, digest=digest, kind=kind)
+
+@login_required
+@require_safe
+def booking_ticket_file(request, booking_id, digest, kind):
+    """Serve a ticket PNG/PDF, rendering it on first request; the URL changes with the content"""
+    booking = ticket_booking(request, booking_id, kind)
+    details = ticket_details(booking)
+    if ticket_digest(details) != digest:
+        return redirect('booking_ticket', booking_id=booking.id, kind=kind)
+    
+    name = ensure_ticket(details, kind)
+    response = FileResponse(
+        default_storage.open(name),
+        content_type='image/png' if kind == 'png' else 'application/pdf',
+        filename=f'ticket-{booking.id}.{kind}',
+    )
+    response.headers['Cache-Control'] = f'private, max-age={TICKET_CACHE_SECONDS}, immutable'
+    return response
+
+# MANIFEST
+class Echo:
+    """File-like object whose write() hands the row back, so csv.writer can feed a stream"""
+    def write(self, value):
+        return value
+
+@login_required
+def tour_manifest(request, tour_id):
+    """Stream the confirmed participant roster of a tour as CSV, from a single joined query"""
+    tour = get_object_or_404(Tour, id=tour_id)
+    if request.user.user_type != 'developer' and tour.organizer_id != request.user.id:
+        raise Http404('Tour not found')
+    
+    contacts = EmergencyContact.objects.filter(user_id=OuterRef('tourist_id')).order_by('-is_primary', 'id')
+    rows = (
+        Booking.objects.filter(tour_id=tour.id, status__in=['confirmed', 'completed'])
+        .annotate(
+            contact_name=Subquery(contacts.values('full_name')[:1]),
+            contact_relationship=Subquery(contacts.values('relationship')[:1]),
+            contact_phone=Subquery(contacts.values('phone')[:1]),
+        )
+        .order_by('tourist__first_name', 'tourist__username')
+        .values_list(
+            'id', 'tourist__username', 'tourist__first_name', 'tourist__last_name', 'tourist__phone',
+            'participants', 'special_requirements', 'contact_name', 'contact_relationship', 'contact_phone',
+        )
+    )
+    
+    writer = csv.writer(Echo())
+    
+    def stream():
+        yield writer.writerow([
+            'Booking', 'Username', 'Name', 'Phone', 'Participants', 'Special Requirements',
+            'Emergency Contact', 'Relationship', 'Emergency Phone',
+        ])
+        for booking_id, username, first_name, last_name, phone, participants, requirements, *contact in rows.iterator(chunk_size=2000):
+            yield writer.writerow([
+                booking_id, username, f'{first_name} {last_name}'.strip(), phone, participants, requirements, *contact,
+            ])
+    
+    response = StreamingHttpResponse(stream(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="manifest-tour-{tour.id}.csv"'
+    return response
+
+# TICKET CHECK-IN
+# A signed ticket stays valid after its booking is cancelled, so every check-in
+# also confirms the booking still holds a seat
+CHECK_IN_STATUSES = ('confirmed', 'completed')
+
+def check_in_forbidden(user, tour_id):
+    """Error response unless the user runs this tour (or is a developer)"""
+    tour = get_object_or_404(Tour, id=tour_id)
+    if user.user_type != 'developer' and tour.organizer_id != user.id:
+        return JsonResponse({'error': 'Only the tour organizer can check in tickets'}, status=403)
+    return None
+
+@login_required
+@require_POST
+def check_in(request, tour_id):
+    """Validate a scanned ticket by its signature and record attendance.
+
+    The token carries the booking and tour, so a scan costs the organizer
+    check, one indexed EXISTS on the booking and the INSERT; the unique
+    booking constraint turns repeat scans into duplicates.
+    """
+    forbidden = check_in_forbidden(request.user, tour_id)
+    if forbidden:
+        return forbidden
+    
+    try:
+        booking_id, ticket_tour_id = read_ticket_token(request.POST.get('token', ''))
+    except (signing.BadSignature, ValueError):
+        return JsonResponse({'status': 'invalid'}, status=400)
+    if ticket_tour_id != tour_id:
+        return JsonResponse({'status': 'wrong_tour', 'booking_id': booking_id}, status=409)
+    if not Booking.objects.filter(id=booking_id, tour_id=tour_id, status__in=CHECK_IN_STATUSES).exists():
+        return JsonResponse({'status': 'invalid', 'booking_id': booking_id}, status=404)
+    
+    try:
+        with transaction.atomic():
+            attendance = Attendance.objects.create(booking_id=booking_id, tour_id=tour_id, checked_in_by=request.user)
+    except IntegrityError:
+        # Either the ticket was already scanned or its booking has been deleted
+        attendance = Attendance.objects.filter(booking_id=booking_id).first()
+        if attendance is None:
+            return JsonResponse({'status': 'invalid'}, status=404)
+        return JsonResponse({
+            'status': 'duplicate',
+            'booking_id': booking_id,
+            'checked_in_at': attendance.checked_in_at.isoformat(),
+        })
+    
+    emit('ticket.checked_in', actor=request.user, tour=tour_id, booking=booking_id)
+    return JsonResponse({
+        'status': 'checked_in',
+        'booking_id': booking_id,
+        'checked_in_at': attendance.checked_in_at.isoformat(),
+    }, status=201)
+
+@login_required
+@require_POST
+def check_in_sync(request, tour_id):
+    """Upload scans collected offline, e.g. {"scans": [{"token": "...", "scanned_at": "<ISO 8601>"}]}.
+
+    Attendance is unique per booking, so re-sending a batch (or overlapping
+    batches from several scanners) only reports the repeats as duplicates.
+    """
+    forbidden = check_in_forbidden(request.user, tour_id)
+    if forbidden:
+        return forbidden
+    
+    try:
+        scans = json.loads(request.body)['scans']
+        if not isinstance(scans, list):
+            raise TypeError
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Expected {"scans": [{"token": <ticket>, "scanned_at": <ISO 8601>}]}'}, status=400)
+    
+    if len(scans) > 1000:
+        return JsonResponse({'error': 'At most 1000 scans per sync'}, status=400)
+    
+    now = timezone.now()
+    results = []
+    scanned = {}
+    for scan in scans:
+        token = scan.get('token', '') if isinstance(scan, dict) else ''
+        try:
+            booking_id, ticket_tour_id = read_ticket_token(token)
+        except (signing.BadSignature, ValueError, AttributeError):
+            results.append({'token': token, 'status': 'invalid'})
+            continue
+        if ticket_tour_id != tour_id:
+            results.append({'token': token, 'booking_id': booking_id, 'status': 'wrong_tour'})
+            continue
+        
+        # A scan without a time counts as now; a time that can't be read is
+        # reported rather than guessed, since the earliest scan wins
+        raw_scanned_at = scan.get('scanned_at')
+        scanned_at = now
+        if raw_scanned_at is not None:
+            try:
+                scanned_at = parse_datetime(raw_scanned_at)
+            except (TypeError, ValueError):
+                scanned_at = None
+            if scanned_at is None:
+                results.append({'token': token, 'booking_id': booking_id, 'status': 'invalid',
+                                'error': 'scanned_at must be an ISO 8601 string'})
+                continue
+        if timezone.is_naive(scanned_at):
+            scanned_at = timezone.make_aware(scanned_at)
+        # The earliest scan of a ticket is the check-in time
+        scanned[booking_id] = min(scanned_at, scanned.get(booking_id, scanned_at))
+        results.append({'token': token, 'booking_id': booking_id})
+    
+    existing = set(Attendance.objects.filter(booking_id__in=scanned).values_list('booking_id', flat=True))
+    known = set(
+        Booking.objects.filter(id__in=scanned, tour_id=tour_id, status__in=CHECK_IN_STATUSES)
+        .values_list('id', flat=True)
+    )
+    new_ids = known - existing
+    Attendance.objects.bulk_create(
+        [
+            Attendance(booking_id=booking_id, tour_id=tour_id, checked_in_at=scanned[booking_id], checked_in_by=request.user)
+            for booking_id in new_ids
+        ],
+        ignore_conflicts=True,
+    )
+    for booking_id in new_ids:
+        emit('ticket.checked_in', actor=request.user, tour=tour_id, booking=booking_id,
+             scanned_at=scanned[booking_id].isoformat())
+    
+    reported = set()
+    for result in results:
+        booking_id = result.get('booking_id')
+        if 'status' in result:
+            continue
+        if booking_id not in known:
+            result['status'] = 'invalid'
+        elif booking_id in new_ids and booking_id not in reported:
+            result['status'] = 'checked_in'
+            reported.add(booking_id)
+        else:
+            result['status'] = 'duplicate'
+    
+    return JsonResponse({
+        'checked_in': len(new_ids),
+        'results': results,
+    })
+
+# PAYMENT GATEWAY
+def webhook_text(value):
+    """Webhook field as a stripped string; raises TypeError for anything but text or an integer"""
+    if value is None:
+        return ''
+    if isinstance(value, bool) or not isinstance(value, (str, int)):
+        raise TypeError(value)
+    return str(value).strip()
+
+@csrf_exempt
+@require_POST
+def payment_webhook(request):
+    """Accept a signed gateway callback and queue it for process_payment_events"""
+    if not verify_signature(request.body, request.headers.get('X-Signature', '')):
+        return JsonResponse({'error': 'Invalid signature'}, status=401)
+    
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    if not isinstance(payload, dict):
+        return JsonResponse({'error': 'Expected a JSON object'}, status=400)
+    
+    # Gateways send ids as JSON strings or numbers; store them as text so the
+    # worker and apply_settlements only ever see strings
+    try:
+        for field in ('event_id', 'transaction_id', 'status', 'payment_method'):
+            payload[field] = webhook_text(payload.get(field))
+    except TypeError:
+        return JsonResponse({'error': f'{field} must be a string or integer'}, status=400)
+    
+    idempotency_key = request.headers.get('Idempotency-Key') or payload['event_id']
+    if not idempotency_key or not payload['transaction_id']:
+        return JsonResponse({'error': 'event_id and transaction_id are required'}, status=400)
+    
+    try:
+        PaymentWebhookEvent.objects.create(idempotency_key=idempotency_key[:100], payload=payload)
+    except IntegrityError:
+        # Gateways retry on timeouts; the first delivery is already queued
+        return JsonResponse({'received': True, 'duplicate': True})
+    
+    return JsonResponse({'received': True}, status=202)
+
 # NOTIFICATION VIEWS
 @login_required
 def send_notification(request):
@@ -314,15 +794,9 @@ def send_notification(request):
             notification.save()
             
             # Get target users and create UserNotification records
-            target_users = notification.get_target_users()
-            notifications_created = 0
-            
-            for tourist in target_users:
-                UserNotification.objects.get_or_create(
-                    user=tourist,
-                    notification=notification
-                )
-                notifications_created += 1
+            notifications_created = fan_out(notification, notification.get_target_users())
+            emit('notification.sent', actor=request.user, tour=notification.tour_id,
+                 notification=notification.id, type=notification.notification_type, recipients=notifications_created)
             
             messages.success(request, f'Notification sent to {notifications_created} tourists!')
             return redirect('organizer_notifications')
@@ -360,15 +834,9 @@ def send_quick_reminder(request):
             )
             
             # Get tourists who booked this tour and create UserNotification records
-            target_users = notification.get_target_users()
-            notifications_created = 0
-            
-            for tourist in target_users:
-                UserNotification.objects.create(
-                    user=tourist,
-                    notification=notification
-                )
-                notifications_created += 1
+            notifications_created = fan_out(notification, notification.get_target_users())
+            emit('notification.sent', actor=request.user, tour=notification.tour_id,
+                 notification=notification.id, type=notification.notification_type, recipients=notifications_created)
             
             return JsonResponse({
                 'success': True, 
@@ -405,16 +873,15 @@ def my_notifications(request):
 
 @require_POST
 @login_required
-def mark_notification_read(request, notification_id):
-    try:
-        user_notification = UserNotification.objects.get(
-            id=notification_id,
-            user=request.user
-        )
-        user_notification.mark_as_read()
+async def mark_notification_read(request, notification_id):
+    user = await request.auser()
+    updated = await UserNotification.objects.filter(id=notification_id, user=user).aupdate(
+        is_read=True, read_at=timezone.now()
+    )
+    if updated:
+        await ainvalidate_recent([user.pk])
         return JsonResponse({'success': True})
-    except UserNotification.DoesNotExist:
-        return JsonResponse({'success': False, 'error': 'Notification not found'})
+    return JsonResponse({'success': False, 'error': 'Notification not found'})
 
 @login_required
 def mark_all_notifications_read(request):
@@ -422,49 +889,28 @@ def mark_all_notifications_read(request):
     unread_count = unread_notifications.count()
     
     unread_notifications.update(is_read=True, read_at=timezone.now())
+    invalidate_recent([request.user.pk])
     
     messages.success(request, f'Marked {unread_count} notifications as read!')
     return redirect('my_notifications')
 
+# The polling endpoints below are async so that under ASGI (uap_tours/asgi.py)
+# a waiting request doesn't hold a worker thread
 @login_required
-def get_unread_count(request):
-    if request.user.is_authenticated:
-        unread_count = UserNotification.objects.filter(user=request.user, is_read=False).count()
-        return JsonResponse({'unread_count': unread_count})
-    return JsonResponse({'unread_count': 0})
+async def get_unread_count(request):
+    user = await request.auser()
+    unread_count = await UserNotification.objects.filter(user=user, is_read=False).acount()
+    return JsonResponse({'unread_count': unread_count})
 
 @login_required
-def get_recent_notifications(request):
-    if request.user.is_authenticated:
-        recent_notifications = UserNotification.objects.filter(
-            user=request.user
-        ).order_by('-created_at')[:5]
-        
-        notifications_data = []
-        for user_notification in recent_notifications:
-            notifications_data.append({
-                'id': user_notification.id,
-                'title': user_notification.notification.title,
-                'message': user_notification.notification.message,
-                'type': user_notification.notification.notification_type,
-                'is_read': user_notification.is_read,
-                'created_at': user_notification.created_at.strftime("%b %d, %H:%M"),
-                'time_ago': get_time_ago(user_notification.created_at)
-            })
-        
-        return JsonResponse({'notifications': notifications_data})
-    return JsonResponse({'notifications': []})
-
-def get_time_ago(created_at):
-    """Helper function to get human-readable time difference"""
-    now = timezone.now()
-    diff = now - created_at
-    
-    if diff.days > 0:
-        return f"{diff.days}d ago"
-    elif diff.seconds // 3600 > 0:
-        return f"{diff.seconds // 3600}h ago"
-    elif diff.seconds // 60 > 0:
-        return f"{diff.seconds // 60}m ago"
-    else:
-        return "Just now"
\ No newline at end of file
+async def get_recent_notifications(request):
+    user = await request.auser()
+    etag, body = await arecent_notifications(user.pk)
+    
+    # Private and revalidated every time: the browser keeps the last copy and
+    # an unchanged dropdown costs one cache lookup and an empty 304
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache', 'Vary': 'Cookie'}
+    if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+    if etag in if_none_match or '*' in if_none_match:
+        return HttpResponseNotModified(headers=headers)
+    return HttpResponse(body, content_type='application/json', headers=headers)
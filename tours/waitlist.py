@@ -0,0 +1,85 @@
+# tours/waitlist.py
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import Tour, WaitlistEntry, Notification
+from .notifications import fan_out
+
+
+def offer_cutoff():
+    hours = getattr(settings, 'WAITLIST_OFFER_HOURS', 24)
+    return timezone.now() - timedelta(hours=hours)
+
+
+def held_seats(tour, exclude_user=None):
+    """Seats reserved for tourists holding a waitlist offer that hasn't expired"""
+    offers = WaitlistEntry.objects.filter(tour=tour, status='offered', offered_at__gte=offer_cutoff())
+    if exclude_user is not None:
+        offers = offers.exclude(tourist=exclude_user)
+    return offers.aggregate(total=Sum('participants'))['total'] or 0
+
+
+def promote_waitlist(tour_id):
+    """Offer freed seats on a tour to the oldest waiting tourists that fit.
+
+    The tour row is locked for the whole promotion so concurrent cancellations
+    on the same tour are applied one after another and never hand out the
+    same seat twice. Returns the number of tourists that received an offer.
+    """
+    with transaction.atomic():
+        tour = Tour.objects.select_for_update().filter(id=tour_id, status='published').first()
+        if tour is None:
+            return 0
+        
+        WaitlistEntry.objects.filter(
+            tour=tour, status='offered', offered_at__lt=offer_cutoff()
+        ).update(status='expired')
+        
+        free_seats = tour.available_spots - held_seats(tour)
+        if free_seats <= 0:
+            return 0
+        
+        offered = []
+        waiting = WaitlistEntry.objects.filter(tour=tour, status='waiting').order_by('created_at', 'id')
+        for entry in waiting.only('id', 'tourist_id', 'participants').iterator():
+            if entry.participants <= free_seats:
+                offered.append(entry)
+                free_seats -= entry.participants
+            if free_seats <= 0:
+                break
+        
+        if not offered:
+            return 0
+        
+        WaitlistEntry.objects.filter(id__in=[entry.id for entry in offered]).update(
+            status='offered', offered_at=timezone.now()
+        )
+        
+        notification = Notification.objects.create(
+            organizer=tour.organizer,
+            tour=tour,
+            title=f'A spot opened up: {tour.title}',
+            message='A seat you were waiting for is now available. Book it from the tour page before the offer expires.',
+            notification_type='update',
+            send_to_all_tourists=False,
+            is_sent=True
+        )
+        return fan_out(notification, [entry.tourist_id for entry in offered])
+
+
+def expire_offers():
+    """Expire offers nobody booked in time and offer their seats to the next in line.
+
+    promote_waitlist only sweeps a tour when one of its bookings is cancelled,
+    so expire_bookings calls this on every run. Returns the number of offers expired.
+    """
+    stale = WaitlistEntry.objects.filter(status='offered', offered_at__lt=offer_cutoff())
+    tour_ids = list(stale.values_list('tour_id', flat=True).distinct())
+    expired = stale.update(status='expired')
+    for tour_id in tour_ids:
+        promote_waitlist(tour_id)
+    return expired
@@ -33,6 +33,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'tours.events.EventBufferMiddleware',
 ]
 
 ROOT_URLCONF = 'uap_tours.urls'
@@ -41,8 +42,15 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Compiled templates are kept in memory; in DEBUG Django still
+            # resets this cache whenever a template file changes
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -87,6 +95,45 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# With STATIC_MANIFEST=1 in the environment (set it for collectstatic and
+# the server alike), collectstatic writes content-hashed names plus .gz/.br
+# copies so the files can be cached forever (see uap_tours/static.py).
+# Without it, as for local runs and tests, templates link the plain file
+# names, so nothing depends on a staticfiles.json manifest existing.
+# Uploaded media is stored by content hash, so duplicates share one file
+# (gc_media cleans up)
+STATIC_MANIFEST = os.environ.get('STATIC_MANIFEST') == '1'
+STORAGES = {
+    'default': {
+        'BACKEND': 'uap_tours.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'uap_tours.storage.CompressedManifestStaticFilesStorage' if STATIC_MANIFEST
+            else 'django.contrib.staticfiles.storage.StaticFilesStorage'
+        ),
+    },
+}
+
+# Set REDIS_URL in production so every worker process and management command
+# shares one cache and sees the invalidations made by the others (fan_out,
+# prune_notifications, expire_bookings, ...). Without it each process keeps
+# its own in-memory cache, which is fine for development and tests; entries
+# there still expire after their timeout (e.g. NOTIFICATION_CACHE_SECONDS)
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    }
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
@@ -96,4 +143,55 @@ LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'home'
 LOGIN_URL = 'login'
 
-AUTH_USER_MODEL = 'accounts.CustomUser'
\ No newline at end of file
+AUTH_USER_MODEL = 'accounts.CustomUser'
+
+# Read notifications older than this are moved out of UserNotification
+# into NotificationArchive by the prune_notifications command
+NOTIFICATION_RETENTION_DAYS = 90
+
+# How long a tourist promoted from a waitlist keeps their offered seat
+WAITLIST_OFFER_HOURS = 24
+
+# Shared secret used by the payment gateway to sign webhook callbacks
+PAYMENT_WEBHOOK_SECRET = 'django-insecure-webhook-secret-change-this-in-production'
+
+# Unpaid pending bookings older than this are cancelled by expire_bookings
+PAYMENT_DEADLINE_HOURS = 24
+
+# Half-life of bookings, wishlist adds and reviews in the trending score
+TRENDING_HALF_LIFE_DAYS = 7
+
+# Outgoing email goes to a local SMTP sink in development, e.g.
+# `python -m aiosmtpd -n -l localhost:1025`
+EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_HOST = 'localhost'
+EMAIL_PORT = 1025
+EMAIL_TIMEOUT = 10
+DEFAULT_FROM_EMAIL = 'UAP Tours <noreply@localhost>'
+
+# Notification outbox delivered by deliver_outbox. SMS is only sent for these
+# notification types; SMS_BACKEND is a dotted path to a class with
+# open()/close()/send(phone, text)
+OUTBOX_SMS_TYPES = ('cancellation', 'reminder')
+SMS_BACKEND = 'tours.outbox.ConsoleSMSBackend'
+OUTBOX_RATE_LIMITS = {'email': 10, 'sms': 1}
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_RETRY_SECONDS = 60
+
+# send_tour_reminders notifies booked tourists this many hours before a tour
+TOUR_REMINDER_WINDOWS_HOURS = (24, 2)
+
+# complete_past_tours moves published tours this long after tour_date to
+# completed, along with their confirmed bookings
+TOUR_COMPLETION_GRACE_HOURS = 24
+
+# Public base URL, used where absolute links are needed (e.g. tour QR codes)
+SITE_URL = 'http://localhost:8000'
+
+# Domain events are buffered per request (or batched() block) and written with
+# one bulk INSERT; a buffer reaching this size is flushed early
+EVENT_BATCH_SIZE = 500
+
+# Seconds the per-user notification dropdown payload stays cached; it is also
+# dropped whenever the user's inbox or read state changes
+NOTIFICATION_CACHE_SECONDS = 300
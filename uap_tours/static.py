@@ -0,0 +1,51 @@
+# uap_tours/static.py
+import mimetypes
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import require_safe
+
+# Names produced by ManifestStaticFilesStorage, e.g. css/style.1a2b3c4d5e6f.css
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^/]+$')
+
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+@require_safe
+def serve_static(request, path):
+    """Serve collected static files with far-future caching for hashed names.
+
+    Precompressed variants written by CompressedManifestStaticFilesStorage
+    are picked according to the Accept-Encoding header.
+    """
+    try:
+        full_path = Path(safe_join(settings.STATIC_ROOT, path))
+    except SuspiciousFileOperation:
+        raise Http404('Static file not found')
+    if not full_path.is_file():
+        raise Http404('Static file not found')
+
+    content_type, _ = mimetypes.guess_type(full_path.name)
+    accepted = request.headers.get('Accept-Encoding', '')
+    served_path, encoding = full_path, None
+    for candidate_encoding, suffix in ENCODINGS:
+        candidate = full_path.with_name(full_path.name + suffix)
+        if candidate_encoding in accepted and candidate.is_file():
+            served_path, encoding = candidate, candidate_encoding
+            break
+
+    response = FileResponse(open(served_path, 'rb'), content_type=content_type or 'application/octet-stream')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    patch_vary_headers(response, ['Accept-Encoding'])
+
+    if HASHED_NAME.search(full_path.name):
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        response.headers['Cache-Control'] = 'public, no-cache'
+    return response
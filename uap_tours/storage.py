@@ -0,0 +1,126 @@
+# uap_tours/storage.py
+import gzip
+import hashlib
+import posixpath
+import re
+
+from django.apps import apps
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip variants are always built
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.html', '.txt', '.json', '.map')
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Hashed static files plus precompressed .gz (and .br) copies built by collectstatic"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        hashed_names = []
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                hashed_names.append(hashed_name)
+            yield name, hashed_name, processed
+
+        if dry_run:
+            return
+
+        for hashed_name in hashed_names:
+            if hashed_name.endswith(COMPRESSIBLE_EXTENSIONS):
+                for compressed_name in self.compress(hashed_name):
+                    yield hashed_name, compressed_name, True
+
+    def compress(self, name):
+        with self.open(name) as f:
+            content = f.read()
+
+        variants = [(f'{name}.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append((f'{name}.br', brotli.compress(content)))
+
+        for compressed_name, compressed in variants:
+            # Only keep variants that actually save bytes
+            if len(compressed) < len(content):
+                if self.exists(compressed_name):
+                    self.delete(compressed_name)
+                self._save(compressed_name, ContentFile(compressed))
+                yield compressed_name
+
+
+# Model file fields whose values point into media storage; gc_media scans these.
+# Each one has db_index=True, since delete() looks files up by name in all of them
+MEDIA_FIELDS = (
+    ('tours.Tour', 'image'),
+    ('tours.Tour', 'qr_code'),
+    ('tours.UAPDepartment', 'image'),
+    ('accounts.CustomUser', 'profile_picture'),
+)
+
+
+def media_references(name):
+    """How many rows across MEDIA_FIELDS point at this file"""
+    total = 0
+    for label, field in MEDIA_FIELDS:
+        total += apps.get_model(label).objects.filter(**{field: name}).count()
+    return total
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Media storage that names each file after the SHA-256 of its content.
+
+    ``tours/photo.jpg`` is stored as ``tours/ab/ab12...ef.jpg``, so uploading the
+    same bytes twice reuses one file. Files are shared between rows, so delete()
+    only removes a file once no row in MEDIA_FIELDS references it; anything
+    left behind is collected by gc_media.
+    """
+    # Callers that already pick content-derived names (see tours/tickets.py)
+    passthrough_prefixes = ('tickets/',)
+
+    # <upload_to>/ab/ab12...ef.jpg, as built by _save()
+    hashed_name_re = re.compile(r'(?:^|/)([0-9a-f]{2})/\1[0-9a-f]{62}(?:\.[^/]*)?$')
+
+    def get_available_name(self, name, max_length=None):
+        if name.startswith(self.passthrough_prefixes):
+            return super().get_available_name(name, max_length)
+        if self.hashed_name_re.search(name):
+            # FileSystemStorage._save asks for a new name when a concurrent
+            # upload of the same bytes created the file first. Renaming would
+            # loop forever, so hand the collision back to _save() below
+            raise FileExistsError(name)
+        # Identical content maps to the same name, so there's nothing to make unique
+        return name
+
+    def _save(self, name, content):
+        if name.startswith(self.passthrough_prefixes):
+            return super()._save(name, content)
+
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+
+        directory, filename = posixpath.split(name)
+        extension = posixpath.splitext(filename)[1].lower()
+        hashed_name = posixpath.join(directory, digest[:2], f'{digest}{extension}')
+        if self.exists(hashed_name):
+            return hashed_name
+        content.seek(0)
+        try:
+            return super()._save(hashed_name, content)
+        except FileExistsError:
+            # Lost the race to another upload of the same content, which is
+            # by definition the file we were about to write
+            if not self.exists(hashed_name):
+                raise
+            return hashed_name
+
+    def delete(self, name):
+        if name and not name.startswith(self.passthrough_prefixes) and media_references(name):
+            return
+        super().delete(name)
@@ -0,0 +1,137 @@
+import gzip
+import hashlib
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.http import Http404
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from tours.models import Tour
+
+from .static import serve_static
+from .storage import ContentAddressedStorage, brotli, media_references
+
+User = get_user_model()
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.storage = ContentAddressedStorage(location=directory.name)
+        self.organizer = User.objects.create_user('org', user_type='organizer')
+
+    def hashed_name(self, content, upload_to='tours', extension='.jpg'):
+        digest = hashlib.sha256(content).hexdigest()
+        return f'{upload_to}/{digest[:2]}/{digest}{extension}'
+
+    def make_tour(self, image):
+        return Tour.objects.create(
+            title='Campus walk', description='-', organizer=self.organizer, duration_hours=1, max_participants=10,
+            meeting_point='-', tour_date=timezone.now() + timedelta(days=7), image=image,
+        )
+
+    def test_identical_uploads_share_one_file(self):
+        first = self.storage.save('tours/photo.JPG', ContentFile(b'same bytes'))
+        second = self.storage.save('tours/other.jpg', ContentFile(b'same bytes'))
+        third = self.storage.save('tours/photo.jpg', ContentFile(b'other bytes'))
+
+        self.assertEqual(first, self.hashed_name(b'same bytes'))
+        self.assertEqual(second, first)
+        self.assertEqual(third, self.hashed_name(b'other bytes'))
+        self.assertEqual(self.storage.listdir(f'tours/{first.split("/")[1]}')[1], [os.path.basename(first)])
+
+    def test_shared_file_is_deleted_with_its_last_reference(self):
+        name = self.storage.save('tours/photo.jpg', ContentFile(b'shared'))
+        first, second = self.make_tour(name), self.make_tour(name)
+        self.assertEqual(media_references(name), 2)
+
+        first.delete()
+        self.storage.delete(name)
+        self.assertTrue(self.storage.exists(name))
+
+        second.delete()
+        self.storage.delete(name)
+        self.assertFalse(self.storage.exists(name))
+
+    def test_concurrent_save_of_the_same_content(self):
+        name = self.hashed_name(b'raced')
+        exists = self.storage.exists
+
+        def lose_race(path):
+            # The other upload writes the file right after our exists() check
+            if path == name and not exists(path):
+                with open(self.storage.path(path), 'xb') as f:
+                    f.write(b'raced')
+                return False
+            return exists(path)
+
+        os.makedirs(os.path.dirname(self.storage.path(name)))
+        with mock.patch.object(self.storage, 'exists', side_effect=lose_race):
+            saved = self.storage.save('tours/photo.jpg', ContentFile(b'raced'))
+
+        self.assertEqual(saved, name)
+        self.assertEqual(self.storage.listdir(os.path.dirname(name))[1], [os.path.basename(name)])
+        with self.storage.open(name) as f:
+            self.assertEqual(f.read(), b'raced')
+
+
+class CompressedStaticFilesTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        manifest_storage = {
+            **settings.STORAGES,
+            'staticfiles': {'BACKEND': 'uap_tours.storage.CompressedManifestStaticFilesStorage'},
+        }
+        overrides = override_settings(STATIC_ROOT=directory.name, STORAGES=manifest_storage)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.factory = RequestFactory()
+
+    def serve(self, name, accept_encoding=''):
+        request = self.factory.get(f'/static/{name}', HTTP_ACCEPT_ENCODING=accept_encoding)
+        response = serve_static(request, name)
+        self.addCleanup(response.close)
+        return response
+
+    def test_collectstatic_writes_hashed_and_compressed_copies(self):
+        hashed = staticfiles_storage.stored_name('js/base.js')
+        self.assertRegex(hashed, r'^js/base\.[0-9a-f]{12}\.js$')
+        self.assertTrue(staticfiles_storage.exists(f'{hashed}.gz'))
+        self.assertEqual(staticfiles_storage.exists(f'{hashed}.br'), brotli is not None)
+
+        self.assertIn(f'/static/{hashed}', self.client.get('/').content.decode())
+
+    def test_serves_precompressed_variant_with_immutable_caching(self):
+        hashed = staticfiles_storage.stored_name('js/base.js')
+        with open(settings.BASE_DIR / 'static' / 'js' / 'base.js', 'rb') as f:
+            source = f.read()
+
+        response = self.serve(hashed, 'gzip, deflate')
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), source)
+        self.assertEqual(response.headers['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(response.headers['Vary'], 'Accept-Encoding')
+
+        response = self.serve(hashed)
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(b''.join(response.streaming_content), source)
+
+    def test_unhashed_names_are_revalidated(self):
+        response = self.serve('js/base.js', 'gzip')
+        self.assertEqual(response.headers['Cache-Control'], 'public, no-cache')
+
+    def test_missing_and_outside_paths_are_not_found(self):
+        for name in ('js/missing.js', '../manage.py'):
+            with self.assertRaises(Http404):
+                self.serve(name)